@@ -0,0 +1,131 @@
+# gunicorn.conf.py
+# Gunicorn settings for the Cloud Run container (picked up automatically from
+# the working directory, or pass --config gunicorn.conf.py).
+#
+# Our requests mostly wait on GCS, Stripe, Document AI and Mailgun, so each
+# worker process serves several requests at once:
+#
+#   GUNICORN_WORKER_CLASS  gthread (default) | gevent | sync
+#                          (gevent needs gevent and psycogreen from
+#                          requirements.txt; without gevent it falls back
+#                          to gthread with a warning, and never preloads)
+#   GUNICORN_WORKERS       processes; default one per available CPU
+#                          (2 * CPU + 1 for sync workers)
+#   GUNICORN_THREADS       threads per gthread worker (default 8)
+#   GUNICORN_WORKER_CONNECTIONS  greenlets per gevent worker (default 100)
+#
+# The resolved counts are exported back into the environment so
+# workschedule.database sizes each worker's connection pool to match.
+# GUNICORN_THREADS stays the number of OS threads (1 under gevent), since
+# the upload admission limits (services/admission.py) bound CPU-bound PDF
+# parsing, which greenlets do not parallelize; GUNICORN_WORKER_CONNECTIONS
+# is exported only for gevent and sizes the pool instead.
+
+import logging
+import os
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def _cpu_count():
+    try:
+        # Honors the CPU set the container was given, unlike os.cpu_count().
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+def _gevent_available():
+    try:
+        import gevent  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+if worker_class == "gevent" and not _gevent_available():
+    logger.warning("GUNICORN_WORKER_CLASS=gevent but gevent is not installed; using gthread")
+    worker_class = "gthread"
+
+_cpus = _cpu_count()
+workers = int(os.environ.get("GUNICORN_WORKERS") or (_cpus * 2 + 1 if worker_class == "sync" else _cpus))
+threads = int(os.environ.get("GUNICORN_THREADS", "8")) if worker_class == "gthread" else 1
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "100"))
+
+os.environ["GUNICORN_WORKERS"] = str(workers)
+os.environ["GUNICORN_THREADS"] = str(threads)
+if worker_class == "gevent":
+    os.environ["GUNICORN_WORKER_CONNECTIONS"] = str(worker_connections)
+else:
+    os.environ.pop("GUNICORN_WORKER_CONNECTIONS", None)
+
+# Import the app once in the master and fork it: workers boot in milliseconds
+# and share the imported code pages. The SDK clients, HTTP sessions, email
+# queue and database pools are all created lazily and dropped in the child
+# by os.register_at_fork hooks, so nothing connection-bearing crosses fork().
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+if worker_class == "gevent" and preload_app:
+    # gevent monkey-patches in the worker; a master that has already imported
+    # ssl, requests and the Google SDKs hands it unpatched modules (ssl
+    # RecursionError, MonkeyPatchWarning). Each gevent worker imports the app itself.
+    logger.info("preload_app is disabled for the gevent worker class")
+    preload_app = False
+
+# Recycle workers every ~1000 requests (jittered so they do not all restart
+# at once): PyMuPDF (fitz) grows the heap on large PDFs and never returns it.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", str(max(1, max_requests // 10))))
+
+# PDF parsing plus GCS/Stripe round trips can legitimately take a while.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# The worker heartbeat file lives in memory rather than on the container's disk layer.
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+
+def when_ready(server):
+    if preload_app:
+        # Runs in the master before any worker is forked: workers inherit
+        # fitz, icalendar and pytz already imported and exercised.
+        from workschedule.services import warmup
+        warmup.prewarm()
+    server.log.info("Serving with %s worker(s) x %s (%s), preload=%s, max_requests=%s+-%s",
+                    workers, worker_connections if worker_class == "gevent" else threads,
+                    worker_class, preload_app, max_requests, max_requests_jitter)
+
+
+def post_worker_init(worker):
+    # Runs in the worker after init_process(), which is where the gevent
+    # worker monkey-patches; post_fork would start these threads (and
+    # import ssl/requests through the app) before the patch.
+    if worker_class == "gevent":
+        # Make psycopg2 cooperative, otherwise a query blocks every greenlet.
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            worker.log.warning("psycogreen is not installed; database calls will block the gevent worker")
+    # Load Firebase signing keys in the background so logins never wait on
+    # them. Only serving workers do this: building the app (CLI commands,
+    # tests, perf scripts) stays offline, and without keys verification
+    # falls back to the SDK.
+    from workschedule.services import token_verifier
+    token_verifier.start()
+    # Open this worker's connections and finish warm-up before /readyz passes.
+    from workschedule.app import get_app
+    from workschedule.services import warmup
+    warmup.start(get_app())
+
+
+def worker_exit(server, worker):
+    # Workers recycle every max_requests: send what the email queue can in
+    # EMAIL_DRAIN_TIMEOUT_SECONDS and dead-letter the rest instead of
+    # dropping it with the process.
+    from workschedule.services import email_queue
+    email_queue.shutdown()
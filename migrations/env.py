@@ -104,6 +104,11 @@ def run_migrations_online():
         )
 
         with context.begin_transaction():
+            # The app engine's statement_timeout is meant for web requests;
+            # table rewrites and index builds (48e9973cf8e4, cf6b234776be)
+            # run far longer.
+            from workschedule.database import lift_statement_timeout
+            lift_statement_timeout(connection)
             context.run_migrations()
 
 
@@ -0,0 +1,44 @@
+"""create shift table
+
+Revision ID: 0ba51fa2657e
+Revises: cb977e73b9b9
+Create Date: 2026-10-19 10:04:17.283941
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0ba51fa2657e'
+down_revision = 'cb977e73b9b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('shift',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('uid', sa.String(length=64), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('job_id', sa.String(length=64), nullable=False),
+    sa.Column('starts_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('ends_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('store_number', sa.String(length=16), nullable=True),
+    sa.Column('department', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('uid')
+    )
+    with op.batch_alter_table('shift', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_shift_job_id'), ['job_id'], unique=False)
+        batch_op.create_index('ix_shift_user_id_starts_at', ['user_id', 'starts_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('shift', schema=None) as batch_op:
+        batch_op.drop_index('ix_shift_user_id_starts_at')
+        batch_op.drop_index(batch_op.f('ix_shift_job_id'))
+
+    op.drop_table('shift')
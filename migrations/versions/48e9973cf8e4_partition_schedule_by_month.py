@@ -0,0 +1,113 @@
+"""partition schedule by created_at month
+
+Revision ID: 48e9973cf8e4
+Revises: 0ba51fa2657e
+Create Date: 2026-10-19 11:20:03.518207
+
+On PostgreSQL the schedule table is rebuilt as a RANGE partitioned table on
+created_at with one partition per month (plus a DEFAULT partition), so the
+retention job can drop whole months instead of deleting rows. Partitioned
+tables can only enforce uniqueness that includes the partition key, so the
+primary key becomes (id, created_at) and job_id is unique per created_at.
+
+Other databases only get the created_at index.
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '48e9973cf8e4'
+down_revision = '0ba51fa2657e'
+branch_labels = None
+depends_on = None
+
+# Months of partitions created ahead of the current one.
+PARTITIONS_AHEAD = 3
+
+
+def _add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        with op.batch_alter_table('schedule', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_schedule_created_at'), ['created_at'], unique=False)
+        return
+
+    op.execute('ALTER TABLE schedule RENAME TO schedule_legacy')
+    op.execute('ALTER TABLE schedule_legacy RENAME CONSTRAINT schedule_pkey TO schedule_legacy_pkey')
+    op.execute("""
+        CREATE TABLE schedule (
+            id integer NOT NULL DEFAULT nextval('schedule_id_seq'),
+            user_email varchar(120) NOT NULL,
+            job_id varchar(64) NOT NULL,
+            schedule_data text NOT NULL,
+            created_at timestamp without time zone NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    oldest = bind.execute(sa.text(
+        "SELECT date_trunc('month', min(created_at))::date FROM schedule_legacy"
+    )).scalar()
+    this_month = datetime.date.today().replace(day=1)
+    month = min(oldest or this_month, this_month)
+    while month <= _add_months(this_month, PARTITIONS_AHEAD):
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE schedule_{month:%Y_%m} PARTITION OF schedule "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+    op.execute('CREATE TABLE schedule_default PARTITION OF schedule DEFAULT')
+
+    op.execute("""
+        INSERT INTO schedule (id, user_email, job_id, schedule_data, created_at)
+        SELECT id, user_email, job_id, schedule_data, coalesce(created_at, now())
+        FROM schedule_legacy
+    """)
+    op.execute('ALTER SEQUENCE schedule_id_seq OWNED BY schedule.id')
+    op.drop_table('schedule_legacy')
+
+    # Indexes are built after the copy; on the parent they cascade to every partition.
+    op.create_index('ix_schedule_job_id', 'schedule', ['job_id', 'created_at'], unique=True)
+    op.create_index('ix_schedule_user_email', 'schedule', ['user_email'], unique=False)
+    op.create_index('ix_schedule_created_at', 'schedule', ['created_at'], unique=False)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        with op.batch_alter_table('schedule', schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f('ix_schedule_created_at'))
+        return
+
+    op.execute('ALTER TABLE schedule RENAME TO schedule_partitioned')
+    op.execute('ALTER TABLE schedule_partitioned RENAME CONSTRAINT schedule_pkey TO schedule_partitioned_pkey')
+    op.execute("""
+        CREATE TABLE schedule (
+            id integer NOT NULL DEFAULT nextval('schedule_id_seq'),
+            user_email varchar(120) NOT NULL,
+            job_id varchar(64) NOT NULL,
+            schedule_data text NOT NULL,
+            created_at timestamp without time zone DEFAULT now(),
+            PRIMARY KEY (id)
+        )
+    """)
+    op.execute("""
+        INSERT INTO schedule (id, user_email, job_id, schedule_data, created_at)
+        SELECT id, user_email, job_id, schedule_data, created_at FROM schedule_partitioned
+    """)
+    op.execute('ALTER SEQUENCE schedule_id_seq OWNED BY schedule.id')
+    # Drops every partition with it.
+    op.execute('DROP TABLE schedule_partitioned')
+
+    with op.batch_alter_table('schedule', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_schedule_job_id'), ['job_id'], unique=True)
+        batch_op.create_index(batch_op.f('ix_schedule_user_email'), ['user_email'], unique=False)
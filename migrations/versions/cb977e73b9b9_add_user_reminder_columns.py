@@ -0,0 +1,30 @@
+"""add user reminder columns
+
+Revision ID: cb977e73b9b9
+Revises: 98fc02125d38
+Create Date: 2026-10-19 09:12:41.532118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cb977e73b9b9'
+down_revision = '98fc02125d38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('next_reminder_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('last_reminder_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_user_next_reminder_at'), ['next_reminder_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_next_reminder_at'))
+        batch_op.drop_column('last_reminder_at')
+        batch_op.drop_column('next_reminder_at')
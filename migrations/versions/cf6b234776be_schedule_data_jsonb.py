@@ -0,0 +1,46 @@
+"""schedule_data to JSONB with a GIN index
+
+Revision ID: cf6b234776be
+Revises: 48e9973cf8e4
+Create Date: 2026-10-19 12:02:41.730915
+
+The GIN index uses jsonb_path_ops: smaller and faster than the default
+operator class, and it supports the @> containment queries that
+db_service.find_schedules() issues (store number, department, shift date).
+Created on the partitioned parent, it cascades to every monthly partition.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'cf6b234776be'
+down_revision = '48e9973cf8e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite stores JSON as text already; nothing to convert or index.
+        return
+    op.alter_column('schedule', 'schedule_data',
+                    existing_type=sa.Text(),
+                    type_=postgresql.JSONB(),
+                    existing_nullable=False,
+                    postgresql_using='schedule_data::jsonb')
+    op.create_index('ix_schedule_schedule_data', 'schedule', ['schedule_data'], unique=False,
+                    postgresql_using='gin',
+                    postgresql_ops={'schedule_data': 'jsonb_path_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_schedule_schedule_data', table_name='schedule')
+    op.alter_column('schedule', 'schedule_data',
+                    existing_type=postgresql.JSONB(),
+                    type_=sa.Text(),
+                    existing_nullable=False,
+                    postgresql_using='schedule_data::text')
@@ -0,0 +1,63 @@
+"""
+Local stand-in for the Mailgun messages API.
+
+Starts a threaded HTTP server on 127.0.0.1 that accepts
+POST /v3/<domain>/messages, records each request and answers with the next
+status from ``statuses`` (200 once the list is exhausted). Point
+mailgun_service.MAILGUN_API_BASE at ``fake.api_base`` to use it.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeMailgun:
+    def __init__(self, statuses=None):
+        self.statuses = list(statuses or [])
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def api_base(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v3"
+
+    @property
+    def delivered(self):
+        return [r for r in self.requests if r["status"] == 200]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _next_status(self):
+        with self._lock:
+            return self.statuses.pop(0) if self.statuses else 200
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                status = fake._next_status()
+                with fake._lock:
+                    fake.requests.append({"path": self.path, "headers": dict(self.headers),
+                                          "body": body, "status": status})
+                payload = b'{"id": "<fake@mailgun>", "message": "Queued. Thank you."}'
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,77 @@
+import threading
+
+from flask import Flask
+
+from workschedule.services.admission import (AdmissionController, RateLimiter,
+                                             admission_controlled, client_id)
+
+
+def test_queue_full_is_rejected_immediately():
+    controller = AdmissionController("t", slots=1, queue_size=0, queue_timeout=5)
+    assert controller.acquire()
+    assert not controller.acquire()
+    controller.release()
+    assert controller.acquire()
+    assert controller.snapshot()["rejected"] == 1
+
+
+def test_queued_request_times_out():
+    controller = AdmissionController("t", slots=1, queue_size=1, queue_timeout=0.05)
+    assert controller.acquire()
+    assert not controller.acquire()
+    assert controller.snapshot()["waiting"] == 0
+
+
+def test_queued_request_gets_the_released_slot():
+    controller = AdmissionController("t", slots=1, queue_size=1, queue_timeout=5)
+    assert controller.acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(controller.acquire()))
+    waiter.start()
+    controller.release(0.1)
+    waiter.join(timeout=5)
+    assert results == [True]
+
+
+def test_token_bucket_refills_per_client():
+    now = [0.0]
+    limiter = RateLimiter(rate_per_second=0.5, burst=2, clock=lambda: now[0])
+    assert limiter.allow("a") == (True, 0)
+    assert limiter.allow("a") == (True, 0)
+    assert limiter.allow("a") == (False, 2)
+    assert limiter.allow("b") == (True, 0)
+    now[0] = 2.0
+    assert limiter.allow("a") == (True, 0)
+
+
+def test_decorator_sheds_with_retry_after():
+    controller = AdmissionController("t", slots=1, queue_size=0, queue_timeout=0)
+    limiter = RateLimiter(rate_per_second=1.0, burst=1, clock=lambda: 0.0)
+    app = Flask(__name__)
+    app.secret_key = "test"
+
+    @app.route("/heavy", methods=["POST"])
+    @admission_controlled(controller, limiter)
+    def heavy():
+        return "done"
+
+    client = app.test_client()
+    assert client.post("/heavy").data == b"done"
+    limited = client.post("/heavy")
+    assert limited.status_code == 429 and limited.headers["Retry-After"] == "1"
+
+    controller.acquire()  # another request holds the only slot
+    busy = client.post("/heavy", environ_base={"REMOTE_ADDR": "10.0.0.2"})
+    assert busy.status_code == 503
+    assert int(busy.headers["Retry-After"]) >= 1
+
+
+def test_client_id_ignores_client_supplied_forwarded_hops():
+    app = Flask(__name__)
+    app.secret_key = "test"
+    # Cloud Run appends the address it saw to whatever the client sent.
+    for spoofed in ("1.1.1.1", "2.2.2.2, 3.3.3.3"):
+        with app.test_request_context(headers={"X-Forwarded-For": f"{spoofed}, 203.0.113.7"}):
+            assert client_id() == "ip:203.0.113.7"
+    with app.test_request_context(environ_base={"REMOTE_ADDR": "10.0.0.9"}):
+        assert client_id() == "ip:10.0.0.9"
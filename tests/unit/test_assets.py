@@ -0,0 +1,76 @@
+import gzip
+import json
+import os
+
+from flask import Flask, url_for
+
+from workschedule import assets
+
+CSS = b"body { color: #333; }\n" * 40
+
+
+def _source(tmp_path):
+    src = tmp_path / "static"
+    (src / "css").mkdir(parents=True)
+    (src / "css" / "main.css").write_bytes(CSS)
+    (src / "img").mkdir()
+    (src / "img" / "logo.png").write_bytes(b"\x89PNG" + b"\0" * 400)
+    return str(src)
+
+
+def _app(tmp_path):
+    src = _source(tmp_path)
+    out = str(tmp_path / "dist")
+    manifest = assets.build(src, out)
+    app = Flask(__name__, static_folder=src)
+    assert assets.init_app(app, out)
+    return app, manifest
+
+
+def test_build_writes_hashed_files_variants_and_manifest(tmp_path):
+    out = tmp_path / "dist"
+    manifest = assets.build(_source(tmp_path), str(out))
+
+    hashed = manifest["css/main.css"]
+    assert hashed == assets.hashed_name("css/main.css", CSS) and hashed != "css/main.css"
+    assert (out / hashed).read_bytes() == CSS
+    assert gzip.decompress((out / (hashed + ".gz")).read_bytes()) == CSS
+    # Images are not recompressed.
+    assert not os.path.exists(out / (manifest["img/logo.png"] + ".gz"))
+    assert json.loads((out / "manifest.json").read_text()) == manifest
+
+
+def test_url_for_resolves_hashed_names(tmp_path):
+    app, manifest = _app(tmp_path)
+    with app.test_request_context():
+        assert url_for("static", filename="css/main.css") == "/static/" + manifest["css/main.css"]
+        assert url_for("static", filename="css/missing.css") == "/static/css/missing.css"
+
+
+def test_hashed_asset_served_precompressed_and_immutable(tmp_path):
+    app, manifest = _app(tmp_path)
+    url = "/static/" + manifest["css/main.css"]
+    client = app.test_client()
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.mimetype == "text/css"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data) == CSS
+
+    plain = client.get(url, headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.data == CSS
+
+
+def test_logical_names_fall_back_to_flask_static(tmp_path):
+    app, _ = _app(tmp_path)
+    response = app.test_client().get("/static/css/main.css")
+    assert response.status_code == 200
+    assert "immutable" not in response.headers.get("Cache-Control", "")
+
+
+def test_no_manifest_leaves_app_untouched(tmp_path):
+    app = Flask(__name__)
+    assert assets.init_app(app, str(tmp_path / "nothing")) is False
@@ -0,0 +1,110 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from workschedule.services import checkout_cache
+from workschedule.services.checkout_cache import CheckoutSessionCache
+
+
+def _fake_session(n):
+    return SimpleNamespace(id=f"cs_{n}", url=f"https://checkout.stripe.com/{n}",
+                           expires_at=int(time.time()) + 1800)
+
+
+def test_resubmit_reuses_cached_session():
+    cache = CheckoutSessionCache()
+    calls = []
+
+    def create():
+        calls.append(1)
+        return _fake_session(len(calls))
+
+    first = cache.get_or_create("job-1", create)
+    second = cache.get_or_create("job-1", create)
+    assert first.url == second.url
+    assert len(calls) == 1
+
+
+def test_expired_session_is_recreated():
+    cache = CheckoutSessionCache()
+    expired = SimpleNamespace(id="cs_old", url="https://old", expires_at=int(time.time()) + 60)
+    cache.get_or_create("job-1", lambda: expired)
+    fresh = cache.get_or_create("job-1", lambda: _fake_session("new"))
+    assert fresh.id == "cs_new"
+
+
+def test_failures_are_not_cached():
+    cache = CheckoutSessionCache()
+    assert cache.get_or_create("job-1", lambda: None) is None
+    assert cache.get_or_create("job-1", lambda: _fake_session(1)).id == "cs_1"
+
+
+def test_concurrent_requests_single_flight():
+    cache = CheckoutSessionCache()
+    calls = []
+    gate = threading.Event()
+
+    def create():
+        calls.append(1)
+        gate.wait(1)
+        return _fake_session(1)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_create("job-1", create)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert {r.id for r in results} == {"cs_1"}
+
+
+def test_invalidate_drops_entry():
+    cache = CheckoutSessionCache()
+    cache.get_or_create("job-1", lambda: _fake_session(1))
+    cache.invalidate("job-1")
+    assert cache.get("job-1") is None
+
+
+def test_ttl_stays_clear_of_stripe_minimum():
+    assert checkout_cache.CHECKOUT_SESSION_TTL_SECONDS >= checkout_cache.STRIPE_MIN_EXPIRY_SECONDS + 300
+    assert checkout_cache.CHECKOUT_SESSION_TTL_SECONDS <= checkout_cache.STRIPE_MAX_EXPIRY_SECONDS
+
+
+def test_late_arrival_queues_behind_in_flight_create():
+    cache = CheckoutSessionCache()
+    calls = []
+    started, gate = threading.Event(), threading.Event()
+
+    def create():
+        calls.append(1)
+        started.set()
+        gate.wait(1)
+        return _fake_session(len(calls))
+
+    results = []
+
+    def request():
+        results.append(cache.get_or_create("job-1", create))
+
+    first = threading.Thread(target=request)
+    first.start()
+    started.wait(1)
+    waiter = threading.Thread(target=request)
+    waiter.start()
+    time.sleep(0.05)
+    gate.set()
+    first.join()
+    # Arrives while the waiter may still be on the lock: same lock, no new create().
+    late = threading.Thread(target=request)
+    late.start()
+    waiter.join()
+    late.join()
+
+    assert len(calls) == 1
+    assert {r.id for r in results} == {"cs_1"}
+    assert cache._key_locks == {}
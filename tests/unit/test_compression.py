@@ -0,0 +1,88 @@
+import gzip
+
+from flask import Flask, Response, jsonify, stream_with_context
+
+from workschedule.middleware.compression import CompressionMiddleware, accepted_encodings
+
+BIG_HTML = "<li>Mon, Oct 06 9:00 AM - 5:00 PM</li>\n" * 200
+
+
+def _app():
+    app = Flask(__name__)
+
+    @app.route("/page")
+    def page():
+        return BIG_HTML
+
+    @app.route("/small")
+    def small():
+        return jsonify(ok=True)
+
+    @app.route("/export")
+    def export():
+        def rows():
+            for i in range(500):
+                yield f"{i},0660,Deli\n"
+        return Response(stream_with_context(rows()), mimetype="text/csv")
+
+    @app.route("/calendar.ics")
+    def calendar():
+        return Response("BEGIN:VCALENDAR\n" * 500, mimetype="text/calendar")
+
+    @app.route("/encoded")
+    def encoded():
+        response = Response(gzip.compress(BIG_HTML.encode()), mimetype="text/css")
+        response.headers["Content-Encoding"] = "gzip"
+        return response
+
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, min_bytes=1024)
+    return app
+
+
+def test_accepted_encodings_honours_q_zero():
+    assert accepted_encodings("gzip;q=0, br, deflate;q=0.5") == {"br", "deflate"}
+    assert accepted_encodings(None) == set()
+
+
+def test_large_html_is_gzipped_with_exact_length():
+    response = _app().test_client().get("/page", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert int(response.headers["Content-Length"]) == len(response.data)
+    assert gzip.decompress(response.data).decode() == BIG_HTML
+
+
+def test_client_without_gzip_gets_plain_body_and_vary():
+    response = _app().test_client().get("/page")
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.get_data(as_text=True) == BIG_HTML
+
+
+def test_small_responses_pass_through():
+    response = _app().test_client().get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.json == {"ok": True}
+
+
+def test_streamed_responses_are_compressed_incrementally():
+    response = _app().test_client().get("/export", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    body = gzip.decompress(response.data).decode()
+    assert body.startswith("0,0660,Deli\n") and body.endswith("499,0660,Deli\n")
+
+
+def test_calendar_and_already_encoded_responses_are_untouched():
+    client = _app().test_client()
+    ics = client.get("/calendar.ics", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in ics.headers
+    assert ics.data.startswith(b"BEGIN:VCALENDAR")
+
+    encoded = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+    assert gzip.decompress(encoded.data).decode() == BIG_HTML
+
+
+def test_head_requests_are_not_encoded():
+    response = _app().test_client().head("/page", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
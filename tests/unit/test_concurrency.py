@@ -0,0 +1,160 @@
+import threading
+import time
+
+from flask import Flask
+
+from workschedule import concurrency
+from workschedule.concurrency import RequestTrace
+
+
+def test_overlap_is_time_spent_running_concurrently():
+    trace = RequestTrace()
+    trace.add('a', 0.0, 1.0)
+    trace.add('b', 0.5, 1.5)   # overlaps a by 0.5
+    trace.add('c', 2.0, 2.25)  # disjoint
+    assert abs(trace.overlap_seconds() - 0.5) < 1e-9
+
+
+def test_sequential_steps_save_nothing():
+    trace = RequestTrace()
+    trace.add('a', 0.0, 1.0)
+    trace.add('b', 1.0, 2.0)
+    assert trace.overlap_seconds() == 0.0
+    assert trace.server_timing() == 'a;dur=1000.0, b;dur=1000.0, overlap-saved;dur=0.0'
+
+
+def test_empty_trace_has_no_header():
+    assert RequestTrace().server_timing() == ''
+
+
+def _app():
+    app = Flask(__name__)
+    concurrency.init_app(app)
+    return app
+
+
+def test_submitted_steps_overlap_and_are_reported():
+    app = _app()
+    started = threading.Barrier(2)
+
+    def io_call():
+        started.wait(timeout=5)
+        time.sleep(0.05)
+        return 'ok'
+
+    @app.route('/')
+    def index():
+        first = concurrency.submit('first', io_call)
+        second = concurrency.submit('second', io_call)
+        return first.result() + second.result()
+
+    response = app.test_client().get('/')
+    assert response.data == b'okok'
+    timing = response.headers['Server-Timing']
+    assert 'first;dur=' in timing and 'second;dur=' in timing
+    saved = float(timing.rsplit('overlap-saved;dur=', 1)[1])
+    assert saved > 25
+
+
+def test_background_failures_are_logged_not_raised(caplog):
+    app = _app()
+
+    def boom():
+        raise RuntimeError('gone')
+
+    @app.route('/')
+    def index():
+        concurrency.background('delete', boom).exception(timeout=5)
+        return 'done'
+
+    with caplog.at_level('WARNING', logger='workschedule.concurrency'):
+        response = app.test_client().get('/')
+        # The done-callback runs just after the future resolves.
+        deadline = time.time() + 5
+        while 'failed' not in caplog.text and time.time() < deadline:
+            time.sleep(0.01)
+    assert response.status_code == 200
+    assert 'Background step delete failed: gone' in caplog.text
+
+
+def test_requests_without_steps_get_no_header():
+    app = _app()
+    app.add_url_rule('/', 'index', lambda: 'plain')
+    assert 'Server-Timing' not in app.test_client().get('/').headers
+
+
+def test_submit_in_app_context_runs_inside_the_app():
+    app = _app()
+
+    @app.route('/')
+    def index():
+        from flask import current_app
+        return concurrency.submit_in_app_context('db', lambda: current_app.name).result()
+
+    assert app.test_client().get('/').data == app.name.encode()
+
+
+def _payment_client(monkeypatch, upload):
+    from workschedule.routes import schedule
+    deleted = []
+    monkeypatch.setattr(schedule, '_download_from_gcs',
+                        lambda path: '{"shifts": [{"shift_date": "Mon, Oct 06", '
+                                     '"shift_start": "9:00 AM", "shift_end": "5:00 PM"}]}')
+    monkeypatch.setattr(schedule, '_upload_ics_to_gcs', upload)
+    monkeypatch.setattr(schedule, '_delete_from_gcs', deleted.append)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(schedule.schedule_bp)
+    return app.test_client(), deleted
+
+
+def test_payment_success_keeps_parsed_json_when_ics_upload_fails(monkeypatch):
+    def failing_upload(content, path):
+        raise RuntimeError('gcs down')
+
+    client, deleted = _payment_client(monkeypatch, failing_upload)
+    assert client.get('/schedule/payment_success?job_id=j1').status_code == 500
+    concurrency.get_executor().submit(lambda: None).result()
+    assert deleted == []
+
+
+def test_payment_success_deletes_parsed_json_after_upload(monkeypatch):
+    client, deleted = _payment_client(monkeypatch, lambda content, path: None)
+    assert client.get('/schedule/payment_success?job_id=j1').status_code == 200
+    deadline = time.time() + 5
+    while not deleted and time.time() < deadline:
+        time.sleep(0.01)
+    assert deleted == ['parsed/j1.json']
+
+
+def test_payment_success_queues_the_receipt_to_the_stripe_customer(monkeypatch):
+    from workschedule.services import mailgun_service, stripe_service
+    queued = []
+    monkeypatch.setattr(stripe_service, 'paid_checkout_email',
+                        lambda session_id, job_id: 'payer@example.com' if session_id == 'cs_1' else None)
+    monkeypatch.setattr(mailgun_service, 'queue_receipt_with_ics',
+                        lambda to_email, name, shifts, ics: queued.append((to_email, ics)))
+    client, _ = _payment_client(monkeypatch, lambda content, path: None)
+
+    assert client.get('/schedule/payment_success?job_id=j1&session_id=cs_1').status_code == 200
+    [(to_email, ics)] = queued
+    assert to_email == 'payer@example.com'
+    assert ics.startswith(b'BEGIN:VCALENDAR')
+
+    assert client.get('/schedule/payment_success?job_id=j1').status_code == 200
+    assert len(queued) == 1
+
+
+def test_receipt_address_needs_a_paid_session_for_the_same_job(monkeypatch):
+    import stripe
+
+    from workschedule.services import stripe_service
+
+    def retrieve(session_id):
+        return stripe.checkout.Session.construct_from(
+            {'id': session_id, 'payment_status': 'paid', 'metadata': {'job_id': 'j1'},
+             'customer_details': {'email': 'payer@example.com'}}, 'sk_test')
+
+    monkeypatch.setattr(stripe.checkout.Session, 'retrieve', retrieve)
+    assert stripe_service.paid_checkout_email('cs_1', 'j1') == 'payer@example.com'
+    assert stripe_service.paid_checkout_email('cs_1', 'j2') is None
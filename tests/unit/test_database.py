@@ -0,0 +1,73 @@
+import os
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from workschedule.database import (InstrumentedQueuePool, engine_options, lift_statement_timeout,
+                                   pool_settings, pool_wait)
+
+TEST_POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+
+def test_pool_budget_is_split_across_instances_and_workers():
+    env = {"GUNICORN_WORKERS": "2", "GUNICORN_THREADS": "4",
+           "CLOUD_RUN_MAX_INSTANCES": "3", "DB_MAX_CONNECTIONS": "100",
+           "DB_RESERVED_CONNECTIONS": "4"}
+    settings = pool_settings(env)
+    # 96 usable connections over 6 processes.
+    assert settings == {"pool_size": 4, "max_overflow": 12}
+
+
+def test_pool_never_drops_below_one_connection():
+    env = {"GUNICORN_WORKERS": "8", "GUNICORN_THREADS": "8",
+           "CLOUD_RUN_MAX_INSTANCES": "10", "DB_MAX_CONNECTIONS": "25"}
+    assert pool_settings(env) == {"pool_size": 1, "max_overflow": 0}
+
+
+def test_gevent_pool_is_sized_by_worker_connections():
+    env = {"GUNICORN_WORKERS": "1", "GUNICORN_THREADS": "1", "GUNICORN_WORKER_CONNECTIONS": "100",
+           "DB_MAX_CONNECTIONS": "25", "DB_RESERVED_CONNECTIONS": "3"}
+    assert pool_settings(env) == {"pool_size": 22, "max_overflow": 0}
+
+
+def test_engine_options_only_apply_to_postgresql():
+    assert engine_options("sqlite://") == {}
+    options = engine_options("postgresql+psycopg2://u:p@/db", env={})
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_pre_ping"] is True
+    assert "statement_timeout" in options["connect_args"]["options"]
+
+
+def test_pool_timeout_is_recorded_once_as_a_timeout():
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(":memory:"),
+                                 pool_size=1, max_overflow=0, timeout=0.01)
+    held = pool.connect()
+    before = pool_wait.snapshot()
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    after = pool_wait.snapshot()
+    held.close()
+    assert after["timeout"]["count"] == before.get("timeout", {"count": 0})["count"] + 1
+    assert after["checkout"]["count"] == before["checkout"]["count"]
+
+
+def test_maintenance_transactions_outlive_the_statement_timeout():
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL not set")
+    engine = create_engine(TEST_POSTGRES_URL,
+                           connect_args={"options": "-c statement_timeout=50"})
+    try:
+        with engine.begin() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT pg_sleep(0.2)"))
+        with engine.begin() as connection:
+            lift_statement_timeout(connection)
+            connection.execute(text("SELECT pg_sleep(0.2)"))
+        # SET LOCAL: the next transaction is back under the timeout.
+        with engine.begin() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT pg_sleep(0.2)"))
+    finally:
+        engine.dispose()
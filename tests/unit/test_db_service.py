@@ -0,0 +1,171 @@
+import datetime
+import io
+import os
+
+import pytest
+from flask import Flask
+from sqlalchemy import text
+
+from workschedule.app import db
+from workschedule.services import db_service
+from workschedule.services.db_service import (
+    build_shift_rows, find_schedules, get_job_shifts, save_shifts,
+)
+
+# The psycopg2 upsert paths need a real PostgreSQL; point this at a scratch database.
+TEST_POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+SHIFTS = [
+    {"shift_date": "Mon, Sep 08", "shift_start": "9:00 AM", "shift_end": "5:00 PM",
+     "department": "Deli", "store_number": "#0123"},
+    {"shift_date": "Tue, Sep 09", "shift_start": "10:00 PM", "shift_end": "6:00 AM",
+     "department": "", "store_number": "#0123"},
+]
+
+
+@pytest.fixture
+def app():
+    from workschedule import models  # noqa: F401  (registers the tables)
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def test_build_shift_rows_handles_overnight_and_blank_department():
+    rows = build_shift_rows(SHIFTS, "America/New_York", "job-1", year=2025)
+    assert len(rows) == 2
+    overnight = rows[1]
+    assert overnight["ends_at"].day == 10
+    assert overnight["department"] is None
+
+
+def test_save_shifts_is_idempotent_on_reupload(app):
+    rows = build_shift_rows(SHIFTS, "America/New_York", "job-1", year=2025)
+    assert save_shifts(rows + rows[:1]) == 2
+    for row in rows:
+        row["store_number"] = "#0456"
+    save_shifts(rows)
+
+    stored = get_job_shifts("job-1")
+    assert len(stored) == 2
+    assert {s.store_number for s in stored} == {"#0456"}
+
+
+def test_find_schedules_matches_filters_within_one_shift(app):
+    from workschedule.models import Schedule
+    db.session.add_all([
+        Schedule(user_email="a@example.com", job_id="deli-0123",
+                 schedule_data={"timezone": "UTC", "shifts": SHIFTS}),
+        Schedule(user_email="b@example.com", job_id="bakery-0660",
+                 schedule_data={"timezone": "UTC", "shifts": [
+                     {**SHIFTS[0], "department": "Bakery", "store_number": "#0660"}]}),
+    ])
+    db.session.commit()
+
+    assert [s.job_id for s in find_schedules(store_number="0660")] == ["bakery-0660"]
+    assert [s.job_id for s in find_schedules(store_number="#0660")] == ["bakery-0660"]
+    assert [s.job_id for s in find_schedules(store_number="0123", department="Deli")] == ["deli-0123"]
+    # Deli and 0660 both occur, but never in the same shift.
+    assert find_schedules(store_number="0660", department="Deli") == []
+    assert find_schedules(created_to=datetime.datetime(2000, 1, 1)) == []
+
+
+def test_store_filter_matches_parser_output(app):
+    from workschedule.models import Schedule
+    from workschedule.routes.schedule import build_display_shifts, parse_schedule_text
+    shifts = build_display_shifts(parse_schedule_text(
+        "Oct 6 9:00 AM - 5:00 PM [8:00] 0660 - Store 026\n"
+        "Oct 7 9:00 AM - 5:00 PM [8:00] 0660 - Store 026"))
+    db.session.add(Schedule(user_email="a@example.com", job_id="parsed",
+                            schedule_data={"timezone": "UTC", "shifts": shifts}))
+    db.session.commit()
+
+    assert [s.job_id for s in find_schedules(store_number="0660")] == ["parsed"]
+    assert [s.job_id for s in find_schedules(store_number="0660", department="026")] == ["parsed"]
+
+
+@pytest.fixture
+def pg_app():
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL not set")
+    from workschedule import models  # noqa: F401
+    schema = f"db_service_test_{os.getpid()}"
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = TEST_POSTGRES_URL
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"options": f"-csearch_path={schema}"}}
+    db.init_app(app)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA {schema}"))
+        db.create_all()
+        try:
+            yield app
+        finally:
+            db.session.remove()
+            with db.engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+            db.engine.dispose()
+
+
+def test_anonymous_reuploads_of_the_same_schedule_keep_one_set_of_rows(app, monkeypatch):
+    from workschedule.models import Shift
+    from workschedule.routes import schedule
+    text = "\n".join(["Oct 6 9:00 AM - 5:00 PM [8:00] 0660 - Store 026",
+                      "Oct 7 10:00 AM - 6:00 PM [8:00] 0660 - Store 026"])
+    monkeypatch.setattr(schedule, "extract_text_from_pdf", lambda contents: text)
+    monkeypatch.setattr(schedule, "_upload_to_gcs", lambda data, path: None)
+    app.secret_key = "test"
+    app.register_blueprint(schedule.schedule_bp)
+    client = app.test_client()
+
+    def upload():
+        client.post("/schedule/upload_pdf", data={"pdfFile": (io.BytesIO(b"%PDF"), "s.pdf")})
+        with client.session_transaction() as session:
+            return session["job_id"]
+
+    assert upload() != upload()
+    assert Shift.query.count() == 2
+    # Another browser is another uploader.
+    app.test_client().post("/schedule/upload_pdf", data={"pdfFile": (io.BytesIO(b"%PDF"), "s.pdf")})
+    assert Shift.query.count() == 4
+
+
+def test_shift_uid_follows_the_owner_not_the_upload():
+    user_rows = [build_shift_rows(SHIFTS, "America/New_York", job, user_id=7, year=2025)
+                 for job in ("job-1", "job-2")]
+    anon_rows = [build_shift_rows(SHIFTS, "America/New_York", job, year=2025, owner_key="b1")
+                 for job in ("job-1", "job-2")]
+    job_rows = [build_shift_rows(SHIFTS, "America/New_York", job, year=2025)
+                for job in ("job-1", "job-2")]
+    # Re-uploads by the same user or anonymous uploader map onto the same rows.
+    assert [r["uid"] for r in user_rows[0]] == [r["uid"] for r in user_rows[1]]
+    assert [r["uid"] for r in anon_rows[0]] == [r["uid"] for r in anon_rows[1]]
+    assert not {r["uid"] for r in anon_rows[0]} & {r["uid"] for r in user_rows[0]}
+    # With no owner at all, rows stay scoped to their upload.
+    assert not {r["uid"] for r in job_rows[0]} & {r["uid"] for r in job_rows[1]}
+    assert user_rows[0][0]["starts_at"].utcoffset() == datetime.timedelta(hours=-4)
+
+
+def _reupload_moves_rows_to_the_new_job():
+    from workschedule.models import Shift, User
+    user = User(firebase_uid="u1", email="u1@example.com")
+    db.session.add(user)
+    db.session.commit()
+    assert save_shifts(build_shift_rows(SHIFTS, "UTC", "job-1", user_id=user.id, year=2025)) == 2
+    assert save_shifts(build_shift_rows(SHIFTS, "UTC", "job-2", user_id=user.id, year=2025)) == 2
+    assert Shift.query.count() == 2
+    assert {s.job_id for s in Shift.query} == {"job-2"}
+
+
+def test_logged_in_reupload_updates_instead_of_failing(app):
+    _reupload_moves_rows_to_the_new_job()
+
+
+@pytest.mark.parametrize("copy_threshold", [5000, 1])
+def test_postgres_reupload_updates_instead_of_failing(pg_app, monkeypatch, copy_threshold):
+    # copy_threshold=1 sends the rows through the COPY path.
+    monkeypatch.setattr(db_service, "COPY_THRESHOLD", copy_threshold)
+    _reupload_moves_rows_to_the_new_job()
@@ -0,0 +1,165 @@
+import os
+import time
+
+import pytest
+
+from tests.fake_mailgun import FakeMailgun
+from workschedule.services import mailgun_service
+from workschedule.services.email_queue import EmailQueue, replay_dead_letters
+
+
+@pytest.fixture
+def mailgun_env(monkeypatch):
+    monkeypatch.setenv("MAILGUN_API_KEY", "key-test")
+    monkeypatch.setenv("MAILGUN_DOMAIN", "mg.example.com")
+
+
+def _queue(tmp_path, **kwargs):
+    senders = {"simple": mailgun_service.send_simple_message,
+               "receipt": mailgun_service.send_receipt_with_ics}
+    return EmailQueue(senders=senders, workers=2, retry_base_seconds=0.01,
+                      dead_letter_path=str(tmp_path / "dead.jsonl"), **kwargs)
+
+
+def test_receipt_is_sent_in_background(monkeypatch, tmp_path, mailgun_env):
+    with FakeMailgun() as fake:
+        monkeypatch.setattr(mailgun_service, "MAILGUN_API_BASE", fake.api_base)
+        q = _queue(tmp_path)
+        job_id = q.enqueue("receipt", to_email="a@example.com", customer_name="Ann",
+                           shifts_data=[], ics_content=b"BEGIN:VCALENDAR")
+        assert job_id
+        assert q.join(timeout=5)
+        q.stop()
+
+    assert len(fake.delivered) == 1
+    request = fake.delivered[0]
+    assert request["path"] == "/v3/mg.example.com/messages"
+    assert b"BEGIN:VCALENDAR" in request["body"]
+
+
+def test_failed_sends_are_retried(monkeypatch, tmp_path, mailgun_env):
+    with FakeMailgun(statuses=[500, 500]) as fake:
+        monkeypatch.setattr(mailgun_service, "MAILGUN_API_BASE", fake.api_base)
+        q = _queue(tmp_path)
+        q.enqueue("simple", to_email="a@example.com", subject="hi", text_content="hello")
+        assert q.join(timeout=5)
+        q.stop()
+
+    assert [r["status"] for r in fake.requests] == [500, 500, 200]
+    assert q.sent == 1
+
+
+def test_exhausted_jobs_are_dead_lettered_and_replayable(monkeypatch, tmp_path, mailgun_env):
+    with FakeMailgun(statuses=[500, 500]) as fake:
+        monkeypatch.setattr(mailgun_service, "MAILGUN_API_BASE", fake.api_base)
+        q = _queue(tmp_path, max_attempts=2)
+        q.enqueue("receipt", to_email="a@example.com", customer_name="Ann",
+                  shifts_data=[], ics_content=b"ICS")
+        assert q.join(timeout=5)
+        assert q.dead_lettered == 1
+
+        assert replay_dead_letters(q, path=str(tmp_path / "dead.jsonl")) == 1
+        assert q.join(timeout=5)
+        q.stop()
+
+    assert len(fake.delivered) == 1
+    assert b"ICS" in fake.delivered[0]["body"]
+
+
+def test_full_queue_does_not_block(tmp_path):
+    q = EmailQueue(senders={"simple": lambda **kw: True}, workers=0, maxsize=1,
+                   dead_letter_path=str(tmp_path / "dead.jsonl"))
+    assert q.enqueue("simple", to_email="a@example.com")
+    assert q.enqueue("simple", to_email="b@example.com") is None
+    assert q.dead_lettered == 1
+
+
+def test_dead_letters_written_during_replay_are_kept(monkeypatch, tmp_path):
+    from workschedule.services import email_queue
+    path = str(tmp_path / "dead.jsonl")
+    q = EmailQueue(senders={"simple": lambda **kw: True}, workers=0, maxsize=1,
+                   dead_letter_path=path)
+    q.enqueue("simple", to_email="a@example.com")
+    q.enqueue("simple", to_email="b@example.com")  # queue full: dead-lettered
+    q._queue.get_nowait()
+    q._queue.task_done()
+
+    real_remove = os.remove
+
+    def remove_while_a_sender_gives_up(target):
+        # A sender thread dead-letters a job after the replay read the file.
+        q._dead_letter(email_queue.EmailJob(kind="simple", kwargs={"to_email": "c@example.com"}))
+        real_remove(target)
+
+    monkeypatch.setattr(email_queue.os, "remove", remove_while_a_sender_gives_up)
+    assert replay_dead_letters(q, path=path) == 1
+    with open(path) as f:
+        assert "c@example.com" in f.read()
+
+
+def test_shutdown_dead_letters_mail_still_waiting_to_retry(tmp_path):
+    path = str(tmp_path / "dead.jsonl")
+    q = EmailQueue(senders={"simple": lambda **kw: False}, workers=1, retry_base_seconds=60,
+                   dead_letter_path=path)
+    q.enqueue("simple", to_email="a@example.com")
+    deadline = time.time() + 5
+    while not q._retry_heap and time.time() < deadline:
+        time.sleep(0.01)
+    assert q.pending() == 1
+
+    assert q.shutdown(timeout=0.05) == 1
+    assert q.pending() == 0
+    with open(path) as f:
+        assert "a@example.com" in f.read()
+    # The queue can be used again afterwards.
+    q._senders["simple"] = lambda **kw: True
+    q.enqueue("simple", to_email="b@example.com")
+    assert q.join(timeout=5)
+    assert q.sent == 1
+    q.stop()
+
+
+class _FakeBlob:
+    def __init__(self, store, name):
+        self.store, self.name = store, name
+        self.generation = store.get(name, (None, 0))[1]
+
+    def upload_from_string(self, data, content_type=None):
+        self.store[self.name] = (data, self.generation + 1)
+
+    def download_as_text(self):
+        return self.store[self.name][0]
+
+    def delete(self, if_generation_match=None):
+        assert if_generation_match == self.store[self.name][1]
+        del self.store[self.name]
+
+
+class _FakeBucket:
+    def __init__(self):
+        self.store = {}
+
+    def blob(self, name):
+        return _FakeBlob(self.store, name)
+
+    def list_blobs(self, prefix):
+        return [_FakeBlob(self.store, name) for name in sorted(self.store) if name.startswith(prefix)]
+
+
+def test_dead_letters_can_live_in_gcs(monkeypatch):
+    from workschedule import clients
+    bucket = _FakeBucket()
+    monkeypatch.setattr(clients, "get_gcs_bucket", lambda name=None: bucket)
+    url = "gs://bucket/dead-letter/email"
+    q = EmailQueue(senders={"simple": lambda **kw: True}, workers=0, maxsize=1,
+                   dead_letter_path=url)
+    q.enqueue("simple", to_email="a@example.com")
+    q.enqueue("simple", to_email="b@example.com")  # queue full: dead-lettered
+    [name] = bucket.store
+    assert name.startswith("dead-letter/email/") and "b@example.com" in bucket.store[name][0]
+
+    q._queue.get_nowait()
+    q._queue.task_done()
+    assert replay_dead_letters(q, path=url) == 1
+    assert bucket.store == {}
+    assert q._queue.get_nowait().kwargs == {"to_email": "b@example.com"}
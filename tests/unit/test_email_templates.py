@@ -0,0 +1,34 @@
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from workschedule.services import email_templates
+from workschedule.services.email_templates import render_receipt, render_receipts
+
+
+def _jinja_render(name, **values):
+    env = Environment(loader=FileSystemLoader(email_templates.EMAIL_TEMPLATE_DIR),
+                      autoescape=select_autoescape(["html"]), keep_trailing_newline=True)
+    return env.get_template(name).render(google_url=email_templates.GOOGLE_CALENDAR_URL,
+                                         outlook_url=email_templates.OUTLOOK_CALENDAR_URL,
+                                         **values)
+
+
+def test_prerendered_receipt_matches_plain_jinja_render():
+    html, text = render_receipt("Ann", "work_schedule_20251007_0930.ics")
+    values = {"customer_name": "Ann", "filename": "work_schedule_20251007_0930.ics"}
+    assert html == _jinja_render("receipt.html", **values)
+    assert text == _jinja_render("receipt.txt", **values)
+    assert "Hello Ann," in html
+    assert email_templates.GOOGLE_CALENDAR_URL in html
+
+
+def test_customer_name_is_escaped_in_html_only():
+    html, text = render_receipt("<b>Bob</b>", "f.ics")
+    assert "&lt;b&gt;Bob&lt;/b&gt;" in html
+    assert "Hello <b>Bob</b>," in text
+
+
+def test_batch_render_keeps_order():
+    rendered = render_receipts([{"customer_name": "Ann", "filename": "a.ics"},
+                                {"customer_name": "Bob", "filename": "b.ics"}])
+    assert "Hello Ann," in rendered[0][0] and "a.ics" in rendered[0][1]
+    assert "Hello Bob," in rendered[1][0] and "b.ics" in rendered[1][1]
@@ -0,0 +1,69 @@
+import csv
+import datetime
+import io
+import json
+
+import pytest
+from flask import Flask
+
+from workschedule.app import db
+from workschedule.routes import admin
+from workschedule.services import export_service
+
+SHIFT = {"shift_date": "Mon, Sep 08", "shift_start": "9:00 AM", "shift_end": "5:00 PM",
+         "department": "Deli", "store_number": "#0660"}
+
+
+@pytest.fixture
+def app(monkeypatch):
+    from workschedule.models import Schedule
+    monkeypatch.setattr(admin, "ADMIN_API_TOKEN", "s3cret")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    app.register_blueprint(admin.admin_bp)
+    with app.app_context():
+        db.create_all()
+        for i in range(25):
+            store = "#0660" if i % 5 == 0 else "#0123"
+            db.session.add(Schedule(
+                user_email=f"u{i}@example.com", job_id=f"job-{i}",
+                created_at=datetime.datetime(2026, 10, 1 + i),
+                schedule_data={"timezone": "UTC", "shifts": [{**SHIFT, "store_number": store}]}))
+        db.session.commit()
+        yield app
+
+
+def test_ndjson_export_streams_in_small_batches(app):
+    chunks = list(export_service.export("schedules", "ndjson", batch_size=4, store_number="0660"))
+    rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert len(rows) == 5
+    assert {r["schedule_data"]["shifts"][0]["store_number"] for r in rows} == {"#0660"}
+
+
+def test_csv_chunks_stay_bounded(app, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_CHUNK_BYTES", 200)
+    chunks = list(export_service.export("schedules", "csv"))
+    assert len(chunks) > 5
+    assert max(len(c) for c in chunks) < 1000
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert len(rows) == 25
+    assert json.loads(rows[0]["schedule_data"])["timezone"] == "UTC"
+
+
+def test_endpoint_requires_token_and_applies_filters(app):
+    client = app.test_client()
+    assert client.get("/admin/export/schedules.csv").status_code == 401
+    assert client.get("/admin/export/schedules.xml",
+                      headers={"Authorization": "Bearer s3cret"}).status_code == 404
+
+    response = client.get("/admin/export/schedules.csv?from=2026-10-10&to=2026-10-15",
+                          headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.is_streamed
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert {r["job_id"] for r in rows} == {f"job-{i}" for i in range(9, 14)}
+
+    bad = client.get("/admin/export/shifts.csv?from=yesterday",
+                     headers={"Authorization": "Bearer s3cret"})
+    assert bad.status_code == 400
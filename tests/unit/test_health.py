@@ -0,0 +1,54 @@
+from flask import Flask
+
+from workschedule.routes.health import health_bp
+from workschedule.services import warmup
+
+
+def _client():
+    app = Flask(__name__)
+    app.register_blueprint(health_bp)
+    return app.test_client()
+
+
+def test_bundled_pdf_parses_end_to_end():
+    state = warmup.WarmupState()
+    original, warmup.state = warmup.state, state
+    try:
+        assert warmup.prewarm()
+    finally:
+        warmup.state = original
+    assert state.steps["parse_sample"]["ok"] is True
+
+
+def test_healthz_is_always_ok():
+    assert _client().get("/healthz").json == {"status": "ok"}
+
+
+def test_readyz_reports_warm_up_progress(monkeypatch):
+    state = warmup.WarmupState()
+    monkeypatch.setattr(warmup, "state", state)
+    monkeypatch.setattr(warmup, "start", lambda app: None)
+    client = _client()
+
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json["status"] == "warming_up"
+
+    state.ready = state.finished = True
+    response = client.get("/readyz")
+    assert response.status_code == 200
+
+
+def test_readyz_does_not_expose_step_errors(monkeypatch, caplog):
+    state = warmup.WarmupState()
+    monkeypatch.setattr(warmup, "state", state)
+    monkeypatch.setattr(warmup, "start", lambda app: None)
+
+    def fail():
+        raise RuntimeError("could not connect to db.internal:5432 as admin")
+
+    assert not warmup._run_step("database", fail)
+    response = _client().get("/readyz")
+    assert response.json["steps"]["database"] == {"ok": False, "seconds": state.steps["database"]["seconds"]}
+    assert "db.internal" not in response.get_data(as_text=True)
+    assert "db.internal" in caplog.text
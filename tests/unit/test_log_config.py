@@ -0,0 +1,85 @@
+import io
+import json
+import logging
+
+import pytest
+from flask import Flask
+
+from workschedule import concurrency, log_config
+from workschedule.routes.schedule import parse_schedule_text
+
+
+@pytest.fixture
+def stream():
+    out = io.StringIO()
+    root = logging.getLogger()
+    level = root.level
+    log_config.configure(fmt="json", level="INFO", levels="workschedule.test.noisy=DEBUG", stream=out)
+    yield out
+    root.removeHandler(log_config._handler)
+    log_config._handler = None
+    root.setLevel(level)
+    logging.getLogger("workschedule.test.noisy").setLevel(logging.NOTSET)
+
+
+def _records(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def _app():
+    app = Flask(__name__)
+    log_config.init_app(app)
+
+    @app.route("/work")
+    def work():
+        logging.getLogger("workschedule.test").info("on the request thread")
+        concurrency.submit("step", logging.getLogger("workschedule.test").info, "on the pool").result()
+        return "ok"
+
+    return app
+
+
+def test_json_records_carry_severity_and_extra_fields(stream):
+    logging.getLogger("workschedule.test").warning("Saved %d shifts", 3, extra={"job_id": "j1"})
+    [record] = _records(stream)
+    assert record["severity"] == "WARNING"
+    assert record["message"] == "Saved 3 shifts"
+    assert record["logger"] == "workschedule.test"
+    assert record["job_id"] == "j1"
+    assert "request_id" not in record
+
+
+def test_per_module_levels(stream):
+    logging.getLogger("workschedule.test").debug("dropped")
+    logging.getLogger("workschedule.test.noisy").debug("kept")
+    assert [r["message"] for r in _records(stream)] == ["kept"]
+
+
+def test_request_id_is_bound_on_request_and_pool_threads(stream):
+    response = _app().test_client().get("/work", headers={"X-Request-ID": "req-42"})
+    assert response.headers["X-Request-ID"] == "req-42"
+    records = _records(stream)
+    assert [r["message"] for r in records] == ["on the request thread", "on the pool"]
+    assert {r["request_id"] for r in records} == {"req-42"}
+    # Unbound again once the request is over.
+    logging.getLogger("workschedule.test").info("after")
+    assert "request_id" not in _records(stream)[-1]
+
+
+def test_debug_sampling_is_decided_per_request():
+    ids = [f"req-{i}" for i in range(2000)]
+    kept = [i for i in ids if log_config.debug_sampled(i, 0.1)]
+    assert 100 < len(kept) < 300
+    assert all(log_config.debug_sampled(i, 0.1) for i in kept)
+    assert all(log_config.debug_sampled(i, 1.0) for i in ids)
+
+
+def test_parsing_does_not_log_schedule_text(stream, capsys):
+    logging.getLogger("workschedule.routes.schedule").setLevel(logging.DEBUG)
+    try:
+        parse_schedule_text("Oct 6 9:00 AM - 5:00 PM [8:00] 0660 - Store 026 Jane Doe")
+    finally:
+        logging.getLogger("workschedule.routes.schedule").setLevel(logging.NOTSET)
+    assert capsys.readouterr().out == ""
+    assert "Jane Doe" not in stream.getvalue()
+    assert any("Parsed 1 shifts" in r["message"] for r in _records(stream))
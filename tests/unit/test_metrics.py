@@ -0,0 +1,87 @@
+import pytest
+from flask import Flask
+
+from workschedule import instrumentation
+from workschedule.metrics import (Counter, Gauge, Histogram, LatencyStats, Registry,
+                                  render_prometheus, stage_errors, stage_seconds, timed)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram("t_seconds", "test", ["stage"], buckets=(0.1, 1.0)))
+    histogram.observe(0.05, stage="parse")
+    histogram.observe(0.5, stage="parse")
+    histogram.observe(5, stage="parse")
+    lines = registry.render()
+    assert 't_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="parse",le="1.0"} 2' in lines
+    assert 't_seconds_bucket{stage="parse",le="+Inf"} 3' in lines
+    assert 't_seconds_count{stage="parse"} 3' in lines
+    assert "# TYPE t_seconds histogram" in lines
+
+
+def test_counter_gauge_and_label_escaping():
+    registry = Registry()
+    counter = registry.register(Counter("t_total", "test", ["path"]))
+    counter.inc(path='a"b')
+    counter.inc(2, path='a"b')
+    registry.register(Gauge("t_pool", "test", ["state"], callback=lambda: {("in_use",): 3}))
+    lines = registry.render()
+    assert 't_total{path="a\\"b"} 3' in lines
+    assert 't_pool{state="in_use"} 3' in lines
+    with pytest.raises(ValueError):
+        counter.inc(wrong="label")
+
+
+def test_timed_records_duration_and_errors():
+    @timed("test_stage")
+    def fail():
+        raise RuntimeError("boom")
+
+    before = stage_seconds.count(stage="test_stage")
+    with pytest.raises(RuntimeError):
+        fail()
+    assert stage_seconds.count(stage="test_stage") == before + 1
+    assert stage_errors.value(stage="test_stage") >= 1
+
+
+def test_latency_stats_are_exported():
+    LatencyStats("test_lookup").observe("gcs", 0.25)
+    text = render_prometheus()
+    assert 'workschedule_test_lookup_seconds_count{label="gcs"} 1' in text
+    assert 'workschedule_test_lookup_seconds_max{label="gcs"} 0.25' in text
+
+
+def test_requests_are_counted_and_metrics_served(monkeypatch):
+    monkeypatch.setattr(instrumentation, "METRICS_TOKEN", "secret")
+    app = Flask(__name__)
+    instrumentation.init_app(app)
+    app.add_url_rule("/ping", "ping", lambda: "pong")
+    client = app.test_client()
+
+    before = instrumentation.http_requests.value(endpoint="ping", method="GET", status=200)
+    client.get("/ping")
+    assert instrumentation.http_requests.value(endpoint="ping", method="GET", status=200) == before + 1
+    assert instrumentation.http_in_flight.value() == 0
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert 'workschedule_http_requests_total{endpoint="ping",method="GET",status="200"}' in response.text
+
+
+def test_metrics_token_is_enforced(monkeypatch):
+    monkeypatch.setattr(instrumentation, "METRICS_TOKEN", "secret")
+    app = Flask(__name__)
+    instrumentation.init_app(app)
+    client = app.test_client()
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+
+def test_metrics_are_off_without_a_token(monkeypatch):
+    monkeypatch.setattr(instrumentation, "METRICS_TOKEN", None)
+    app = Flask(__name__)
+    instrumentation.init_app(app)
+    client = app.test_client()
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 404
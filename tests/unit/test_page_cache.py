@@ -0,0 +1,86 @@
+from flask import Flask, flash
+
+from workschedule.services import page_cache as page_cache_module
+from workschedule.services.page_cache import CachedPage, PageCache, cached_page
+
+
+class DictTier:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, page):
+        self.data[key] = page
+
+
+def _app(monkeypatch, cache=None):
+    cache = cache or PageCache(max_entries=8)
+    monkeypatch.setattr(page_cache_module, "page_cache", cache)
+    app = Flask(__name__)
+    app.secret_key = "test"
+    renders = []
+
+    @app.route("/login")
+    @cached_page()
+    def login():
+        renders.append(1)
+        return "<h1>Log in</h1>"
+
+    @app.route("/flash")
+    def add_flash():
+        flash("Uploaded", "success")
+        return "ok"
+
+    return app, renders, cache
+
+
+def test_renders_once_then_serves_from_cache(monkeypatch):
+    app, renders, _ = _app(monkeypatch)
+    client = app.test_client()
+    first = client.get("/login")
+    second = client.get("/login")
+    assert len(renders) == 1
+    assert first.headers["X-Page-Cache"] == "MISS" and second.headers["X-Page-Cache"] == "HIT"
+    assert second.data == b"<h1>Log in</h1>"
+    assert second.mimetype == "text/html"
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+
+def test_matching_etag_gets_304(monkeypatch):
+    app, _, _ = _app(monkeypatch)
+    client = app.test_client()
+    etag = client.get("/login").headers["ETag"]
+    assert client.get("/login", headers={"If-None-Match": etag}).status_code == 304
+    # The compression middleware weakens the tag; weak comparison still matches.
+    assert client.get("/login", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+
+def test_pending_flashes_bypass_the_cache(monkeypatch):
+    app, renders, cache = _app(monkeypatch)
+    client = app.test_client()
+    client.get("/flash")
+    response = client.get("/login")
+    assert "X-Page-Cache" not in response.headers
+    assert len(renders) == 1 and len(cache) == 0
+
+
+def test_revision_is_part_of_the_key(monkeypatch):
+    app, renders, _ = _app(monkeypatch)
+    client = app.test_client()
+    client.get("/login")
+    monkeypatch.setattr(page_cache_module, "DEPLOY_REVISION", "next-revision")
+    client.get("/login")
+    assert len(renders) == 2
+
+
+def test_lru_evicts_oldest_and_shared_tier_backfills():
+    shared = DictTier()
+    cache = PageCache(max_entries=2, shared=shared)
+    for key in ("a", "b", "c"):
+        cache.set(key, CachedPage.from_body(key.encode(), "text/html"))
+    assert len(cache) == 2
+    # "a" was evicted locally but is still in the shared tier.
+    assert cache.get("a").body == b"a"
+    assert CachedPage.deserialize(shared.data["b"].serialize()) == shared.data["b"]
@@ -0,0 +1,90 @@
+import os
+import pstats
+import time
+
+from flask import Flask, Response
+
+from workschedule import concurrency
+from workschedule.middleware.profiling import ProfilingMiddleware
+from workschedule.middleware.request_id import REQUEST_ID_ENVIRON_KEY, request_id_for
+
+
+def _app(tmp_path, **kwargs):
+    app = Flask(__name__)
+
+    @app.route("/parse")
+    def parse():
+        time.sleep(0.05)
+        return "parsed"
+
+    @app.route("/stream")
+    def stream():
+        return Response((str(i) for i in range(3)), mimetype="text/plain")
+
+    kwargs.setdefault("token", "s3cret")
+    kwargs.setdefault("sample_rate", 0)
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, output=str(tmp_path), **kwargs)
+    return app
+
+
+def _get(client, path, **kwargs):
+    # Like a WSGI server, close the response: that is when the profile is saved.
+    response = client.get(path, **kwargs)
+    response.get_data()
+    response.close()
+    return response
+
+
+def _written(tmp_path, suffix):
+    # Profiles are written on the I/O pool after the response.
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        files = [f for f in os.listdir(tmp_path) if f.endswith(suffix)]
+        if files:
+            return [os.path.join(tmp_path, f) for f in files]
+        time.sleep(0.01)
+    return []
+
+
+def test_requests_without_the_token_are_not_profiled(tmp_path):
+    client = _app(tmp_path).test_client()
+    response = _get(client, "/parse", headers={"X-Profile-Token": "wrong"})
+    assert "X-Profile-Id" not in response.headers
+    concurrency.get_executor().submit(lambda: None).result()
+    assert os.listdir(tmp_path) == []
+
+
+def test_token_request_writes_folded_stacks(tmp_path):
+    client = _app(tmp_path, interval_ms=1).test_client()
+    response = _get(client, "/parse", headers={"X-Profile-Token": "s3cret", "X-Request-ID": "req-123"})
+    assert response.data == b"parsed"
+    assert response.headers["X-Profile-Id"] == "req-123"
+    [path] = _written(tmp_path, ".folded")
+    assert "req-123-GET-parse" in path
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("parse (test_profiling.py" in line for line in lines)
+
+
+def test_cprofile_mode_covers_streamed_bodies(tmp_path):
+    client = _app(tmp_path).test_client()
+    response = _get(client, "/stream", headers={"X-Profile-Token": "s3cret", "X-Profile-Mode": "cprofile"})
+    assert response.data == b"012"
+    [path] = _written(tmp_path, ".pstats")
+    stats = pstats.Stats(path)
+    assert any(name == "<genexpr>" for _, _, name in stats.stats)
+
+
+def test_sample_rate_profiles_without_exposing_the_id(tmp_path):
+    client = _app(tmp_path, token="", sample_rate=1.0).test_client()
+    response = _get(client, "/parse")
+    assert "X-Profile-Id" not in response.headers
+    assert _written(tmp_path, ".folded")
+
+
+def test_request_id_prefers_header_then_trace_context():
+    assert request_id_for({"HTTP_X_REQUEST_ID": "abc-1"}) == "abc-1"
+    environ = {"HTTP_X_REQUEST_ID": "bad id!", "HTTP_X_CLOUD_TRACE_CONTEXT": "105445aa7843bc8bf206b120001000/1;o=1"}
+    assert request_id_for(environ) == "105445aa7843bc8bf206b120001000"
+    assert request_id_for(environ) is environ[REQUEST_ID_ENVIRON_KEY]
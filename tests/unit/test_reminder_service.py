@@ -0,0 +1,128 @@
+import datetime
+from urllib.parse import parse_qs
+
+import pytest
+from flask import Flask
+
+from tests.fake_mailgun import FakeMailgun
+from workschedule.app import db
+from workschedule.services import mailgun_service, reminder_service
+
+NOW = datetime.datetime(2026, 10, 19, 12, 0)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    from workschedule.models import User
+    monkeypatch.setenv("MAILGUN_API_KEY", "key-test")
+    monkeypatch.setenv("MAILGUN_DOMAIN", "mg.example.com")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        due = NOW - datetime.timedelta(hours=1)
+        db.session.add_all(
+            [User(firebase_uid=f"u{i}", email=f"u{i}@example.com", next_reminder_at=due)
+             for i in range(5)]
+            + [User(firebase_uid="later", email="later@example.com",
+                    next_reminder_at=NOW + datetime.timedelta(days=1)),
+               User(firebase_uid="no-email", email=None, next_reminder_at=due)])
+        db.session.commit()
+        yield app
+
+
+def _recipients(fake):
+    return [parse_qs(r["body"].decode())["to"] for r in fake.delivered]
+
+
+def _still_due():
+    from workschedule.models import User
+    return sorted(u.email for u in User.query.filter(User.next_reminder_at <= NOW,
+                                                     User.email.isnot(None)))
+
+
+def test_due_users_are_sent_in_keyset_batches(monkeypatch, app):
+    with FakeMailgun() as fake:
+        monkeypatch.setattr(mailgun_service, "MAILGUN_API_BASE", fake.api_base)
+        stats = reminder_service.dispatch_due_reminders(now=NOW, batch_size=2)
+
+    assert stats == {"batches": 3, "sent": 5, "failed": 0}
+    assert [len(batch) for batch in _recipients(fake)] == [2, 2, 1]
+    assert sorted(sum(_recipients(fake), [])) == [f"u{i}@example.com" for i in range(5)]
+    assert _still_due() == []
+
+
+def test_failed_batch_stays_due_and_sent_batches_are_not_resent(monkeypatch, app):
+    with FakeMailgun(statuses=[200, 500, 200]) as fake:
+        monkeypatch.setattr(mailgun_service, "MAILGUN_API_BASE", fake.api_base)
+        assert reminder_service.dispatch_due_reminders(now=NOW, batch_size=2) == \
+            {"batches": 3, "sent": 3, "failed": 2}
+        assert _still_due() == ["u2@example.com", "u3@example.com"]
+
+        fake.requests.clear()
+        assert reminder_service.dispatch_due_reminders(now=NOW, batch_size=2)["sent"] == 2
+    assert _recipients(fake) == [["u2@example.com", "u3@example.com"]]
+
+
+def test_rerun_after_a_crash_resumes_with_unsent_users(monkeypatch, app):
+    sent = []
+
+    def crash_on_second_batch(to_emails, *args, **kwargs):
+        if sent:
+            raise RuntimeError("worker killed")
+        sent.append(list(to_emails))
+        return True
+
+    monkeypatch.setattr(mailgun_service, "send_batch_message", crash_on_second_batch)
+    with pytest.raises(RuntimeError):
+        reminder_service.dispatch_due_reminders(now=NOW, batch_size=2)
+    assert len(_still_due()) == 3
+
+    monkeypatch.setattr(mailgun_service, "send_batch_message",
+                        lambda to_emails, *a, **kw: sent.append(list(to_emails)) or True)
+    assert reminder_service.dispatch_due_reminders(now=NOW, batch_size=2)["sent"] == 3
+    assert sorted(sum(sent, [])) == [f"u{i}@example.com" for i in range(5)]
+
+
+def test_batches_never_exceed_the_mailgun_limit(monkeypatch, app):
+    monkeypatch.setattr(mailgun_service, "MAILGUN_BATCH_LIMIT", 3)
+    with pytest.raises(ValueError):
+        mailgun_service.send_batch_message([f"x{i}@example.com" for i in range(4)], "s", "t")
+
+    batches = []
+    monkeypatch.setattr(mailgun_service, "send_batch_message",
+                        lambda to_emails, *a, **kw: batches.append(len(to_emails)) or True)
+    reminder_service.dispatch_due_reminders(now=NOW, batch_size=1000)
+    assert batches == [3, 2]
+
+
+def test_paid_schedule_makes_a_logged_in_user_due(monkeypatch, app):
+    from workschedule.routes import schedule
+    from workschedule.routes.auth import auth_bp
+    from workschedule.services import token_verifier
+    monkeypatch.setattr(token_verifier, "verify_id_token",
+                        lambda token: {"uid": "new-uid", "email": "new@example.com"})
+    monkeypatch.setattr(schedule, "_download_from_gcs",
+                        lambda path: '{"shifts": [{"shift_date": "Mon, Oct 06", '
+                                     '"shift_start": "9:00 AM", "shift_end": "5:00 PM"}]}')
+    monkeypatch.setattr(schedule, "_upload_ics_to_gcs", lambda content, path: None)
+    monkeypatch.setattr(schedule, "_delete_from_gcs", lambda path: None)
+    # The receipt for this payment goes to the same address; keep it out of the count.
+    monkeypatch.setattr(mailgun_service, "queue_receipt_with_ics", lambda *args: None)
+    app.secret_key = "test"
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(schedule.schedule_bp)
+    client = app.test_client()
+
+    assert client.post("/auth/authenticate-session",
+                       headers={"Authorization": "Bearer t"}).status_code == 200
+    later = datetime.datetime.utcnow() + reminder_service.REMINDER_INTERVAL + datetime.timedelta(hours=1)
+    with FakeMailgun() as fake:
+        monkeypatch.setattr(mailgun_service, "MAILGUN_API_BASE", fake.api_base)
+        reminder_service.dispatch_due_reminders(now=later)
+        assert "new@example.com" not in sum(_recipients(fake), [])
+
+        assert client.get("/schedule/payment_success?job_id=j1").status_code == 200
+        reminder_service.dispatch_due_reminders(now=later)
+    assert "new@example.com" in sum(_recipients(fake), [])
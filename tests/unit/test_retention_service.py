@@ -0,0 +1,96 @@
+import datetime
+import os
+
+import pytest
+from flask import Flask
+from sqlalchemy import text
+
+from workschedule.app import db
+from workschedule.services.retention_service import (
+    add_months, ensure_partitions, partition_name, prune_expired, retention_cutoff,
+)
+
+# Partition management needs a real PostgreSQL; point this at a scratch database.
+TEST_POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+
+@pytest.fixture
+def app():
+    from workschedule import models  # noqa: F401  (registers the tables)
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def test_month_arithmetic_crosses_years():
+    assert add_months(datetime.date(2025, 11, 1), 3) == datetime.date(2026, 2, 1)
+    assert add_months(datetime.date(2025, 1, 1), -1) == datetime.date(2024, 12, 1)
+    assert partition_name(datetime.date(2026, 2, 1)) == "schedule_2026_02"
+
+
+def test_cutoff_is_a_month_boundary():
+    now = datetime.datetime(2026, 10, 19, 15, 30)
+    assert retention_cutoff(now, months=24) == datetime.date(2024, 10, 1)
+
+
+def test_unpartitioned_prune_deletes_expired_rows(app):
+    from workschedule.models import Schedule
+    now = datetime.datetime(2026, 10, 19)
+    db.session.add_all([
+        Schedule(user_email="a@example.com", job_id="old", schedule_data={"shifts": []},
+                 created_at=datetime.datetime(2024, 1, 5)),
+        Schedule(user_email="a@example.com", job_id="new", schedule_data={"shifts": []},
+                 created_at=datetime.datetime(2026, 9, 1)),
+    ])
+    db.session.commit()
+
+    assert prune_expired(now=now, months=12, dry_run=True)["deleted_rows"] == 0
+    result = prune_expired(now=now, months=12)
+    assert result["deleted_rows"] == 1
+    assert [s.job_id for s in Schedule.query.all()] == ["new"]
+
+
+@pytest.fixture
+def pg_app():
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL not set")
+    schema = f"retention_test_{os.getpid()}"
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = TEST_POSTGRES_URL
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"options": f"-csearch_path={schema}"}}
+    db.init_app(app)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA {schema}"))
+            conn.execute(text(f"SET search_path TO {schema}"))
+            conn.execute(text(
+                "CREATE TABLE schedule (id serial, job_id varchar(64) NOT NULL, "
+                "created_at timestamp NOT NULL, PRIMARY KEY (id, created_at)) "
+                "PARTITION BY RANGE (created_at)"))
+            conn.execute(text("CREATE TABLE schedule_default PARTITION OF schedule DEFAULT"))
+        try:
+            yield app
+        finally:
+            db.session.remove()
+            with db.engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+            db.engine.dispose()
+
+
+def test_new_partition_takes_rows_already_in_default(pg_app):
+    db.session.execute(text(
+        "INSERT INTO schedule (job_id, created_at) VALUES "
+        "('missed', '2031-03-10'), ('later', '2031-05-02')"))
+    db.session.commit()
+
+    created = ensure_partitions(now=datetime.datetime(2031, 3, 15), ahead=1)
+
+    assert created == ["schedule_2031_03", "schedule_2031_04"]
+    assert db.session.execute(text("SELECT job_id FROM schedule_2031_03")).scalars().all() == ["missed"]
+    assert db.session.execute(text("SELECT job_id FROM schedule_default")).scalars().all() == ["later"]
+    # The default partition is attached again and still catches stray rows.
+    db.session.execute(text("INSERT INTO schedule (job_id, created_at) VALUES ('stray', '2040-01-01')"))
+    assert db.session.execute(text("SELECT count(*) FROM schedule_default")).scalar() == 2
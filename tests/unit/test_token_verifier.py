@@ -0,0 +1,84 @@
+import datetime
+import time
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from firebase_admin import auth
+from google.auth import crypt, jwt
+
+from workschedule.services import token_verifier
+
+PROJECT_ID = "work-schedule-test"
+
+
+@pytest.fixture(scope="module")
+def signer_and_cert():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name)
+            .public_key(key.public_key()).serial_number(1)
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+    pem_key = key.private_bytes(serialization.Encoding.PEM,
+                                serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption())
+    signer = crypt.RSASigner.from_string(pem_key, key_id="kid-1")
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+@pytest.fixture(autouse=True)
+def keys(monkeypatch, signer_and_cert):
+    monkeypatch.setenv("FIREBASE_PROJECT_ID", PROJECT_ID)
+    monkeypatch.setattr(token_verifier.signing_keys, "_certs", {"kid-1": signer_and_cert[1]})
+    token_verifier.token_cache.clear()
+
+
+def _token(signer, **overrides):
+    now = int(time.time())
+    claims = {"iss": f"https://securetoken.google.com/{PROJECT_ID}", "aud": PROJECT_ID,
+              "sub": "uid-123", "iat": now, "exp": now + 3600}
+    claims.update(overrides)
+    return jwt.encode(signer, claims).decode()
+
+
+def test_valid_token_is_verified_and_cached(monkeypatch, signer_and_cert):
+    token = _token(signer_and_cert[0])
+    assert token_verifier.verify_id_token(token)["uid"] == "uid-123"
+
+    def no_decode(*args, **kwargs):
+        raise AssertionError("cached token was verified again")
+    monkeypatch.setattr(token_verifier.jwt, "decode", no_decode)
+    assert token_verifier.verify_id_token(token)["uid"] == "uid-123"
+
+
+def test_expired_token_raises_expired_error(signer_and_cert):
+    token = _token(signer_and_cert[0], iat=int(time.time()) - 7200,
+                   exp=int(time.time()) - 3600)
+    with pytest.raises(auth.ExpiredIdTokenError):
+        token_verifier.verify_id_token(token)
+
+
+@pytest.mark.parametrize("overrides", [{"aud": "other-project"},
+                                       {"iss": "https://securetoken.google.com/other"},
+                                       {"sub": ""}])
+def test_wrong_claims_are_rejected(signer_and_cert, overrides):
+    with pytest.raises(auth.InvalidIdTokenError):
+        token_verifier.verify_id_token(_token(signer_and_cert[0], **overrides))
+
+
+def test_empty_token_is_value_error():
+    with pytest.raises(ValueError):
+        token_verifier.verify_id_token("")
+
+
+def test_building_the_app_does_not_fetch_signing_keys(monkeypatch):
+    from workschedule.app import create_app
+    started = []
+    monkeypatch.setattr(token_verifier.signing_keys, "start", lambda: started.append(True))
+    create_app()
+    assert started == []
@@ -0,0 +1,75 @@
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from workschedule.app import db
+from workschedule.services import user_cache
+from workschedule.services.user_cache import get_user
+
+
+@pytest.fixture
+def app():
+    from workschedule.models import User
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    user_cache.user_cache.clear()
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(firebase_uid="uid-1", email="a@example.com",
+                            subscription_status="trial"))
+        db.session.commit()
+        yield app
+    user_cache.user_cache.clear()
+
+
+@pytest.fixture
+def queries(app):
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    yield statements
+    event.remove(engine, "before_cursor_execute", listener)
+
+
+def test_lookups_hit_the_database_once_across_requests(app, queries):
+    for _ in range(3):
+        with app.test_request_context():
+            assert get_user("uid-1").email == "a@example.com"
+            assert get_user("uid-1").subscription_status == "trial"
+    assert len(queries) == 1
+
+
+def test_unknown_uid_is_cached_as_none(app, queries):
+    with app.test_request_context():
+        assert get_user("nobody") is None
+    with app.test_request_context():
+        assert get_user("nobody") is None
+    assert len(queries) == 1
+
+
+def test_orm_update_invalidates_on_commit(app):
+    from workschedule.models import User
+    with app.test_request_context():
+        assert get_user("uid-1").subscription_status == "trial"
+        User.query.filter_by(firebase_uid="uid-1").one().subscription_status = "active"
+        db.session.flush()
+        # Not committed yet: still the cached value.
+        assert get_user("uid-1").subscription_status == "trial"
+        db.session.commit()
+        assert get_user("uid-1").subscription_status == "active"
+
+
+def test_bulk_update_invalidates_and_rollback_does_not(app, queries):
+    from workschedule.models import User
+    with app.test_request_context():
+        get_user("uid-1")
+        User.query.filter_by(firebase_uid="uid-1").update({User.subscription_status: "canceled"})
+        db.session.rollback()
+        assert get_user("uid-1").subscription_status == "trial"
+
+        User.query.filter_by(firebase_uid="uid-1").update({User.subscription_status: "canceled"})
+        db.session.commit()
+        assert get_user("uid-1").subscription_status == "canceled"
@@ -6,17 +6,12 @@ from flask import Flask, request, redirect, url_for, flash, session, render_temp
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from sqlalchemy.exc import SQLAlchemyError
-from google.cloud import storage
 from werkzeug.utils import secure_filename
 
-import workschedule.services.ics_delivery
-
 from dotenv import load_dotenv
 import logging
 
-# --- Firebase Admin SDK Imports ---
-import firebase_admin
-from firebase_admin import credentials
+from workschedule import clients
 
 # Load environment variables at the very beginning
 load_dotenv()
@@ -26,48 +21,11 @@ logging.debug(".env file loaded.")
 db = SQLAlchemy()
 migrate = Migrate()
 
-# --- Initialize Firebase Admin SDK once ---
-# Check if a Firebase app is already initialized to prevent issues with Flask's debug reloader.
-try:
-    if not firebase_admin._apps:
-        # Determine credentials based on environment
-        if os.environ.get("K_SERVICE"):
-            # This is for running on Cloud Run, which uses ApplicationDefault credentials.
-            cred = credentials.ApplicationDefault()
-            logging.debug("Using ApplicationDefault credentials for Cloud Run.")
-        else:
-            # This is for local development. You must provide the path to your
-            # Firebase service account key JSON file in an environment variable.
-            key_path = os.environ.get("FIREBASE_SERVICE_ACCOUNT_KEY")
-            logging.error(f"key_path: {key_path}.")
-            if not key_path or not os.path.exists(key_path):
-                logging.error("FIREBASE_SERVICE_ACCOUNT_KEY environment variable not set or file does not exist.")
-                logging.error("HINT: On local machines, you must provide a service account key file for Firebase Admin SDK.")
-                sys.exit(1)
-            cred = credentials.Certificate(key_path)
-            logging.debug(f"Using service account key from {key_path}")
-        firebase_admin.initialize_app(cred)
-        logging.debug("Firebase Admin SDK initialized successfully.")
-    else:
-        logging.debug("Firebase Admin SDK was already initialized.")
-except Exception as e:
-    logging.error(f"Failed to initialize Firebase Admin SDK: {e}")
-    sys.exit(1)
-
-
+# Firebase Admin and Google Cloud Storage are no longer set up at import
+# time: workschedule.clients creates them on first use, so a cold start
+# only pays for what the first request actually needs.
 logging.debug("Extensions initialized.")
 
-# --- Google Cloud Storage client setup ---
-try:
-    storage_client = storage.Client()
-    #GCS_BUCKET_NAME = os.environ.get("FIREBASE_STORAGE_BUCKET", "your-gcs-bucket-name")
-    GCS_BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME", "gs://work-schedule-cloud/")
-    gcs_bucket = storage_client.bucket(GCS_BUCKET_NAME)
-except Exception as e:
-    logging.error(f"Failed to initialize Google Cloud Storage client: {e}")
-    storage_client = None
-    gcs_bucket = None
-
 def create_app():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     app = Flask(
@@ -80,24 +38,71 @@ def create_app():
     from workschedule.config import Config
     app.config["SQLALCHEMY_DATABASE_URI"] = Config.SQLALCHEMY_DATABASE_URI
 
-    # Initialize SQLAlchemy with the app
-    db.init_app(app)
+    # Set a secret key for session management.
+    app.secret_key = os.environ.get("FLASK_SECRET_KEY", "your_unique_and_secret_fallback_key")
+
+    # Initialize SQLAlchemy with pool sizing, timeouts and query timing
+    from workschedule import database
+    database.init_app(app, db)
     # Initialize Flask-Migrate with the app and db
     migrate.init_app(app, db)
+    # Register the models on db.metadata (needed by autogenerate and bulk writes)
+    from workschedule import models  # noqa: F401
+
+    # Hashed, precompressed static files (when `python -m workschedule.assets build` ran)
+    from workschedule import assets
+    assets.init_app(app)
+
+    # Request id on every log record and in the X-Request-ID response header
+    from workschedule import log_config
+    log_config.init_app(app)
+
+    # Request counters/histograms, in-flight gauge and GET /metrics
+    from workschedule import instrumentation
+    instrumentation.init_app(app)
+
+    # Server-Timing header for requests that overlap I/O on the shared pool
+    from workschedule import concurrency
+    concurrency.init_app(app)
 
     # Register schedule blueprint after app is created
     from workschedule.routes.schedule import schedule_bp
     app.register_blueprint(schedule_bp)
 
+    # Auth routes (/auth/login, /auth/authenticate-session, ...)
+    from workschedule.routes.auth import auth_bp
+    app.register_blueprint(auth_bp)
+
+    # Liveness (/healthz) and warm-up gated readiness (/readyz) probes
+    from workschedule.routes.health import health_bp
+    app.register_blueprint(health_bp)
+
+    # Admin/support endpoints (streaming exports), behind ADMIN_API_TOKEN
+    from workschedule.routes.admin import admin_bp
+    app.register_blueprint(admin_bp)
+
+    # CLI commands for scheduled jobs (flask send-reminders, ...)
+    from workschedule.commands import register_commands
+    register_commands(app)
+
+    # gzip/brotli for HTML, JSON and streamed exports (see COMPRESS_* env vars)
+    from workschedule.middleware.compression import CompressionMiddleware
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+
+    # Opt-in per-request profiling; not installed at all unless configured
+    from workschedule.middleware import profiling
+    if profiling.enabled():
+        app.wsgi_app = profiling.ProfilingMiddleware(app.wsgi_app)
+
+    # Pages with no per-request data are rendered once per revision
+    from workschedule.services.page_cache import cached_page
+
     # --- NEW ROUTES FOR PDF UPLOAD ---
     # These routes are part of the main app, not a blueprint.
 
-    # Print all registered routes for debugging
-    print("\n[DEBUG] Registered routes:")
-    for rule in app.url_map.iter_rules():
-        print(rule)
 
     @app.route("/schedule/upload")
+    @cached_page()
     def schedule_upload():
         return render_template("upload_schedule_new.html")
 
@@ -122,6 +127,11 @@ def create_app():
             filename = secure_filename(file.filename)
             
             # Upload the file directly to Google Cloud Storage
+            try:
+                gcs_bucket = clients.get_gcs_bucket()
+            except Exception as e:
+                logging.error("Failed to initialize Google Cloud Storage client: %s", e)
+                gcs_bucket = None
             if gcs_bucket:
                 try:
                     # Use a unique path for each user's file
@@ -131,12 +141,12 @@ def create_app():
                     # Upload the file directly from the request stream
                     blob.upload_from_file(file)
 
-                    print(f"File uploaded to GCS: {blob_path}")
+                    logging.info("Uploaded schedule file %s to GCS", filename)
                     flash("Schedule uploaded successfully!", "success")
 
                 except Exception as e:
                     flash(f"An error occurred during file upload: {e}", "error")
-                    print(f"GCS upload failed: {e}")
+                    logging.warning("GCS upload failed: %s", e)
             else:
                 flash("GCS is not configured correctly. Upload failed.", "error")
         else:
@@ -149,6 +159,7 @@ def create_app():
     # Root route and /index route render index.html directly
     @app.route('/')
     @app.route('/index')
+    @cached_page()
     def index():
         return render_template('index.html')
     
@@ -156,13 +167,32 @@ def create_app():
     def dashboard():
         # Placeholder for your dashboard logic
         return "Dashboard page"
-    
+
+    # Log all registered routes for debugging
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        for rule in app.url_map.iter_rules():
+            logging.debug("Registered route: %s", rule)
 
     return app
 
-# Gunicorn (used by Cloud Run) will look for a top-level 'app' object.
-app = create_app()
 
-logging.debug("App factory finished. App instance created.")
-print("app.py loaded")
+_app = None
+
+
+def get_app():
+    """Return the process-wide app, building it on first call only."""
+    global _app
+    if _app is None:
+        _app = create_app()
+        logging.debug("App factory finished. App instance created.")
+    return _app
+
+
+def __getattr__(name):
+    # Gunicorn, `flask` and the tests look for a top-level 'app' object. It is
+    # built on first access so importing this module (e.g. for `db` in
+    # models.py) stays cheap and never builds a second app.
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
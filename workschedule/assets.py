@@ -0,0 +1,174 @@
+"""
+assets.py
+
+Fingerprinted, precompressed static assets.
+
+The build step copies every file under workschedule/static into
+STATIC_BUILD_DIR with a content hash in its name (css/main.css ->
+css/main.3b4f0c2a91de.css), writes .gz (and .br, when the optional
+``brotli`` package is installed) next to each compressible file, and
+records the mapping in manifest.json:
+
+    python -m workschedule.assets build
+
+The Docker image runs it at build time. When a manifest is present,
+init_app() makes url_for('static', filename='css/main.css') resolve to the
+hashed name and serves hashed files with a year-long ``immutable``
+Cache-Control, picking the .br/.gz variant the client accepts. A hashed
+URL never changes content, so browsers and the CDN in front of Cloud Run
+stop revalidating assets through the workers. Without a manifest (local
+development) Flask's default static handling is left untouched.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import sys
+
+try:
+    import brotli
+except ImportError:  # optional: .gz variants only
+    brotli = None
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_BUILD_DIR = os.getenv(
+    "STATIC_BUILD_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "static_dist"))
+MANIFEST_NAME = "manifest.json"
+
+HASH_LENGTH = 12
+# Compressing already-compressed formats (images, fonts) only costs CPU.
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".map", ".json", ".svg", ".html", ".txt", ".xml", ".ico"}
+MIN_COMPRESS_BYTES = 256
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# (Accept-Encoding token, file suffix), in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def hashed_name(path, data):
+    """css/main.css + content -> css/main.<sha256 prefix>.css"""
+    root, ext = os.path.splitext(path)
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    return f"{root}.{digest}{ext}"
+
+
+def _compressed_variants(data):
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    return variants
+
+
+def build(source_dir=SOURCE_DIR, build_dir=STATIC_BUILD_DIR):
+    """Write hashed files, compressed variants and the manifest; returns the manifest."""
+    if os.path.isdir(build_dir):
+        shutil.rmtree(build_dir)
+    os.makedirs(build_dir)
+
+    manifest = {}
+    for dirpath, _, filenames in os.walk(source_dir):
+        for filename in sorted(filenames):
+            source = os.path.join(dirpath, filename)
+            logical = os.path.relpath(source, source_dir).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                data = f.read()
+            target = hashed_name(logical, data)
+            manifest[logical] = target
+
+            out_path = os.path.join(build_dir, target)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with open(out_path, "wb") as f:
+                f.write(data)
+
+            ext = os.path.splitext(filename)[1].lower()
+            if ext not in COMPRESSIBLE_EXTENSIONS or len(data) < MIN_COMPRESS_BYTES:
+                continue
+            for suffix, compressed in _compressed_variants(data).items():
+                if len(compressed) < len(data):
+                    with open(out_path + suffix, "wb") as f:
+                        f.write(compressed)
+
+    with open(os.path.join(build_dir, MANIFEST_NAME), "w") as f:
+        json.dump(dict(sorted(manifest.items())), f, indent=2)
+    return manifest
+
+
+def load_manifest(build_dir=STATIC_BUILD_DIR):
+    """The logical -> hashed name mapping, or None if no build exists."""
+    try:
+        with open(os.path.join(build_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def init_app(app, build_dir=STATIC_BUILD_DIR):
+    """Serve the built assets if a manifest exists; returns whether it did."""
+    manifest = load_manifest(build_dir)
+    if manifest is None:
+        return False
+
+    from flask import request, send_from_directory
+    from werkzeug.exceptions import NotFound
+
+    from workschedule.middleware.compression import accepted_encodings
+
+    hashed_files = set(manifest.values())
+    app.extensions["static_manifest"] = manifest
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == "static":
+            values["filename"] = manifest.get(values.get("filename"), values.get("filename"))
+
+    def static(filename):
+        if filename not in hashed_files:
+            # Unbuilt or logical names keep Flask's revalidated behaviour.
+            return app.send_static_file(filename)
+
+        # Set explicitly so main.css.br is still served as text/css.
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding"))
+        response = None
+        for coding, suffix in ENCODINGS:
+            if coding not in accepted:
+                continue
+            try:
+                response = send_from_directory(build_dir, filename + suffix, mimetype=mimetype,
+                                               download_name=os.path.basename(filename))
+            except NotFound:
+                continue
+            response.headers["Content-Encoding"] = coding
+            break
+        if response is None:
+            response = send_from_directory(build_dir, filename, mimetype=mimetype)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add("Accept-Encoding")
+        return response
+
+    app.view_functions["static"] = static
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m workschedule.assets")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="fingerprint and precompress workschedule/static")
+    build_cmd.add_argument("--source", default=SOURCE_DIR)
+    build_cmd.add_argument("--out", default=STATIC_BUILD_DIR)
+    args = parser.parse_args(argv)
+
+    manifest = build(args.source, args.out)
+    print(f"Built {len(manifest)} assets into {args.out}"
+          + ("" if brotli is not None else " (brotli not installed: .gz only)"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+clients.py
+
+Lazily created, process-wide SDK clients.
+
+Nothing here talks to Google at import time. Each accessor builds its client
+on first use (under a lock, so concurrent first requests build it once) and
+hands back the same instance afterwards. Forked workers drop the parent's
+instances and build their own, since gRPC/HTTP connections must not be
+shared across fork().
+"""
+import logging
+import os
+import threading
+
+GCS_BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME", "work-schedule-cloud")
+
+_lock = threading.RLock()
+_storage_client = None
+_buckets = {}
+_firebase_app = None
+
+
+def get_storage_client():
+    """Return the shared google.cloud.storage.Client."""
+    global _storage_client
+    if _storage_client is None:
+        with _lock:
+            if _storage_client is None:
+                from google.cloud import storage
+                _storage_client = storage.Client()
+    return _storage_client
+
+
+def get_gcs_bucket(name=None):
+    """Return a (cached) Bucket handle; defaults to GCS_BUCKET_NAME."""
+    name = name or GCS_BUCKET_NAME
+    bucket = _buckets.get(name)
+    if bucket is None:
+        with _lock:
+            bucket = _buckets.get(name)
+            if bucket is None:
+                bucket = _buckets[name] = get_storage_client().bucket(name)
+    return bucket
+
+
+def init_firebase():
+    """
+    Initialize the default Firebase Admin app once and return it.
+
+    Cloud Run uses Application Default Credentials; elsewhere the service
+    account key file named by FIREBASE_SERVICE_ACCOUNT_KEY is required.
+
+    Raises:
+        RuntimeError: If no usable credentials are configured.
+    """
+    global _firebase_app
+    if _firebase_app is not None:
+        return _firebase_app
+    with _lock:
+        if _firebase_app is not None:
+            return _firebase_app
+        import firebase_admin
+        from firebase_admin import credentials
+
+        if firebase_admin._apps:
+            _firebase_app = firebase_admin.get_app()
+            logging.debug("Firebase Admin SDK was already initialized.")
+            return _firebase_app
+
+        if os.environ.get("K_SERVICE"):
+            # This is for running on Cloud Run, which uses ApplicationDefault credentials.
+            cred = credentials.ApplicationDefault()
+            logging.debug("Using ApplicationDefault credentials for Cloud Run.")
+        else:
+            # This is for local development. You must provide the path to your
+            # Firebase service account key JSON file in an environment variable.
+            key_path = os.environ.get("FIREBASE_SERVICE_ACCOUNT_KEY")
+            if not key_path or not os.path.exists(key_path):
+                logging.error("FIREBASE_SERVICE_ACCOUNT_KEY environment variable not set or file does not exist.")
+                logging.error("HINT: On local machines, you must provide a service account key file for Firebase Admin SDK.")
+                raise RuntimeError("Firebase Admin SDK credentials are not configured.")
+            cred = credentials.Certificate(key_path)
+            logging.debug(f"Using service account key from {key_path}")
+        _firebase_app = firebase_admin.initialize_app(cred)
+        logging.debug("Firebase Admin SDK initialized successfully.")
+        return _firebase_app
+
+
+def reset_clients():
+    """Forget every cached client (used after fork and in tests)."""
+    global _storage_client, _lock
+    _lock = threading.RLock()
+    _storage_client = None
+    _buckets.clear()
+    # firebase_admin keeps its own registry of apps; its HTTP sessions are
+    # created per call, so the app object itself is safe to keep.
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_clients)
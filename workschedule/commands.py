@@ -0,0 +1,66 @@
+"""
+commands.py
+
+Flask CLI commands (``flask <command>``) for scheduled and operational jobs.
+Registered on the app in create_app().
+"""
+import click
+
+
+def register_commands(app):
+
+    @app.cli.command("send-reminders")
+    @click.option("--batch-size", default=None, type=int,
+                  help="Recipients per Mailgun call (max 1000).")
+    @click.option("--dry-run", is_flag=True, help="Only count due users.")
+    def send_reminders(batch_size, dry_run):
+        """Email every user whose schedule reminder is due."""
+        from workschedule.services import reminder_service
+        kwargs = {"dry_run": dry_run}
+        if batch_size:
+            kwargs["batch_size"] = batch_size
+        stats = reminder_service.dispatch_due_reminders(**kwargs)
+        click.echo(f"Reminders: {stats['sent']} sent, {stats['failed']} failed "
+                   f"in {stats['batches']} batches.")
+
+    @app.cli.command("schedule-retention")
+    @click.option("--months", default=None, type=int,
+                  help="Months of schedule history to keep (default SCHEDULE_RETENTION_MONTHS).")
+    @click.option("--archive/--no-archive", default=True,
+                  help="Copy each expired partition to GCS before dropping it.")
+    @click.option("--dry-run", is_flag=True, help="Only list what would be dropped.")
+    def schedule_retention(months, archive, dry_run):
+        """Create upcoming schedule partitions and drop expired ones."""
+        from workschedule.services import retention_service
+        created = [] if dry_run else retention_service.ensure_partitions()
+        kwargs = {"archive": archive, "dry_run": dry_run}
+        if months:
+            kwargs["months"] = months
+        result = retention_service.prune_expired(**kwargs)
+        click.echo(f"Created partitions: {', '.join(created) or 'none'}")
+        click.echo(f"Expired before {result['cutoff']}: "
+                   f"{', '.join(result['dropped']) or 'no partitions'}"
+                   f"{' (dry run)' if dry_run else ''}")
+        if result["archived"]:
+            click.echo(f"Archived: {', '.join(result['archived'])}")
+        click.echo(f"Deleted {result['deleted_rows']} unpartitioned rows.")
+
+    @app.cli.command("export")
+    @click.argument("kind", type=click.Choice(["schedules", "shifts"]))
+    @click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default="csv")
+    @click.option("--store", default=None, help="Only this store number.")
+    @click.option("--department", default=None, help="Only this department.")
+    @click.option("--from", "date_from", default=None,
+                  help="ISO date; schedules by upload time, shifts by start (inclusive).")
+    @click.option("--to", "date_to", default=None, help="ISO date (exclusive).")
+    @click.option("--output", "-o", type=click.File("w"), default="-",
+                  help="File to write (default stdout).")
+    def export(kind, fmt, store, department, date_from, date_to, output):
+        """Stream schedules or shifts as CSV / NDJSON in bounded memory."""
+        from workschedule.services import export_service
+        try:
+            filters = export_service.filters_for(kind, store, department, date_from, date_to)
+        except ValueError:
+            raise click.BadParameter("--from/--to must be ISO dates (YYYY-MM-DD).")
+        for chunk in export_service.export(kind, fmt, **filters):
+            output.write(chunk)
@@ -0,0 +1,179 @@
+"""
+concurrency.py
+
+Overlapping independent I/O inside a request, with Server-Timing tracing.
+
+Routes hand blocking calls (GCS, Stripe, a database write) to a shared,
+process-wide thread pool with submit(), keep working, and call .result()
+only on what the response needs; background() is for work the response
+does not wait on at all. Either way a request's latency is bounded by its
+slowest awaited call instead of the sum of all of them.
+
+Each submitted step is timed into the request's RequestTrace, and every
+response that had traced steps carries a Server-Timing header, e.g.
+
+    Server-Timing: gcs-download;dur=81.2, ics-build;dur=3.4,
+                   gcs-upload;dur=84.0, gcs-delete;dur=79.5, overlap-saved;dur=79.5
+
+where overlap-saved is the time the steps spent running concurrently, i.e.
+how much longer the request would have taken had they run one after another.
+Browser dev tools show the header in the request's Timing tab.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context
+
+from workschedule import log_config
+
+logger = logging.getLogger(__name__)
+
+IO_POOL_WORKERS = int(os.getenv("IO_POOL_WORKERS", "16"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """The shared I/O thread pool (created on first use, per process)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=IO_POOL_WORKERS,
+                                               thread_name_prefix="io")
+    return _executor
+
+
+class RequestTrace:
+    """Named, timed steps of one request (possibly running on other threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def add(self, name, start, end):
+        with self._lock:
+            self.spans.append((name, start, end))
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter())
+
+    def overlap_seconds(self):
+        """Sum of step durations minus the wall time they covered together."""
+        with self._lock:
+            spans = sorted((start, end) for _, start, end in self.spans)
+        total = sum(end - start for start, end in spans)
+        covered, cur_start, cur_end = 0.0, None, None
+        for start, end in spans:
+            if cur_end is None or start > cur_end:
+                if cur_end is not None:
+                    covered += cur_end - cur_start
+                cur_start, cur_end = start, end
+            else:
+                cur_end = max(cur_end, end)
+        if cur_end is not None:
+            covered += cur_end - cur_start
+        return max(0.0, total - covered)
+
+    def server_timing(self):
+        """Server-Timing header value for the steps recorded so far ('' if none)."""
+        with self._lock:
+            spans = list(self.spans)
+        if not spans:
+            return ""
+        entries = [f"{name};dur={(end - start) * 1000:.1f}" for name, start, end in spans]
+        entries.append(f"overlap-saved;dur={self.overlap_seconds() * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def current_trace():
+    """The RequestTrace of the current request, or None outside a request."""
+    if not has_request_context():
+        return None
+    trace = g.get("request_trace")
+    if trace is None:
+        trace = g.request_trace = RequestTrace()
+    return trace
+
+
+@contextmanager
+def span(name):
+    """Time a step that runs on the request thread."""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    with trace.span(name):
+        yield
+
+
+def submit(name, fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the I/O pool as traced step `name`; returns a Future."""
+    trace = current_trace()
+
+    def run():
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if trace is not None:
+                trace.add(name, start, time.perf_counter())
+
+    return get_executor().submit(log_config.bind_request_context(run))
+
+
+def submit_in_app_context(name, fn, *args, **kwargs):
+    """Like submit(), but fn runs inside its own app context (own DB session)."""
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            return fn(*args, **kwargs)
+
+    return submit(name, run)
+
+
+def background(name, fn, *args, **kwargs):
+    """Fire-and-forget submit(); failures are logged, never raised into the request."""
+    future = submit(name, fn, *args, **kwargs)
+
+    def log_failure(done):
+        error = done.exception()
+        if error is not None:
+            logger.warning("Background step %s failed: %s", name, error)
+
+    future.add_done_callback(log_failure)
+    return future
+
+
+def init_app(app):
+    """Add the Server-Timing header to responses whose request traced any steps."""
+
+    @app.after_request
+    def add_server_timing(response):
+        trace = g.get("request_trace")
+        header = trace.server_timing() if trace is not None else ""
+        if header:
+            response.headers.add("Server-Timing", header)
+        return response
+
+
+def _reset_after_fork():
+    # Pool threads do not survive fork(); the child builds its own pool.
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
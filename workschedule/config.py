@@ -1,6 +1,9 @@
 # workschedule-cloud/config.py
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 class Config:
     # Flask application settings
     # IMPORTANT: Replace 'your-super-secret-key-replace-in-prod' with a truly random,
@@ -37,7 +40,7 @@ class Config:
                 f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@"
                 f"/{DB_NAME}?host=/cloudsql/{CLOUD_SQL_CONNECTION_NAME}"
             )
-            print(f"[DEBUG] Using Cloud Run SQLALCHEMY_DATABASE_URI: {SQLALCHEMY_DATABASE_URI}")
+            logger.debug("Using Cloud SQL socket for %s", CLOUD_SQL_CONNECTION_NAME)
         else:
             # Running locally (or anywhere not detected as Cloud Run): Use standard TCP connection
             DB_HOST = os.environ.get('DB_HOST', 'localhost')
@@ -45,7 +48,7 @@ class Config:
             SQLALCHEMY_DATABASE_URI = (
                 f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
             )
-            print(f"[DEBUG] Using local SQLALCHEMY_DATABASE_URI: {SQLALCHEMY_DATABASE_URI}")
+            logger.debug("Using local database at %s:%s/%s", DB_HOST, DB_PORT, DB_NAME)
 
     # Recommended to suppress SQLAlchemy warning
     SQLALCHEMY_TRACK_MODIFICATIONS = False
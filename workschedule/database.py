@@ -0,0 +1,177 @@
+"""
+database.py
+
+Engine and connection-pool configuration for Cloud SQL.
+
+Every gunicorn worker process holds its own SQLAlchemy pool, and every
+Cloud Run instance runs GUNICORN_WORKERS of them, so the pool defaults
+(5 + 10 overflow per process) multiply quickly past the Cloud SQL
+connection limit on scale-out. engine_options() sizes each process' pool
+from the worker/thread model instead:
+
+    per-process budget = (DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS)
+                         // (CLOUD_RUN_MAX_INSTANCES * GUNICORN_WORKERS)
+    pool_size          = min(concurrency, budget)
+    max_overflow       = budget - pool_size
+
+where concurrency is GUNICORN_WORKER_CONNECTIONS for gevent workers (set
+by gunicorn.conf.py only then) and GUNICORN_THREADS otherwise.
+
+Connections are recycled, pre-pinged, and opened with a server-side
+statement_timeout, which migrations and maintenance jobs lift per
+transaction with lift_statement_timeout(). The pool records how long
+checkouts wait, including opening a new connection (pool_wait),
+pool_status() reports in-use and overflow connections, and queries slower
+than SLOW_QUERY_MS are logged with their timing.
+"""
+import logging
+import os
+import time
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from workschedule.metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+DB_MAX_CONNECTIONS = int(os.environ.get("DB_MAX_CONNECTIONS", "25"))
+# Kept free for migrations, the Cloud SQL console and one-off jobs.
+DB_RESERVED_CONNECTIONS = int(os.environ.get("DB_RESERVED_CONNECTIONS", "3"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "30000"))
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "500"))
+# A checkout that waits longer than this is logged: the pool is too small.
+SLOW_CHECKOUT_MS = float(os.environ.get("SLOW_CHECKOUT_MS", "100"))
+
+# Checkout wait per pool ("checkout"), and timeouts ("timeout").
+pool_wait = LatencyStats("db_pool_wait")
+# Wall time of statements by verb (SELECT, INSERT, ...).
+query_latency = LatencyStats("db_query")
+
+_engines = weakref.WeakSet()
+
+
+def pool_settings(env=os.environ):
+    """Return {pool_size, max_overflow} for this process' share of DB_MAX_CONNECTIONS."""
+    workers = max(1, int(env.get("GUNICORN_WORKERS") or env.get("WEB_CONCURRENCY") or 1))
+    threads = max(1, int(env.get("GUNICORN_WORKER_CONNECTIONS") or env.get("GUNICORN_THREADS", "1")))
+    instances = max(1, int(env.get("CLOUD_RUN_MAX_INSTANCES", "1")))
+    max_connections = int(env.get("DB_MAX_CONNECTIONS", DB_MAX_CONNECTIONS))
+    reserved = int(env.get("DB_RESERVED_CONNECTIONS", DB_RESERVED_CONNECTIONS))
+
+    budget = max(1, (max_connections - reserved) // (instances * workers))
+    pool_size = min(threads, budget)
+    return {"pool_size": pool_size, "max_overflow": budget - pool_size}
+
+
+def engine_options(database_uri, env=os.environ):
+    """SQLALCHEMY_ENGINE_OPTIONS for database_uri (empty for non-PostgreSQL URIs)."""
+    if not database_uri or not database_uri.startswith("postgresql"):
+        # SQLite (tests, local tools) keeps Flask-SQLAlchemy's own pool setup.
+        return {}
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+        "connect_args": {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"},
+    }
+    options.update(pool_settings(env))
+    return options
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            # Counted once, as a timeout; "checkout" only covers successful waits.
+            waited = time.perf_counter() - start
+            pool_wait.observe("timeout", waited)
+            logger.warning("Gave up after %.0f ms waiting for a database connection (%s)",
+                           waited * 1000, self.status())
+            raise
+        waited = time.perf_counter() - start
+        pool_wait.observe("checkout", waited)
+        if waited * 1000 >= SLOW_CHECKOUT_MS:
+            logger.warning("Waited %.0f ms for a database connection (%s)",
+                           waited * 1000, self.status())
+        return connection
+
+
+def lift_statement_timeout(connection):
+    """Drop statement_timeout for the rest of connection's current transaction.
+
+    The engine-wide timeout is sized for web requests; migrations and the
+    retention job copy and rebuild whole tables and must not be cancelled.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET LOCAL statement_timeout = 0")
+    return connection
+
+
+def pool_status(engine):
+    """Current {size, checked_in, in_use, overflow} of engine's pool."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "in_use": pool.checkedout(),
+        "overflow": max(0, pool.overflow()),
+    }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "?"
+    query_latency.observe(verb, elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Slow query (%.0f ms%s): %s", elapsed * 1000,
+                       ", executemany" if executemany else "",
+                       " ".join(statement.split())[:500])
+
+
+def instrument_engine(engine):
+    """Attach query timing / slow-query logging to engine (idempotent)."""
+    if engine in _engines:
+        return engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _engines.add(engine)
+    return engine
+
+
+def init_app(app, db):
+    """Configure the engine options, then initialize db on app and instrument its engine."""
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS",
+                          engine_options(app.config.get("SQLALCHEMY_DATABASE_URI")))
+    db.init_app(app)
+    with app.app_context():
+        instrument_engine(db.engine)
+
+
+def dispose_engines():
+    """Drop pooled connections inherited from a parent process (after fork)."""
+    for engine in list(_engines):
+        # close=False: the parent still owns those sockets.
+        engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=dispose_engines)
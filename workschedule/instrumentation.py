@@ -0,0 +1,128 @@
+"""
+instrumentation.py
+
+Request metrics and the /metrics endpoint.
+
+init_app() counts every request by endpoint, method and status, times it
+into a histogram, tracks how many are in flight, and serves everything in
+metrics.registry (plus every LatencyStats) on GET /metrics in the
+Prometheus text format. Point-in-time state is read on each scrape:
+database pool checkouts, upload admission slots and queue, and page/user
+cache hit counts.
+
+Together with the per-stage histogram (metrics.stage_seconds: extract,
+parse, persist, ics_generate, storage_get/put/delete, stripe_checkout,
+mailgun_send, render) this shows where an upload's time goes and which
+resource saturates first.
+
+/metrics requires ``Authorization: Bearer <METRICS_TOKEN>`` and answers
+404 while METRICS_TOKEN is unset, so a deployment that forgets the token
+does not publish its internals.
+"""
+import hmac
+import os
+import time
+
+from flask import Response, abort, g, request
+
+from workschedule.metrics import Counter, Gauge, Histogram, registry, render_prometheus
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+http_requests = registry.register(Counter(
+    "workschedule_http_requests_total",
+    "HTTP requests by endpoint, method and status",
+    ["endpoint", "method", "status"]))
+http_request_seconds = registry.register(Histogram(
+    "workschedule_http_request_duration_seconds",
+    "Time to produce the response (excludes streaming the body)",
+    ["endpoint"]))
+http_in_flight = registry.register(Gauge(
+    "workschedule_http_requests_in_flight",
+    "Requests currently being handled by this process"))
+
+
+def _pool_state():
+    from workschedule import database
+    from workschedule.app import db
+    try:
+        status = database.pool_status(db.engine)
+    except Exception:
+        return {}
+    return {(state,): value for state, value in status.items()}
+
+
+def _admission_state():
+    from workschedule.services.admission import upload_admission
+    snapshot = upload_admission.snapshot()
+    return {(upload_admission.name, key): snapshot[key] for key in ("slots", "active", "waiting")}
+
+
+def _admission_outcomes():
+    from workschedule.services.admission import upload_admission
+    snapshot = upload_admission.snapshot()
+    return {(upload_admission.name, outcome): snapshot[outcome] for outcome in ("admitted", "rejected")}
+
+
+def _cache_state():
+    from workschedule.services.page_cache import page_cache
+    from workschedule.services.user_cache import user_cache
+    return {("page", "hit"): page_cache.hits, ("page", "miss"): page_cache.misses,
+            ("user", "hit"): user_cache.hits, ("user", "miss"): user_cache.misses}
+
+
+registry.register(Gauge(
+    "workschedule_db_pool_connections",
+    "Database pool connections by state (size, checked_in, in_use, overflow)",
+    ["state"], callback=_pool_state))
+registry.register(Gauge(
+    "workschedule_admission_slots",
+    "Admission controller slots and queue (slots, active, waiting)",
+    ["endpoint", "state"], callback=_admission_state))
+registry.register(Counter(
+    "workschedule_admission_requests_total",
+    "Requests admitted or shed by the admission controller",
+    ["endpoint", "outcome"], callback=_admission_outcomes))
+registry.register(Counter(
+    "workschedule_cache_lookups_total",
+    "Page and user cache lookups",
+    ["cache", "result"], callback=_cache_state))
+
+
+def metrics_view():
+    if not METRICS_TOKEN:
+        abort(404)
+    supplied = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(supplied.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        abort(401)
+    response = Response(render_prometheus(), mimetype="text/plain")
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def init_app(app):
+    """Instrument every request and serve GET /metrics."""
+
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_in_flight = True
+        http_in_flight.inc()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            http_request_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+            http_requests.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def _end_request_metrics(error=None):
+        # Runs however the request ended, so the gauge cannot drift upward.
+        if g.pop("metrics_in_flight", False):
+            http_in_flight.dec()
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
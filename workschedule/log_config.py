@@ -0,0 +1,175 @@
+"""
+log_config.py
+
+Structured, leveled logging for the app.
+
+configure() puts one handler on the root logger:
+
+* LOG_FORMAT: ``json`` (the default on Cloud Run) writes one JSON object
+  per line with the keys Cloud Logging understands (severity, message,
+  time, logging.googleapis.com/trace) plus logger, request_id and any
+  ``extra=`` fields. ``text`` is a plain line for terminals.
+* LOG_LEVEL (default INFO) is the root level. LOG_LEVELS overrides it
+  per module: ``workschedule.routes.schedule=DEBUG,urllib3=WARNING``.
+* LOG_DEBUG_SAMPLE_RATE (default 1.0) is the fraction of requests whose
+  DEBUG records are kept. The choice is made once per request id, so a
+  sampled request keeps all of its debug lines and the rest keep none.
+
+init_app() binds each request's id (middleware/request_id.py) for the
+records it emits and returns it in X-Request-ID; concurrency.submit()
+carries it onto the I/O pool.
+
+Log through module loggers with %-style arguments
+(``logger.debug("Parsed %d shifts", n)``) so nothing is formatted below
+the level, and log counts and ids rather than schedule text, shifts,
+emails or form data.
+"""
+import contextvars
+import json
+import logging
+import os
+import sys
+import zlib
+from datetime import datetime, timezone
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json" if os.getenv("K_SERVICE") else "text")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT") or os.getenv("GCLOUD_PROJECT")
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+
+# Attributes every LogRecord has; anything else came from extra=.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "trace_id"}
+
+_handler = None
+
+
+def bind_request_context(fn):
+    """Wrap fn to run on another thread with the calling request's id bound.
+
+    Only the logging variables are carried over, in a fresh context, so
+    the pool thread does not also see the request's Flask contexts.
+    """
+    request_id, trace_id = _request_id.get(), _trace_id.get()
+    if request_id is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        def run():
+            _request_id.set(request_id)
+            _trace_id.set(trace_id)
+            return fn(*args, **kwargs)
+        return contextvars.Context().run(run)
+
+    return bound
+
+
+def parse_levels(spec):
+    """``"a=DEBUG,b.c=WARNING"`` -> {"a": "DEBUG", "b.c": "WARNING"}."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def debug_sampled(request_id, rate):
+    """Whether DEBUG records of this request are kept at sample rate `rate`."""
+    if rate >= 1.0:
+        return True
+    return zlib.crc32(request_id.encode()) % 10000 < rate * 10000
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the request id and drops unsampled DEBUG records."""
+
+    def __init__(self, debug_sample_rate=None):
+        super().__init__()
+        self.debug_sample_rate = (LOG_DEBUG_SAMPLE_RATE if debug_sample_rate is None
+                                  else debug_sample_rate)
+
+    def filter(self, record):
+        request_id = _request_id.get()
+        record.request_id = request_id or "-"
+        record.trace_id = _trace_id.get()
+        if record.levelno <= logging.DEBUG and request_id:
+            return debug_sampled(request_id, self.debug_sample_rate)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, in the shape Cloud Logging parses."""
+
+    def format(self, record):
+        entry = {
+            "severity": record.levelname,
+            "message": record.getMessage(),
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "logger": record.name,
+        }
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            entry["request_id"] = request_id
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id and PROJECT_ID:
+            entry["logging.googleapis.com/trace"] = f"projects/{PROJECT_ID}/traces/{trace_id}"
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(fmt=None, level=None, levels=None, stream=None):
+    """Install the handler and levels; later calls replace the earlier setup."""
+    global _handler
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if (fmt or LOG_FORMAT) == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handler.addFilter(RequestContextFilter())
+    root.addHandler(handler)
+    root.setLevel((level or LOG_LEVEL).upper())
+    for name, module_level in parse_levels(LOG_LEVELS if levels is None else levels).items():
+        logging.getLogger(name).setLevel(module_level)
+    _handler = handler
+    return handler
+
+
+def init_app(app):
+    """Bind the request id for each request's log records and echo it back."""
+    from flask import g, request
+
+    from workschedule.middleware.request_id import request_id_for
+
+    @app.before_request
+    def _bind_request_id():
+        request_id = request_id_for(request.environ)
+        trace = request.headers.get("X-Cloud-Trace-Context", "").split("/", 1)[0]
+        g.log_context = (_request_id.set(request_id), _trace_id.set(trace or None))
+
+    @app.after_request
+    def _add_request_id_header(response):
+        request_id = _request_id.get()
+        if request_id:
+            response.headers["X-Request-ID"] = request_id
+        return response
+
+    @app.teardown_request
+    def _unbind_request_id(error=None):
+        # gthread reuses threads; a stale id must not leak into the next request.
+        tokens = g.pop("log_context", None)
+        if tokens is not None:
+            _request_id.reset(tokens[0])
+            _trace_id.reset(tokens[1])
@@ -0,0 +1,294 @@
+"""
+metrics.py
+
+Small in-process metrics shared by the service modules, exported in the
+Prometheus text format on /metrics.
+
+Each LatencyStats instance keeps count / total / max per label (a host name,
+a pipeline stage, ...). Counter, Gauge and Histogram are the usual
+Prometheus types; stage_seconds times each step of the upload/payment
+pipeline (see @timed). It is all deliberately dependency-free so it can be
+used from import-time code and from background threads alike.
+
+Values are per process: with several gunicorn workers each scrape sees the
+worker that answered it, so aggregate with sum()/rate() across scrapes.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Every LatencyStats, in creation order, for render_prometheus().
+_latency_stats = []
+
+
+class LatencyStats:
+    """Thread-safe per-label latency accumulator."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._data = {}
+        _latency_stats.append(self)
+
+    def observe(self, label, seconds):
+        with self._lock:
+            entry = self._data.get(label)
+            if entry is None:
+                self._data[label] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    @contextmanager
+    def time(self, label):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(label, time.perf_counter() - start)
+
+    def snapshot(self):
+        """Return {label: {count, total_seconds, avg_seconds, max_seconds}}."""
+        with self._lock:
+            return {
+                label: {
+                    "count": count,
+                    "total_seconds": total,
+                    "avg_seconds": total / count,
+                    "max_seconds": peak,
+                }
+                for label, (count, total, peak) in self._data.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+
+# ---------------------------------------------------------------------------
+# Prometheus-style metrics
+# ---------------------------------------------------------------------------
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # callback() -> {label value tuple: value}, read on every scrape
+        # instead of values recorded with inc()/set().
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _items(self):
+        if self.callback is not None:
+            return sorted(self.callback().items())
+        with self._lock:
+            return sorted(self._values.items())
+
+    def _simple_samples(self):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(v)}" for key, v in self._items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        return self._simple_samples()
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        return self._simple_samples()
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, ([*counts], total, n)) for key, (counts, total, n) in self._values.items())
+        lines = []
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _labels(self.labelnames, key, [("le", _number(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def unregister(self, name):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return lines
+
+
+registry = Registry()
+
+
+def _render_latency_stats(stats):
+    """A LatencyStats as a Prometheus summary (count/sum) plus a _max gauge."""
+    name = f"workschedule_{stats.name}_seconds"
+    snapshot = sorted(stats.snapshot().items())
+    lines = [f"# HELP {name} {stats.name} latency", f"# TYPE {name} summary"]
+    for label, entry in snapshot:
+        lines.append(f"{name}_count{_labels(('label',), (label,))} {entry['count']}")
+        lines.append(f"{name}_sum{_labels(('label',), (label,))} {_number(entry['total_seconds'])}")
+    lines += [f"# HELP {name}_max Slowest {stats.name} observation", f"# TYPE {name}_max gauge"]
+    for label, entry in snapshot:
+        lines.append(f"{name}_max{_labels(('label',), (label,))} {_number(entry['max_seconds'])}")
+    return lines
+
+
+def render_prometheus():
+    """Everything in the registry plus every LatencyStats, in text format 0.0.4."""
+    lines = registry.render()
+    for stats in list(_latency_stats):
+        lines.extend(_render_latency_stats(stats))
+    return "\n".join(lines) + "\n"
+
+
+stage_seconds = registry.register(Histogram(
+    "workschedule_stage_duration_seconds",
+    "Duration of upload/payment pipeline stages",
+    ["stage"]))
+stage_errors = registry.register(Counter(
+    "workschedule_stage_errors_total",
+    "Pipeline stages that raised",
+    ["stage"]))
+
+
+def timed(stage):
+    """Decorator: record each call in stage_seconds (and stage_errors if it raises)."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                stage_errors.inc(stage=stage)
+                raise
+            finally:
+                stage_seconds.observe(time.perf_counter() - start, stage=stage)
+
+        return wrapper
+
+    return decorator
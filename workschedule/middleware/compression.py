@@ -0,0 +1,237 @@
+"""
+compression.py
+
+WSGI middleware that gzip/brotli-encodes text responses (HTML, JSON, CSS,
+JS, NDJSON/CSV exports) for clients that advertise support in
+Accept-Encoding. The review page lists every parsed shift and is several
+times smaller compressed, which matters most on mobile connections.
+
+* Responses with a Content-Length (rendered templates, jsonify) are
+  compressed in one go and keep an accurate Content-Length; smaller than
+  COMPRESS_MIN_BYTES they are passed through untouched.
+* Streamed responses (no Content-Length, e.g. the admin exports) are
+  compressed chunk by chunk as the app yields them, so memory stays flat.
+* Anything already encoded (the precompressed static assets), partial
+  content, HEAD requests, ``Cache-Control: no-transform``, calendar files
+  and binary types are left alone.
+
+Every response of a compressible type gets ``Vary: Accept-Encoding`` so
+shared caches keep the encoded and plain variants apart. Brotli is used
+when the optional ``brotli`` package is installed and the client accepts it.
+"""
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+# Dynamic responses: quality 4-5 is close to gzip -9's size at gzip -6's speed.
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "application/xml",
+    "image/svg+xml",
+}
+# text/* is compressible except these: calendar clients and "Add to
+# calendar" downloads get the .ics bytes exactly as stored.
+INCOMPRESSIBLE_TEXT_TYPES = {"text/calendar", "text/event-stream"}
+
+# No body, or a byte range of the unencoded body.
+_UNENCODED_STATUSES = {"204", "206", "304"}
+
+
+def accepted_encodings(header):
+    """Content codings with q > 0 from an Accept-Encoding header."""
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def is_compressible(mimetype):
+    mimetype = (mimetype or "").split(";", 1)[0].strip().lower()
+    if mimetype.startswith("text/"):
+        return mimetype not in INCOMPRESSIBLE_TEXT_TYPES
+    return mimetype in COMPRESSIBLE_TYPES
+
+
+class _Gzip:
+    def __init__(self, level):
+        # wbits 16 + MAX_WBITS: gzip container rather than raw zlib
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def finish(self):
+        return self._z.flush()
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._b = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._b.process(data)
+
+    def finish(self):
+        return self._b.finish()
+
+
+def _header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _without(headers, *names):
+    names = {n.lower() for n in names}
+    return [(k, v) for k, v in headers if k.lower() not in names]
+
+
+def _add_vary(headers):
+    vary = _header(headers, "Vary")
+    if vary is None:
+        return headers + [("Vary", "Accept-Encoding")]
+    tokens = {t.strip().lower() for t in vary.split(",")}
+    if "*" in tokens or "accept-encoding" in tokens:
+        return headers
+    return _without(headers, "Vary") + [("Vary", f"{vary}, Accept-Encoding")]
+
+
+class _Primed:
+    """An app iterable whose first chunk has already been produced."""
+
+    def __init__(self, app_iter):
+        self._app_iter = app_iter
+        self._iterator = iter(app_iter)
+        self._first = [chunk for chunk in (next(self._iterator, None),) if chunk is not None]
+
+    def __iter__(self):
+        yield from self._first
+        yield from self._iterator
+
+    def close(self):
+        if hasattr(self._app_iter, "close"):
+            self._app_iter.close()
+
+
+class CompressionMiddleware:
+    """Wrap a WSGI app: ``app.wsgi_app = CompressionMiddleware(app.wsgi_app)``."""
+
+    def __init__(self, app, min_bytes=None, gzip_level=None, brotli_quality=None):
+        self.app = app
+        self.min_bytes = COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+        self.gzip_level = COMPRESS_GZIP_LEVEL if gzip_level is None else gzip_level
+        self.brotli_quality = COMPRESS_BROTLI_QUALITY if brotli_quality is None else brotli_quality
+
+    def _choose_coding(self, environ):
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return None
+        accepted = accepted_encodings(environ.get("HTTP_ACCEPT_ENCODING"))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compressor(self, coding):
+        if coding == "br":
+            return _Brotli(self.brotli_quality)
+        return _Gzip(self.gzip_level)
+
+    def _should_compress(self, status, headers, coding):
+        if coding is None or status[:3] in _UNENCODED_STATUSES or status.startswith("1"):
+            return False
+        if _header(headers, "Content-Encoding") or _header(headers, "Content-Range"):
+            return False
+        if "no-transform" in (_header(headers, "Cache-Control") or "").lower():
+            return False
+        length = _header(headers, "Content-Length")
+        return length is None or int(length) >= self.min_bytes
+
+    def _encoded_headers(self, headers, coding):
+        headers = _without(headers, "Content-Length", "Accept-Ranges")
+        etag = _header(headers, "ETag")
+        if etag and not etag.startswith("W/"):
+            # The encoded bytes differ, so the tag can no longer be strong.
+            headers = _without(headers, "ETag") + [("ETag", f"W/{etag}")]
+        return headers + [("Content-Encoding", coding)]
+
+    def __call__(self, environ, start_response):
+        coding = self._choose_coding(environ)
+        plan = {}
+        started = []
+
+        def _start_response(status, headers, exc_info=None):
+            started.append(True)
+            if is_compressible(_header(headers, "Content-Type")):
+                headers = _add_vary(headers)
+                if self._should_compress(status, headers, coding):
+                    plan["buffered"] = _header(headers, "Content-Length") is not None
+                    plan["status"], plan["headers"] = status, self._encoded_headers(headers, coding)
+                    plan["compressor"] = self._compressor(coding)
+                    if plan["buffered"]:
+                        # Sent once the body is compressed and its length known.
+                        plan["exc_info"] = exc_info
+                        return plan.setdefault("written", []).append
+                    write = start_response(plan["status"], plan["headers"], exc_info)
+                    return lambda data: write(plan["compressor"].compress(data))
+            plan.clear()
+            return start_response(status, headers, exc_info)
+
+        app_iter = self.app(environ, _start_response)
+        if not started:
+            # The app defers start_response to its first chunk (werkzeug
+            # never does); pull that chunk so the headers are known.
+            app_iter = _Primed(app_iter)
+        if not plan:
+            return app_iter
+        if plan["buffered"]:
+            return self._compress_buffered(app_iter, plan, start_response)
+        return self._compress_streaming(app_iter, plan)
+
+    @staticmethod
+    def _compress_buffered(app_iter, plan, start_response):
+        try:
+            body = b"".join(plan.get("written", [])) + b"".join(app_iter)
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+        compressor = plan["compressor"]
+        data = compressor.compress(body) + compressor.finish()
+        start_response(plan["status"], plan["headers"] + [("Content-Length", str(len(data)))],
+                       plan["exc_info"])
+        return [data]
+
+    @staticmethod
+    def _compress_streaming(app_iter, plan):
+        compressor = plan["compressor"]
+        try:
+            for chunk in app_iter:
+                data = compressor.compress(chunk)
+                if data:
+                    yield data
+            yield compressor.finish()
+        finally:
+            # Closing the app iterable tears down stream_with_context's request.
+            if hasattr(app_iter, "close"):
+                app_iter.close()
@@ -0,0 +1,246 @@
+"""
+profiling.py
+
+Opt-in profiling of individual production requests.
+
+A request is profiled when it carries ``X-Profile-Token: <PROFILE_TOKEN>``
+or is picked by PROFILE_SAMPLE_RATE (a fraction, e.g. 0.001). Two
+profilers are available, chosen by PROFILE_MODE or per request with
+``X-Profile-Mode``:
+
+* ``sample`` (default): a background thread records the request thread's
+  stack every PROFILE_INTERVAL_MS. Wall-clock, so time spent waiting on
+  GCS or the database shows up next to fitz and the parser. Written as
+  folded stacks (``frame;frame;frame count``), which flamegraph.pl and
+  speedscope.app read directly.
+* ``cprofile``: deterministic cProfile of the request thread; written as a
+  .pstats file (``python -m pstats``, snakeviz) plus a text summary.
+
+Only the request thread is profiled; work handed to the I/O pool appears
+as the time spent waiting for it. Files are named
+``<UTC time>-<request id>-<METHOD>-<path>`` and go to PROFILE_OUTPUT: a
+local directory, or ``gs://bucket/prefix`` for the storage backend.
+They are written off the request path. Token-triggered responses carry
+``X-Profile-Id`` with the request id.
+
+create_app() only installs the middleware when PROFILE_TOKEN or
+PROFILE_SAMPLE_RATE is set, so a disabled profiler costs nothing.
+"""
+import cProfile
+import hmac
+import io
+import logging
+import marshal
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from workschedule.middleware.request_id import request_id_for
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "/tmp/workschedule-profiles")
+
+MODES = ("sample", "cprofile")
+
+
+def enabled():
+    return bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's stack on a timer; folded() renders the counts."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class _CProfiler:
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def resume(self):
+        self.profile.enable()
+
+    def pause(self):
+        self.profile.disable()
+
+    def outputs(self):
+        self.profile.create_stats()
+        # .pstats is what Profile.dump_stats() writes; marshal it before
+        # pstats.Stats() takes (and empties) the profile's stats.
+        dumped = marshal.dumps(self.profile.stats)
+        summary = io.StringIO()
+        pstats.Stats(self.profile, stream=summary).sort_stats("cumulative").print_stats(60)
+        return {".pstats": dumped, ".txt": summary.getvalue().encode()}
+
+
+class _Sampler:
+    def __init__(self, interval):
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self.sampler.start()
+
+    def resume(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def outputs(self):
+        self.sampler.stop()
+        return {".folded": self.sampler.folded().encode()}
+
+
+class LocalSink:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write(self, name, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        # Write then rename, so nothing picks up a half-written profile.
+        with open(path + ".part", "wb") as f:
+            f.write(data)
+        os.replace(path + ".part", path)
+        return path
+
+
+class StorageSink:
+    def __init__(self, url):
+        bucket, _, prefix = url[len("gs://"):].partition("/")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def write(self, name, data):
+        from workschedule import clients
+        path = f"{self.prefix}/{name}" if self.prefix else name
+        clients.get_gcs_bucket(self.bucket).blob(path).upload_from_string(data)
+        return f"gs://{self.bucket}/{path}"
+
+
+def sink_for(output):
+    return StorageSink(output) if output.startswith("gs://") else LocalSink(output)
+
+
+def _slug(path):
+    return re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:60] or "root"
+
+
+class ProfilingMiddleware:
+    """Wrap a WSGI app; see the module docstring for how requests opt in."""
+
+    def __init__(self, app, token=None, sample_rate=None, mode=None, interval_ms=None, output=None):
+        self.app = app
+        self.token = PROFILE_TOKEN if token is None else token
+        self.sample_rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.mode = PROFILE_MODE if mode is None else mode
+        self.interval = (PROFILE_INTERVAL_MS if interval_ms is None else interval_ms) / 1000.0
+        self.sink = sink_for(PROFILE_OUTPUT if output is None else output)
+
+    def _requested_by_token(self, environ):
+        supplied = environ.get("HTTP_X_PROFILE_TOKEN")
+        return bool(self.token and supplied
+                    and hmac.compare_digest(supplied.encode(), self.token.encode()))
+
+    def __call__(self, environ, start_response):
+        by_token = self._requested_by_token(environ)
+        if not by_token and not (self.sample_rate and random.random() < self.sample_rate):
+            return self.app(environ, start_response)
+
+        mode = environ.get("HTTP_X_PROFILE_MODE", self.mode) if by_token else self.mode
+        if mode not in MODES:
+            mode = "sample"
+        request_id = request_id_for(environ)
+        started = time.time()
+        profiler = _CProfiler() if mode == "cprofile" else _Sampler(self.interval)
+
+        def _start_response(status, headers, exc_info=None):
+            if by_token:
+                headers = headers + [("X-Profile-Id", request_id)]
+            return start_response(status, headers, exc_info)
+
+        profiler.resume()
+        try:
+            app_iter = self.app(environ, _start_response)
+        except BaseException:
+            profiler.pause()
+            self._save(profiler, environ, request_id, started)
+            raise
+        profiler.pause()
+        return self._profile_body(app_iter, profiler, environ, request_id, started)
+
+    def _profile_body(self, app_iter, profiler, environ, request_id, started):
+        # Streamed bodies (exports) do their work while being iterated.
+        try:
+            iterator = iter(app_iter)
+            while True:
+                profiler.resume()
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    profiler.pause()
+                yield chunk
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+            self._save(profiler, environ, request_id, started)
+
+    def _save(self, profiler, environ, request_id, started):
+        stamp = datetime.fromtimestamp(started, timezone.utc).strftime("%Y%m%dT%H%M%S")
+        base = f"{stamp}-{request_id}-{environ.get('REQUEST_METHOD', 'GET')}-{_slug(environ.get('PATH_INFO', '/'))}"
+        elapsed_ms = (time.time() - started) * 1000
+        outputs = profiler.outputs()
+
+        def write():
+            for suffix, data in outputs.items():
+                try:
+                    location = self.sink.write(base + suffix, data)
+                    logger.info("Profile of request %s (%.0f ms) written to %s",
+                                request_id, elapsed_ms, location)
+                except Exception as e:
+                    logger.warning("Could not write profile %s%s: %s", base, suffix, e)
+
+        from workschedule import concurrency
+        concurrency.get_executor().submit(write)
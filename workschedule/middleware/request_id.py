@@ -0,0 +1,31 @@
+"""
+request_id.py
+
+One identifier per request, shared by everything that reports on it.
+
+Taken from an incoming X-Request-ID (if it looks sane), else from the
+trace id Cloud Run's front end puts in X-Cloud-Trace-Context (so it
+matches the request log in Cloud Logging), else a fresh uuid4. The
+value is computed once and cached in the WSGI environ.
+"""
+import re
+import uuid
+
+REQUEST_ID_ENVIRON_KEY = "workschedule.request_id"
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+
+def request_id_for(environ):
+    """The request's id, creating and caching it on first use."""
+    request_id = environ.get(REQUEST_ID_ENVIRON_KEY)
+    if request_id:
+        return request_id
+    candidate = environ.get("HTTP_X_REQUEST_ID", "")
+    if not _SAFE_ID.match(candidate):
+        # X-Cloud-Trace-Context: TRACE_ID/SPAN_ID;o=1
+        candidate = environ.get("HTTP_X_CLOUD_TRACE_CONTEXT", "").split("/", 1)[0]
+    if not _SAFE_ID.match(candidate):
+        candidate = uuid.uuid4().hex
+    environ[REQUEST_ID_ENVIRON_KEY] = candidate
+    return candidate
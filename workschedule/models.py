@@ -1,4 +1,6 @@
 # workschedule-cloud/src/models.py
+from sqlalchemy.dialects.postgresql import JSONB
+
 from workschedule.app import db # Correctly imports the SQLAlchemy db instance
 
 
@@ -12,19 +14,56 @@ class User(db.Model):
     subscription_status = db.Column(db.String(50), default='trial')
     ics_feed_token = db.Column(db.String(64), unique=True, nullable=True)
 
+    # Reminder emails: users whose next_reminder_at has passed are due.
+    next_reminder_at = db.Column(db.DateTime, nullable=True, index=True)
+    last_reminder_at = db.Column(db.DateTime, nullable=True)
+
     def __repr__(self):
-        import logging
-        logging.debug(f'User __repr__ called for {self.email} (UID: {self.firebase_uid})')
         return f'<User {self.email} (UID: {self.firebase_uid})>'
 
 
 # New model for storing parsed schedules
+# On PostgreSQL this table is partitioned by created_at month (see migration
+# 48e9973cf8e4 and services/retention_service.py): its primary key is really
+# (id, created_at) and job_id is only unique together with created_at.
 class Schedule(db.Model):
+    __table_args__ = (
+        # Serves the @> containment filters in db_service.find_schedules().
+        db.Index('ix_schedule_schedule_data', 'schedule_data',
+                 postgresql_using='gin', postgresql_ops={'schedule_data': 'jsonb_path_ops'}),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_email = db.Column(db.String(120), nullable=False, index=True)
-    job_id = db.Column(db.String(64), unique=True, nullable=False, index=True)
-    schedule_data = db.Column(db.Text, nullable=False)  # Store as JSON string
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    job_id = db.Column(db.String(64), nullable=False, index=True)
+    # {"timezone": ..., "shifts": [{shift_date, department, shift_start,
+    # shift_end, store_number}, ...]}; JSONB with a GIN index on PostgreSQL.
+    schedule_data = db.Column(db.JSON().with_variant(JSONB(), 'postgresql'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), index=True)
 
     def __repr__(self):
         return f'<Schedule {self.job_id} for {self.user_email}>'
+
+
+# One row per scheduled shift, written in bulk by the parse pipeline so that
+# range questions ("this user's shifts next week") are indexed queries
+# instead of decoding every Schedule.schedule_data blob.
+class Shift(db.Model):
+    __table_args__ = (
+        db.Index('ix_shift_user_id_starts_at', 'user_id', 'starts_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Stable hash of owner (user, or anonymous uploader) + shift times +
+    # place; re-uploading the same schedule maps onto the same rows.
+    uid = db.Column(db.String(64), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True)
+    job_id = db.Column(db.String(64), nullable=False, index=True)
+    starts_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    ends_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    store_number = db.Column(db.String(16), nullable=True)
+    department = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    def __repr__(self):
+        return f'<Shift {self.starts_at} - {self.ends_at} (job {self.job_id})>'
@@ -0,0 +1,5 @@
+"""
+Performance tooling: startup/import-time reports and benchmarks.
+
+Nothing in this package is imported by the application itself.
+"""
@@ -0,0 +1,71 @@
+"""
+python -m workschedule.perf <command>
+
+Commands:
+    startup      Import-time, create_app() and SDK init profile (+ JSON artifact)
+    importtime   Cold import report for workschedule.wsgi with a budget check
+    shifts       Per-row ORM inserts vs. bulk upsert of parsed shifts
+    workers      gunicorn worker models on the upload-to-download flow
+"""
+import argparse
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m workschedule.perf")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    startup = sub.add_parser("startup", help="profile worker boot")
+    startup.add_argument("--out-dir", default="perf-results",
+                         help="where to write startup-<commit>.{json,txt}")
+    startup.add_argument("--compare", metavar="JSON",
+                         help="previous startup-*.json to diff against")
+    startup.add_argument("--budget-ms", type=float, default=None,
+                         help="fail if the cold import of workschedule.wsgi exceeds this")
+    startup.add_argument("--regression-pct", type=float, default=25.0,
+                         help="with --compare, fail if any timing grew by more than this")
+
+    importtime = sub.add_parser("importtime", help="cold import report")
+    importtime.add_argument("args", nargs=argparse.REMAINDER)
+
+    shifts = sub.add_parser("shifts", help="benchmark shift persistence")
+    shifts.add_argument("--database-url", default=None,
+                        help="database to write to (default: a scratch SQLite file)")
+    shifts.add_argument("--rows", type=int, nargs="+", default=None,
+                        help="batch sizes to measure")
+
+    workers = sub.add_parser("workers", help="compare gunicorn worker models")
+    workers.add_argument("--modes", nargs="+", choices=("sync", "gthread", "gevent"),
+                         default=["sync", "gthread", "gevent"])
+    workers.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    workers.add_argument("--flows", type=int, default=4, help="flows per client")
+    workers.add_argument("--latency-ms", type=float, default=80.0,
+                         help="simulated latency of each GCS / Stripe call")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "startup":
+        from workschedule.perf import startup as startup_mod
+        kwargs = {"out_dir": args.out_dir, "compare": args.compare,
+                  "regression_pct": args.regression_pct}
+        if args.budget_ms is not None:
+            kwargs["budget_ms"] = args.budget_ms
+        return startup_mod.run(**kwargs)
+    if args.command == "importtime":
+        from workschedule.perf import importtime as importtime_mod
+        return importtime_mod.main(args.args)
+    if args.command == "shifts":
+        from workschedule.perf import shifts as shifts_mod
+        kwargs = {"database_url": args.database_url}
+        if args.rows:
+            kwargs["row_counts"] = args.rows
+        return shifts_mod.run(**kwargs)
+    if args.command == "workers":
+        from workschedule.perf import workers as workers_mod
+        return workers_mod.run(modes=args.modes, concurrency=args.concurrency,
+                               flows_per_client=args.flows, latency_ms=args.latency_ms)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+bench_app.py
+
+The real application with its network dependencies replaced by local fakes
+that sleep for BENCH_IO_LATENCY_MS per call, for ``python -m
+workschedule.perf workers``:
+
+* GCS: a bucket backed by files under BENCH_STORAGE_DIR (shared by every
+  gunicorn worker process, like the real bucket).
+* Stripe: create_checkout_session returns a session whose URL points
+  straight at /schedule/payment_success.
+
+Everything else (routing, PDF parsing with fitz, ICS generation, sessions,
+the database via SQLALCHEMY_DATABASE_URI) is the production code path.
+
+    gunicorn -c gunicorn.conf.py workschedule.perf.bench_app:app
+"""
+import os
+import time
+import uuid
+from types import SimpleNamespace
+
+IO_LATENCY_SECONDS = float(os.environ.get("BENCH_IO_LATENCY_MS", "80")) / 1000.0
+STORAGE_DIR = os.environ.get("BENCH_STORAGE_DIR", "/tmp/workschedule-bench-storage")
+
+
+def _io_wait():
+    time.sleep(IO_LATENCY_SECONDS)
+
+
+class FakeBlob:
+    def __init__(self, root, name):
+        self.name = name
+        self._path = os.path.join(root, name.replace("/", "__"))
+
+    def upload_from_string(self, data, content_type=None):
+        _io_wait()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        tmp = f"{self._path}.{uuid.uuid4().hex}"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path)
+
+    def upload_from_file(self, file_obj, content_type=None, rewind=False):
+        if rewind:
+            file_obj.seek(0)
+        self.upload_from_string(file_obj.read(), content_type)
+
+    def download_as_bytes(self):
+        _io_wait()
+        with open(self._path, "rb") as f:
+            return f.read()
+
+    def download_as_text(self):
+        return self.download_as_bytes().decode("utf-8")
+
+    def delete(self):
+        _io_wait()
+        os.remove(self._path)
+
+
+class FakeBucket:
+    def __init__(self, name):
+        self.name = name
+        self._root = os.path.join(STORAGE_DIR, name)
+        os.makedirs(self._root, exist_ok=True)
+
+    def blob(self, name):
+        return FakeBlob(self._root, name)
+
+
+class FakeStorageClient:
+    def bucket(self, name):
+        return FakeBucket(name)
+
+
+def fake_checkout_session(price_id, success_url=None, **kwargs):
+    _io_wait()
+    return SimpleNamespace(id=f"cs_bench_{uuid.uuid4().hex}", url=success_url,
+                           expires_at=int(time.time()) + 1800)
+
+
+def create_bench_app():
+    from workschedule import clients
+    from workschedule.app import create_app, db
+    from workschedule.routes import schedule
+
+    storage_client = FakeStorageClient()
+    clients.get_storage_client = lambda: storage_client
+    clients.get_gcs_bucket = lambda name=None: storage_client.bucket(name or clients.GCS_BUCKET_NAME)
+    schedule.create_checkout_session = fake_checkout_session
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+app = create_bench_app()
@@ -0,0 +1,96 @@
+"""
+importtime.py
+
+Cold-start report built on ``python -X importtime``.
+
+Imports the WSGI entry point (which builds the app exactly as gunicorn
+does) in a fresh interpreter, parses the per-module import timings from
+stderr and checks the total against a budget:
+
+    python -m workschedule.perf.importtime              # report + budget check
+    python -m workschedule.perf.importtime --budget-ms 2000 --top 30
+
+Exits non-zero when the budget is exceeded, so it can gate a deploy.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+
+STARTUP_BUDGET_MS = int(os.getenv("STARTUP_BUDGET_MS", "2500"))
+DEFAULT_TARGET = "workschedule.wsgi"
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+@dataclass
+class ImportEntry:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr_text):
+    """Parse ``-X importtime`` output into ImportEntry objects (in print order)."""
+    entries = []
+    for line in stderr_text.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append(ImportEntry(module, int(self_us), int(cumulative_us),
+                                       (len(indent) - 1) // 2))
+    return entries
+
+
+def run_importtime(target=DEFAULT_TARGET, python=sys.executable, env=None):
+    """Import `target` in a fresh interpreter and return its ImportEntry list."""
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, env=env or os.environ.copy(),
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    )
+    entries = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        tail = "\n".join(result.stderr.splitlines()[-15:])
+        raise RuntimeError(f"Importing {target} failed:\n{tail}")
+    return entries
+
+
+def total_ms(entries):
+    """Total import time: the sum of cumulative times of the top-level imports."""
+    return sum(e.cumulative_us for e in entries if e.depth == 0) / 1000.0
+
+
+def check_budget(entries, budget_ms=STARTUP_BUDGET_MS):
+    """Return (within_budget, total_ms)."""
+    total = total_ms(entries)
+    return total <= budget_ms, total
+
+
+def format_report(entries, top=20):
+    lines = [f"{'cumulative ms':>14} {'self ms':>9}  module"]
+    for e in sorted(entries, key=lambda e: e.cumulative_us, reverse=True)[:top]:
+        lines.append(f"{e.cumulative_us / 1000:14.1f} {e.self_us / 1000:9.1f}  {e.module}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--target", default=DEFAULT_TARGET)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    entries = run_importtime(args.target)
+    print(format_report(entries, args.top))
+    ok, total = check_budget(entries, args.budget_ms)
+    print(f"\nTotal import time for {args.target}: {total:.1f} ms "
+          f"(budget {args.budget_ms:.0f} ms) -> {'OK' if ok else 'OVER BUDGET'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+shifts.py
+
+Benchmark for persisting parsed shifts: per-row ORM adds versus the bulk
+upsert in db_service.save_shifts().
+
+    python -m workschedule.perf shifts                      # SQLite scratch file
+    python -m workschedule.perf shifts --database-url postgresql://... --rows 200 5000 20000
+
+For each batch size it reports wall time, rows/s and the number of
+statements sent to the database (each one a network round trip on Cloud
+SQL). Statements save_shifts() issues on the raw psycopg2 cursor are not
+seen by SQLAlchemy's events, so those are counted from its batch plan.
+
+The target database needs the shift table; on a scratch SQLite file it is
+created for you. Rows are written under benchmark job ids and deleted
+afterwards.
+"""
+import datetime
+import os
+import tempfile
+import time
+import uuid
+
+import pytz
+from sqlalchemy import event
+
+DEFAULT_ROWS = (50, 500, 5000)
+
+
+def _make_rows(count, job_id):
+    from workschedule.services.db_service import shift_uid
+    start = pytz.utc.localize(datetime.datetime(2030, 1, 1, 9))
+    rows = []
+    for i in range(count):
+        starts_at = start + datetime.timedelta(hours=i)
+        ends_at = starts_at + datetime.timedelta(hours=8)
+        department = f"Dept {i % 7}"
+        rows.append({
+            "uid": shift_uid(f"job:{job_id}", starts_at, ends_at, department, "#0001"),
+            "user_id": None,
+            "job_id": job_id,
+            "starts_at": starts_at,
+            "ends_at": ends_at,
+            "store_number": "#0001",
+            "department": department,
+        })
+    return rows
+
+
+def _bench_app(database_url):
+    from flask import Flask
+    from workschedule import database
+    from workschedule.app import db
+    from workschedule.models import Shift
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    database.init_app(app, db)
+    with app.app_context():
+        if database_url.startswith("sqlite"):
+            Shift.__table__.create(db.engine, checkfirst=True)
+    return app
+
+
+class _StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        self.engine = engine
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def _raw_cursor_statements(engine, count):
+    """Statements save_shifts() sends on the raw psycopg2 cursor for `count` rows."""
+    from workschedule.services.db_service import COPY_THRESHOLD, EXECUTE_VALUES_PAGE_SIZE
+    if engine.dialect.name != "postgresql" or engine.dialect.driver != "psycopg2":
+        return 0
+    if count >= COPY_THRESHOLD:
+        return 3  # CREATE TEMP TABLE, COPY, INSERT ... SELECT
+    return -(-count // EXECUTE_VALUES_PAGE_SIZE)
+
+
+def _orm_per_row(rows):
+    from workschedule.app import db
+    from workschedule.models import Shift
+    for row in rows:
+        db.session.add(Shift(**row))
+        db.session.flush()
+    db.session.commit()
+
+
+def _bulk(rows):
+    from workschedule.services.db_service import save_shifts
+    save_shifts(rows)
+
+
+def run(database_url=None, row_counts=DEFAULT_ROWS):
+    """Entry point for ``python -m workschedule.perf shifts``; returns an exit code."""
+    from workschedule.app import db
+    from workschedule.models import Shift
+
+    scratch = None
+    if not database_url:
+        scratch = os.path.join(tempfile.mkdtemp(), "bench.sqlite")
+        database_url = f"sqlite:///{scratch}"
+    app = _bench_app(database_url)
+
+    with app.app_context():
+        print(f"Shift persistence benchmark ({db.engine.dialect.name}+{db.engine.dialect.driver})")
+        print(f"{'rows':>7} {'method':<16} {'seconds':>9} {'rows/s':>10} {'statements':>11}")
+        for count in row_counts:
+            orm_rows = _make_rows(count, f"bench-{uuid.uuid4()}")
+            bulk_rows = _make_rows(count, f"bench-{uuid.uuid4()}")
+            # The re-run hits every uid again: the idempotent re-upload case.
+            cases = (("orm per-row", _orm_per_row, orm_rows),
+                     ("bulk upsert", _bulk, bulk_rows),
+                     ("bulk re-upload", _bulk, bulk_rows))
+            for label, write, rows in cases:
+                with _StatementCounter(db.engine) as counter:
+                    started = time.perf_counter()
+                    write(rows)
+                    elapsed = time.perf_counter() - started
+                statements = counter.count
+                if write is _bulk:
+                    statements += _raw_cursor_statements(db.engine, count)
+                print(f"{count:7d} {label:<16} {elapsed:9.3f} {count / elapsed:10.0f} "
+                      f"{statements:11d}")
+            for rows in (orm_rows, bulk_rows):
+                Shift.query.filter_by(job_id=rows[0]["job_id"]).delete()
+            db.session.commit()
+    if scratch:
+        os.remove(scratch)
+    return 0
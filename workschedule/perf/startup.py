@@ -0,0 +1,205 @@
+"""
+startup.py
+
+Worker boot profile: where does cold-start time go?
+
+Measures, each in a fresh interpreter so nothing is already imported:
+
+* import time of each heavy third-party module (fitz, stripe,
+  google.cloud.storage, firebase_admin, icalendar, pytz, flask_migrate, ...)
+* import time of workschedule.app, then the time spent in create_app()
+* first-use initialization of each SDK client (storage, Firebase, Stripe)
+
+and writes a sorted text report plus a JSON artifact that can be compared
+with a previous run (``--compare``) to catch regressions before deploy.
+"""
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from workschedule.perf.importtime import run_importtime, total_ms, STARTUP_BUDGET_MS
+
+HEAVY_MODULES = (
+    "fitz",
+    "stripe",
+    "google.cloud.storage",
+    "firebase_admin",
+    "firebase_admin.auth",
+    "icalendar",
+    "pytz",
+    "flask",
+    "flask_sqlalchemy",
+    "flask_migrate",
+    "psycopg2",
+    "requests",
+)
+
+# Runs in a child interpreter; prints one JSON object on its last line.
+_APP_PROBE = r"""
+import json, time
+out = {}
+t = time.perf_counter()
+import workschedule.app as app_module
+out["import workschedule.app"] = time.perf_counter() - t
+t = time.perf_counter()
+app_module.create_app()
+out["create_app()"] = time.perf_counter() - t
+
+def timed(label, fn):
+    t = time.perf_counter()
+    try:
+        fn()
+        out[label] = time.perf_counter() - t
+    except Exception as e:
+        out[label] = None
+        out[label + " error"] = f"{type(e).__name__}: {e}"[:200]
+
+from workschedule import clients
+timed("sdk: storage.Client()", clients.get_storage_client)
+timed("sdk: firebase_admin.initialize_app()", clients.init_firebase)
+print(json.dumps(out))
+"""
+
+# create_app() already imports stripe_service (through the schedule routes),
+# so its import and client setup are timed in an interpreter of their own.
+_STRIPE_PROBE = r"""
+import json, time
+t = time.perf_counter()
+import workschedule.services.stripe_service
+print(json.dumps({"sdk: stripe_service import + init": time.perf_counter() - t}))
+"""
+
+
+def _repo_root():
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_repo_root(),
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def measure_module_imports(modules=HEAVY_MODULES):
+    """Return {module: cumulative import ms or None if not importable}."""
+    results = {}
+    for module in modules:
+        try:
+            entries = run_importtime(module)
+        except RuntimeError:
+            results[module] = None
+            continue
+        own = [e for e in entries if e.module == module]
+        results[module] = own[-1].cumulative_us / 1000.0 if own else None
+    return results
+
+
+def _run_probe(code, python=sys.executable):
+    result = subprocess.run([python, "-c", code], capture_output=True, text=True,
+                            cwd=_repo_root(), env=os.environ.copy())
+    lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+    if result.returncode != 0 or not lines:
+        tail = "\n".join(result.stderr.splitlines()[-10:])
+        raise RuntimeError(f"App startup probe failed:\n{tail}")
+    return json.loads(lines[-1])
+
+
+def measure_app(python=sys.executable):
+    """Time app import, create_app() and SDK client initialization in child processes."""
+    raw = _run_probe(_APP_PROBE, python)
+    raw.update(_run_probe(_STRIPE_PROBE, python))
+    return {k: (v * 1000.0 if isinstance(v, float) else v) for k, v in raw.items()}
+
+
+def collect():
+    """Run every measurement and return the JSON-serializable result."""
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "wsgi_import_ms": total_ms(run_importtime()),
+        "module_import_ms": measure_module_imports(),
+        "app_ms": measure_app(),
+    }
+
+
+def format_report(result, baseline=None):
+    def delta(section, key):
+        if not baseline:
+            return ""
+        old = baseline.get(section, {}).get(key)
+        new = result[section].get(key)
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+            return ""
+        return f"  ({new - old:+.1f} ms)"
+
+    lines = [f"Startup profile @ {result['commit'] or 'unknown commit'} "
+             f"(Python {result['python']})", ""]
+    lines.append(f"Cold import of workschedule.wsgi: {result['wsgi_import_ms']:.1f} ms"
+                 + (f"  ({result['wsgi_import_ms'] - baseline['wsgi_import_ms']:+.1f} ms)"
+                    if baseline else ""))
+    for title, section in (("App and SDK initialization", "app_ms"),
+                           ("Third-party module imports (each in a fresh interpreter)",
+                            "module_import_ms")):
+        lines += ["", title]
+        items = [(k, v) for k, v in result[section].items() if not k.endswith(" error")]
+        for key, value in sorted(items, key=lambda kv: -(kv[1] or 0)):
+            shown = f"{value:10.1f} ms" if isinstance(value, (int, float)) else "       n/a   "
+            error = result[section].get(key + " error")
+            lines.append(f"{shown}  {key}{delta(section, key)}"
+                         + (f"  [{error}]" if error else ""))
+    return "\n".join(lines)
+
+
+# Growth below this many ms is run-to-run noise, whatever the percentage.
+REGRESSION_MIN_DELTA_MS = 20.0
+
+
+def regressions(result, baseline, threshold_pct, min_delta_ms=REGRESSION_MIN_DELTA_MS):
+    """Return human-readable lines for every timing that grew by more than threshold_pct."""
+    found = []
+    pairs = [("wsgi_import_ms", result["wsgi_import_ms"], baseline.get("wsgi_import_ms"))]
+    for section in ("app_ms", "module_import_ms"):
+        for key, value in result[section].items():
+            pairs.append((f"{section}:{key}", value, baseline.get(section, {}).get(key)))
+    for label, new, old in pairs:
+        if isinstance(new, (int, float)) and isinstance(old, (int, float)) and old > 0:
+            growth = (new - old) / old * 100.0
+            if growth > threshold_pct and new - old >= min_delta_ms:
+                found.append(f"{label}: {old:.1f} -> {new:.1f} ms ({growth:+.0f}%)")
+    return found
+
+
+def run(out_dir="perf-results", compare=None, budget_ms=STARTUP_BUDGET_MS,
+        regression_pct=25.0):
+    """Entry point for ``python -m workschedule.perf startup``; returns an exit code."""
+    result = collect()
+    baseline = None
+    if compare:
+        with open(compare) as f:
+            baseline = json.load(f)
+
+    report = format_report(result, baseline)
+    os.makedirs(out_dir, exist_ok=True)
+    stem = f"startup-{result['commit'] or 'local'}"
+    with open(os.path.join(out_dir, stem + ".json"), "w") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    with open(os.path.join(out_dir, stem + ".txt"), "w") as f:
+        f.write(report + "\n")
+    print(report)
+    print(f"\nWrote {os.path.join(out_dir, stem)}.{{json,txt}}")
+
+    status = 0
+    if result["wsgi_import_ms"] > budget_ms:
+        print(f"FAIL: cold import {result['wsgi_import_ms']:.1f} ms exceeds budget {budget_ms} ms")
+        status = 1
+    if baseline:
+        for line in regressions(result, baseline, regression_pct):
+            print(f"REGRESSION: {line}")
+            status = 1
+    return status
@@ -0,0 +1,210 @@
+"""
+workers.py
+
+Compare gunicorn worker models on the upload-to-download flow.
+
+For each mode, starts gunicorn with gunicorn.conf.py on bench_app (the real
+app with GCS and Stripe replaced by fakes that sleep BENCH_IO_LATENCY_MS
+per call), then runs `concurrency` clients, each repeating the full flow:
+
+    POST /schedule/upload_pdf          (fitz parse + GCS upload)
+    POST /schedule/approve_schedule    (GCS read + Stripe checkout)
+    GET  /schedule/payment_success     (GCS read, ICS build, GCS write/delete)
+    GET  /schedule/download/<token>    (GCS read + delete)
+
+and reports completed flows/s and flow latency percentiles per mode:
+
+    python -m workschedule.perf workers
+    python -m workschedule.perf workers --modes sync gthread --concurrency 16 --flows 8
+"""
+import os
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+# name -> gunicorn environment. "sync" is the old Dockerfile default.
+MODES = {
+    "sync": {"GUNICORN_WORKER_CLASS": "sync", "GUNICORN_WORKERS": "1"},
+    "gthread": {"GUNICORN_WORKER_CLASS": "gthread"},
+    "gevent": {"GUNICORN_WORKER_CLASS": "gevent"},
+}
+
+_JOB_ID = re.compile(r'name="job_id" value="([^"]+)"')
+_DOWNLOAD = re.compile(r'(/schedule/download/[A-Za-z0-9_=-]+)')
+
+
+def sample_pdf(shifts=14):
+    """A small schedule PDF in the format parse_schedule_text() understands."""
+    import fitz
+    doc = fitz.open()
+    page = doc.new_page()
+    lines = ["Work Schedule"]
+    for day in range(1, shifts + 1):
+        lines.append(f"Oct {day} 9:00 AM - 5:00 PM [8:00] 0660 - Store 123")
+    page.insert_text((50, 60), "\n".join(lines), fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _repo_root():
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_flow(base_url, pdf_bytes):
+    """One upload-to-download round trip; returns seconds taken. Raises on failure."""
+    started = time.perf_counter()
+    with requests.Session() as http:
+        r = http.post(f"{base_url}/schedule/upload_pdf",
+                      data={"timezone": "America/Los_Angeles"},
+                      files={"pdfFile": ("schedule.pdf", pdf_bytes, "application/pdf")},
+                      timeout=60)
+        r.raise_for_status()
+        match = _JOB_ID.search(r.text)
+        if not match:
+            raise RuntimeError("upload did not return a job_id")
+        job_id = match.group(1)
+
+        r = http.post(f"{base_url}/schedule/approve_schedule", data={"job_id": job_id},
+                      allow_redirects=False, timeout=60)
+        if r.status_code not in (302, 303):
+            raise RuntimeError(f"approve returned {r.status_code}")
+
+        r = http.get(f"{base_url}/schedule/payment_success", params={"job_id": job_id},
+                     timeout=60)
+        r.raise_for_status()
+        match = _DOWNLOAD.search(r.text)
+        if not match:
+            raise RuntimeError("payment_success did not return a download link")
+
+        r = http.get(f"{base_url}{match.group(1)}", timeout=60)
+        r.raise_for_status()
+        if b"BEGIN:VCALENDAR" not in r.content:
+            raise RuntimeError("download did not return an ICS file")
+    return time.perf_counter() - started
+
+
+def _start_gunicorn(mode_env, port, workdir, extra_env):
+    env = os.environ.copy()
+    env.update(extra_env)
+    env.update(mode_env)
+    env["PORT"] = str(port)
+    log = open(os.path.join(workdir, f"gunicorn-{port}.log"), "wb")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py",
+         "workschedule.perf.bench_app:app"],
+        cwd=_repo_root(), env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited early; see {log.name}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/schedule/upload", timeout=2).ok:
+                return process, log
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not become ready; see {log.name}")
+
+
+def measure_mode(name, concurrency, flows_per_client, workdir, extra_env, pdf_bytes):
+    port = _free_port()
+    process, log = _start_gunicorn(MODES[name], port, workdir, extra_env)
+    base_url = f"http://127.0.0.1:{port}"
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(flows_per_client):
+            try:
+                took = run_flow(base_url, pdf_bytes)
+                with lock:
+                    latencies.append(took)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+
+    try:
+        run_flow(base_url, pdf_bytes)  # warm-up: first-use imports in the worker
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        log.close()
+
+    latencies.sort()
+    return {
+        "mode": name,
+        "flows": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "flows_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else None,
+    }
+
+
+def format_report(results, latency_ms, concurrency):
+    lines = [f"Upload-to-download flow, {concurrency} concurrent clients, "
+             f"{latency_ms:.0f} ms simulated latency per GCS/Stripe call", "",
+             f"{'mode':<9} {'flows':>6} {'errors':>7} {'flows/s':>9} {'p50 ms':>9} {'p95 ms':>9}"]
+    for r in results:
+        if r.get("skipped"):
+            lines.append(f"{r['mode']:<9} skipped: {r['skipped']}")
+            continue
+        lines.append(f"{r['mode']:<9} {r['flows']:6d} {r['errors']:7d} {r['flows_per_second']:9.2f} "
+                     f"{r['p50_ms'] or 0:9.0f} {r['p95_ms'] or 0:9.0f}")
+        if r["first_error"]:
+            lines.append(f"          first error: {r['first_error'][:200]}")
+    return "\n".join(lines)
+
+
+def run(modes=("sync", "gthread", "gevent"), concurrency=8, flows_per_client=4,
+        latency_ms=80.0):
+    """Entry point for ``python -m workschedule.perf workers``; returns an exit code."""
+    workdir = tempfile.mkdtemp(prefix="workschedule-workers-")
+    extra_env = {
+        "BENCH_IO_LATENCY_MS": str(latency_ms),
+        "BENCH_STORAGE_DIR": os.path.join(workdir, "storage"),
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}",
+        "GUNICORN_MAX_REQUESTS": "0",
+        # Every client shares 127.0.0.1; measure throughput, not the per-client limit.
+        "UPLOAD_RATE_PER_MINUTE": "1000000",
+        "UPLOAD_RATE_BURST": "1000000",
+    }
+    pdf_bytes = sample_pdf()
+    results = []
+    for name in modes:
+        if name == "gevent":
+            try:
+                import gevent  # noqa: F401
+            except ImportError:
+                results.append({"mode": name, "skipped": "gevent is not installed"})
+                continue
+        results.append(measure_mode(name, concurrency, flows_per_client, workdir,
+                                    extra_env, pdf_bytes))
+        print(format_report(results[-1:], latency_ms, concurrency).splitlines()[-1], flush=True)
+    print()
+    print(format_report(results, latency_ms, concurrency))
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if any(r.get("errors") for r in results) else 0
@@ -0,0 +1,63 @@
+import hmac
+import os
+from functools import wraps
+
+from flask import Blueprint, Response, abort, request, stream_with_context
+
+from workschedule.services import export_service
+
+# ---------------------------------------------------------------------------
+# Blueprint
+# ---------------------------------------------------------------------------
+admin_bp = Blueprint('admin_bp', __name__, url_prefix='/admin')
+
+# Bearer token for admin/support endpoints. Unset disables them (404).
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
+
+
+def admin_token_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not ADMIN_API_TOKEN:
+            abort(404)
+        supplied = request.headers.get('Authorization', '')
+        if not supplied.startswith('Bearer ') or not hmac.compare_digest(
+                supplied[len('Bearer '):].encode(), ADMIN_API_TOKEN.encode()):
+            abort(401)
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# ---------------------------------------------------------------------------
+# Exports
+# ---------------------------------------------------------------------------
+@admin_bp.route('/export/<kind>.<fmt>', methods=['GET'])
+@admin_token_required
+def export(kind, fmt):
+    """
+    Stream every schedule or shift matching the filters, e.g.
+    GET /admin/export/shifts.csv?store=0660&from=2026-10-01&to=2026-11-01
+
+    Query args: store, department, from, to (ISO dates, [from, to)). For
+    schedules the dates filter upload time; for shifts, shift start.
+    """
+    if kind not in ('schedules', 'shifts') or fmt not in export_service.FORMATS:
+        abort(404)
+    try:
+        filters = export_service.filters_for(
+            kind,
+            store_number=request.args.get('store'),
+            department=request.args.get('department'),
+            date_from=request.args.get('from'),
+            date_to=request.args.get('to'),
+        )
+    except ValueError:
+        abort(400, description="from/to must be ISO dates (YYYY-MM-DD).")
+
+    chunks = export_service.export(kind, fmt, **filters)
+    # stream_with_context keeps the request (and its DB session) open while
+    # the generator is drained by the WSGI server.
+    response = Response(stream_with_context(chunks), mimetype=export_service.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
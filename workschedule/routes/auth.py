@@ -1,6 +1,7 @@
 # src/routes/auth.py
 # This file defines the blueprint for authentication routes.
 
+import logging
 import os
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, flash
 from functools import wraps
@@ -9,33 +10,25 @@ import firebase_admin
 from firebase_admin import credentials, auth
 from firebase_admin import exceptions
 
+from sqlalchemy.exc import SQLAlchemyError
+
+from workschedule.services import db_service, token_verifier, user_cache
+from workschedule.services.page_cache import cached_page
+
 # A blueprint is an object that records operations to be applied to a Flask app.
 # It is used here to group related authentication routes.
 auth_bp = Blueprint('auth_bp', __name__, url_prefix='/auth')
-print("DEBUG: auth.py blueprint created and loaded.")
+logger = logging.getLogger(__name__)
 # -----------------------------
 
 # Route for /auth/index to display index.html
 @auth_bp.route('/index')
+@cached_page()
 def index_page():
     return render_template('index.html')
 
-# --- Initialize Firebase Admin SDK if not already initialized ---
-# This check is crucial for handling the app factory pattern.
-# We ensure the SDK is initialized before any functions in this blueprint
-# attempt to use it, preventing the 'default Firebase app does not exist' error.
-if not firebase_admin._apps:
-    print("DEBUG: Initializing Firebase Admin SDK from auth.py.")
-    try:
-        # On Cloud Run, this will automatically find the service account attached to the
-        # service. For local development, ensure you have run
-        # 'gcloud auth application-default login' on your machine.
-        firebase_admin.initialize_app()
-        print("DEBUG: Firebase Admin SDK initialized successfully using Application Default Credentials.")
-    except Exception as e:
-        print(f"ERROR: Failed to initialize Firebase Admin SDK: {e}")
-        # Depending on your app, you might want to raise an exception here
-        # to prevent the server from starting with a broken Firebase connection.
+# The Firebase Admin SDK is initialized lazily by workschedule.clients the
+# first time token verification needs it, not when this module is imported.
 
 
 # --- Login Required Decorator ---
@@ -50,61 +43,69 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def current_user():
+    """The logged-in User as a cached snapshot (see services/user_cache.py), or None."""
+    return user_cache.get_user(session.get('user_id'))
+
 # Route for the signup page
 @auth_bp.route('/signup')
+@cached_page()
 def signup_page():
     return render_template('auth/signup.html')
 
 # Route for the login page
 @auth_bp.route('/login')
+@cached_page()
 def login_page():
     return render_template('auth/login.html')
 
 # --- NEW: Endpoint to receive and verify Firebase ID Token ---
 @auth_bp.route('/authenticate-session', methods=['POST'])
 def authenticate_session():
-    print("\n--- Received /authenticate-session request ---") # DEBUG
     auth_header = request.headers.get('Authorization')
-    print(f"Authorization header: {auth_header}") # DEBUG
 
     if not auth_header or not auth_header.startswith('Bearer '):
-        print("ERROR: No Firebase ID token provided or malformed header.") # DEBUG
+        logger.info("No Firebase ID token provided or malformed header.")
         return jsonify({'error': 'No Firebase ID token provided.'}), 401
 
     id_token = auth_header.split('Bearer ')[1]
-    print(f"Extracted ID Token: {id_token}") # DEBUG: Print full token for inspection
 
     try:
-        # Verify the ID token using the Firebase Admin SDK with a clock skew tolerance
-        # The maximum allowed value for clock_skew_seconds is 60.
-        decoded_token = auth.verify_id_token(id_token, clock_skew_seconds=60)
+        # Verify against pre-warmed signing keys (60s clock skew, like the SDK
+        # call it replaces); repeat logins with the same token hit the cache.
+        decoded_token = token_verifier.verify_id_token(id_token)
         uid = decoded_token['uid']
         #session['email'] = decoded_token.get('email')
         #session['name'] = decoded_token.get('name')
 
-        print(f"Firebase ID Token successfully verified for UID: {uid}") # DEBUG
         # Set the user ID in the Flask session
         session['user_id'] = uid
 
+        # The User row carries the email that reminders (and receipts) go to.
+        try:
+            db_service.ensure_user(uid, decoded_token.get('email'))
+        except SQLAlchemyError as e:
+            from workschedule.app import db
+            db.session.rollback()
+            logger.warning("Could not record user %s: %s", uid, e)
+
 
         session.permanent = True # Make the session persistent
-        print(f"Flask session 'user_id' set to: {session.get('user_id')}") # DEBUG
+        logger.debug("Session established for UID %s", uid)
 
         return jsonify({'message': 'Session successfully established.'}), 200
 
     except ValueError as e:
         # This typically indicates a malformed token.
-        print(f"ValueError during token processing (malformed token): {e}") # DEBUG
+        logger.info("Malformed Firebase ID token: %s", e)
         return jsonify({"error": "Invalid token format"}), 400
     except exceptions.FirebaseError as e:
         # This handles expired, invalid, or "used too early" tokens
-        print(f"Firebase AuthError: {e}") # DEBUG
+        logger.info("Firebase ID token rejected: %s", e)
         return jsonify({"error": "Firebase authentication failed", "details": str(e)}), 401
     except Exception as e:
         # Catch any other unexpected errors
-        print(f"Unexpected error in /authenticate-session: {e}") # DEBUG
-        import traceback # DEBUG: To print the full traceback
-        traceback.print_exc() # DEBUG: Print full traceback to console
+        logger.exception("Unexpected error in /authenticate-session")
         return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500
 
 
@@ -121,12 +122,10 @@ def logout():
 def dashboard_page():
 
     user_id = session.get('user_id', '(not found)')
-    email = session.get('email', '(email not found)')
+    user = current_user()
+    email = user.email if user and user.email else session.get('email', '(email not found)')
     name  = session.get('name', '(name not found)')
 
-
-    print("Session at /dashboard:", dict(session))
-    print("user_id at /dashboard:", user_id )
     return render_template('dashboard.html', user_id=user_id, email=email, name=name )
 
 
@@ -149,6 +148,7 @@ def test_secrets():
 
 # --- NEW: Route to render the upload schedule page ---
 @auth_bp.route('/upload_schedule')
+@cached_page()
 def upload_schedule_page():
     return render_template('auth/upload_schedule.html')
 
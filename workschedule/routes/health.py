@@ -0,0 +1,28 @@
+from flask import Blueprint, current_app, jsonify
+
+from workschedule.services import warmup
+
+# ---------------------------------------------------------------------------
+# Blueprint
+# ---------------------------------------------------------------------------
+# Point Cloud Run's liveness probe at /healthz and its startup probe at
+# /readyz, so a new instance gets traffic only once warm-up has run.
+health_bp = Blueprint('health_bp', __name__)
+
+
+@health_bp.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify(status="ok")
+
+
+@health_bp.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: 200 once this worker's warm-up has finished, 503 until then."""
+    warmup.start(current_app._get_current_object())
+    snapshot = warmup.state.snapshot()
+    status = 200 if snapshot["ready"] else 503
+    response = jsonify(status="ready" if status == 200 else "warming_up", **snapshot)
+    response.status_code = status
+    response.headers["Cache-Control"] = "no-store"
+    return response
@@ -3,17 +3,26 @@ import datetime
 import json
 import hmac
 import hashlib
+import logging
 import time
 import re
 import uuid
 
-import fitz  # PyMuPDF
 import stripe
 from flask import (Blueprint, render_template, request, redirect,
                    url_for, jsonify, abort, Response, session)
 from werkzeug.utils import secure_filename
 
+from workschedule import clients, concurrency
+from workschedule.metrics import stage_seconds, timed
 from workschedule.services.stripe_service import create_checkout_session
+from workschedule.services.checkout_cache import (checkout_cache,
+                                                  CHECKOUT_SESSION_TTL_SECONDS)
+from workschedule.services.admission import (admission_controlled, upload_admission,
+                                             upload_rate_limiter)
+from workschedule.services.page_cache import cached_page
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
 # Blueprint
@@ -81,22 +90,24 @@ def _verify_token(token: str):
 # GCS helpers
 # ---------------------------------------------------------------------------
 def _gcs_client():
-    from google.cloud import storage
-    return storage.Client()
+    # Shared, lazily created client; building one per call re-did auth each time.
+    return clients.get_storage_client()
 
 
 def _bucket_name():
     return os.environ.get('GCS_BUCKET_NAME', 'work-schedule-cloud')
 
 
+@timed("storage_put")
 def _upload_to_gcs(data: str, blob_path: str):
     client = _gcs_client()
     bucket = client.bucket(_bucket_name())
     blob = bucket.blob(blob_path)
     blob.upload_from_string(data, content_type='application/json')
-    print(f"[DEBUG] GCS upload: gs://{_bucket_name()}/{blob_path}")
+    logger.debug("GCS upload: gs://%s/%s", _bucket_name(), blob_path)
 
 
+@timed("storage_get")
 def _download_from_gcs(blob_path: str) -> str:
     client = _gcs_client()
     bucket = client.bucket(_bucket_name())
@@ -104,36 +115,91 @@ def _download_from_gcs(blob_path: str) -> str:
     return blob.download_as_text()
 
 
+@timed("storage_put")
+def _upload_ics_to_gcs(ics_content: str, blob_path: str):
+    bucket = _gcs_client().bucket(_bucket_name())
+    bucket.blob(blob_path).upload_from_string(ics_content.encode('utf-8'),
+                                              content_type='text/calendar')
+
+
+@timed("storage_delete")
 def _delete_from_gcs(blob_path: str):
     try:
         client = _gcs_client()
         bucket = client.bucket(_bucket_name())
         blob = bucket.blob(blob_path)
         blob.delete()
-        print(f"[DEBUG] GCS delete: gs://{_bucket_name()}/{blob_path}")
+        logger.debug("GCS delete: gs://%s/%s", _bucket_name(), blob_path)
+    except Exception as e:
+        logger.warning("GCS delete failed for %s: %s", blob_path, e)
+
+
+# ---------------------------------------------------------------------------
+# Database helpers
+# ---------------------------------------------------------------------------
+@timed("persist")
+def _persist_shifts(shifts: list, timezone: str, job_id: str, firebase_uid=None,
+                    uploader_id=None):
+    """Bulk-write parsed shifts to the Shift table; never fails the upload.
+
+    Takes the Firebase UID and anonymous uploader id explicitly so it can
+    run on an I/O pool thread, outside the request (and its session).
+    """
+    from workschedule.app import db
+    from workschedule.services import db_service
+    try:
+        user_id = db_service.user_id_for_firebase_uid(firebase_uid)
+        rows = db_service.build_shift_rows(shifts, timezone, job_id, user_id=user_id,
+                                           owner_key=uploader_id)
+        db_service.save_shifts(rows)
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Shift persistence failed for job %s: %s", job_id, e)
+
+
+def _schedule_reminder(firebase_uid):
+    """Start the two-week reminder for a logged-in user; never fails the page."""
+    from workschedule.app import db
+    from workschedule.services import reminder_service
+    try:
+        reminder_service.schedule_reminder_for(firebase_uid)
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Could not schedule reminder for UID %s: %s", firebase_uid, e)
+
+
+def _receipt_recipient(firebase_uid, checkout_session_id, job_id):
+    """Where the paid job's receipt goes: the logged-in user's email, else Stripe's."""
+    from workschedule.services import stripe_service, user_cache
+    try:
+        user = user_cache.get_user(firebase_uid) if firebase_uid else None
+        if user and user.email:
+            return user.email
+        if checkout_session_id:
+            return stripe_service.paid_checkout_email(checkout_session_id, job_id)
     except Exception as e:
-        print(f"[DEBUG] GCS delete failed for {blob_path}: {e}")
+        logger.warning("Could not find a receipt address for job %s: %s", job_id, e)
+    return None
 
 
 # ---------------------------------------------------------------------------
 # PDF parsing helpers  (unchanged logic, just tidied)
 # ---------------------------------------------------------------------------
+@timed("extract")
 def extract_text_from_pdf(pdf_contents: bytes) -> str:
+    import fitz  # PyMuPDF; imported on first use to keep worker boot cheap
     try:
         doc = fitz.open(stream=pdf_contents, filetype="pdf")
         text = "".join(page.get_text() for page in doc)
         doc.close()
         return text
     except Exception as e:
-        print(f"Error extracting text from PDF: {e}")
+        logger.warning("Error extracting text from PDF: %s", e)
         return ""
 
 
+@timed("parse")
 def parse_schedule_text(text: str) -> list:
-    print("=== EXTRACTED TEXT ===")
-    print(text[:500] + "..." if len(text) > 500 else text)
-    print("=== END EXTRACTED TEXT ===")
-
     results = []
     if "not assigned" in text.lower() or "not scheduled" in text.lower():
         return results
@@ -147,7 +213,7 @@ def parse_schedule_text(text: str) -> list:
     full_shifts = full_shift_pattern.findall(text)
 
     if full_shifts:
-        print(f"Found {len(full_shifts)} shifts with full store/dept info: {full_shifts}")
+        logger.debug("Found %d shifts with full store/dept info", len(full_shifts))
         for month, date, start_time, end_time, dept_code, store_code in full_shifts:
             results.append({
                 'username': '', 'store_number': f"#{dept_code}", 'weekday': '',
@@ -166,7 +232,8 @@ def parse_schedule_text(text: str) -> list:
         dept_match = re.search(r'Store\s+(\d{3})', text)
         default_store = f"#{store_match.group(1)}" if store_match else ''
         default_dept = dept_match.group(1) if dept_match else ''
-        print(f"Found {len(shifts)} shifts (fallback), store={default_store}, dept={default_dept}")
+        logger.debug("Found %d shifts (fallback), store=%s, dept=%s",
+                     len(shifts), default_store, default_dept)
         for month, date, start_time, end_time in shifts:
             results.append({
                 'username': '', 'store_number': default_store, 'weekday': '',
@@ -175,20 +242,61 @@ def parse_schedule_text(text: str) -> list:
                 'shift_end': end_time, 'department': default_dept
             })
 
-    print(f"Parsed {len(results)} total shifts")
+    logger.debug("Parsed %d shifts from %d characters of text", len(results), len(text))
     return results
 
 
+def build_display_shifts(parsed_entries: list) -> list:
+    """Date-sorted, display-ready shifts ('Mon, Oct 06', ...) from parsed entries."""
+    parsed_shifts = []
+    for entry in parsed_entries:
+        try:
+            year = datetime.date.today().year
+            month = datetime.datetime.strptime(entry['month'], "%b").month
+            day = int(entry['date'])
+            shift_date = datetime.date(year, month, day)
+            dept = entry.get('department', '')
+            if dept.endswith(' Associate'):
+                dept = dept[:-len(' Associate')]
+            parsed_shifts.append({
+                'shift_date': shift_date,
+                'department': dept,
+                'shift_start': entry.get('shift_start', ''),
+                'shift_end': entry.get('shift_end', ''),
+                'store_number': entry.get('store_number', '')
+            })
+        except (ValueError, KeyError) as e:
+            logger.debug("Skipping invalid entry: %s", e)
+            continue
+
+    parsed_shifts.sort(key=lambda x: x['shift_date'])
+    final_output = []
+    for shift in parsed_shifts:
+        sd = shift.pop('shift_date')
+        final_output.append({'shift_date': sd.strftime('%a, %b %d'), **shift})
+    return final_output
+
+
 # ---------------------------------------------------------------------------
 # Routes
 # ---------------------------------------------------------------------------
 
 @schedule_bp.route("/upload", methods=["GET"])
+@cached_page()
 def upload_schedule():
     return render_template("upload_schedule_new.html")
 
 
+def _upload_rejected(status):
+    if status == 429:
+        message = "You're uploading very quickly. Please wait a minute and try again."
+    else:
+        message = "We're processing a lot of schedules right now. Please try again in a few seconds."
+    return render_template("upload_schedule_new.html", pdf_error=message)
+
+
 @schedule_bp.route('/upload_pdf', methods=['POST'])
+@admission_controlled(upload_admission, upload_rate_limiter, on_reject=_upload_rejected)
 def upload_pdf():
     if 'pdfFile' not in request.files:
         return redirect(url_for('schedule_bp.upload_schedule'))
@@ -206,7 +314,7 @@ def upload_pdf():
     try:
         pdf_contents = pdf_file.read()
     except Exception as e:
-        print(f"Error reading file: {e}")
+        logger.warning("Error reading uploaded file: %s", e)
         return redirect(url_for('schedule_bp.upload_schedule'))
 
     try:
@@ -220,33 +328,7 @@ def upload_pdf():
             return render_template("review_schedule.html", parsed_schedule=[],
                                    raw_json="No valid schedule entries found in the document.")
 
-        # Build display-ready shifts
-        parsed_shifts = []
-        for entry in parsed_entries:
-            try:
-                year = datetime.date.today().year
-                month = datetime.datetime.strptime(entry['month'], "%b").month
-                day = int(entry['date'])
-                shift_date = datetime.date(year, month, day)
-                dept = entry.get('department', '')
-                if dept.endswith(' Associate'):
-                    dept = dept[:-len(' Associate')]
-                parsed_shifts.append({
-                    'shift_date': shift_date,
-                    'department': dept,
-                    'shift_start': entry.get('shift_start', ''),
-                    'shift_end': entry.get('shift_end', ''),
-                    'store_number': entry.get('store_number', '')
-                })
-            except (ValueError, KeyError) as e:
-                print(f"Skipping invalid entry {entry}: {e}")
-                continue
-
-        parsed_shifts.sort(key=lambda x: x['shift_date'])
-        final_output = []
-        for shift in parsed_shifts:
-            sd = shift.pop('shift_date')
-            final_output.append({'shift_date': sd.strftime('%a, %b %d'), **shift})
+        final_output = build_display_shifts(parsed_entries)
 
         # Persist to GCS (timezone included, no email)
         job_id = str(uuid.uuid4())
@@ -254,16 +336,30 @@ def upload_pdf():
             "timezone": timezone,
             "shifts": final_output
         }
-        _upload_to_gcs(json.dumps(payload), f"parsed/{job_id}.json")
+        # The GCS write and the Shift rows are independent of each other and
+        # of the review page: run both on the I/O pool, render meanwhile, and
+        # wait only before answering so an upload failure still surfaces.
+        uploaded = concurrency.submit('gcs-upload', _upload_to_gcs,
+                                      json.dumps(payload), f"parsed/{job_id}.json")
+        # Each upload gets a new job_id; the uploader id outlives it in the
+        # session cookie, so re-uploading the same schedule updates its rows.
+        uploader_id = session.setdefault('uploader_id', uuid.uuid4().hex)
+        persisted = concurrency.submit_in_app_context(
+            'db-shifts', _persist_shifts, final_output, timezone, job_id,
+            session.get('user_id'), uploader_id)
 
         session['job_id'] = job_id
 
-        return render_template('review_schedule.html',
-                               parsed_schedule=final_output,
-                               job_id=job_id)
+        with concurrency.span('render'), stage_seconds.time(stage='render'):
+            page = render_template('review_schedule.html',
+                                   parsed_schedule=final_output,
+                                   job_id=job_id)
+        persisted.result()
+        uploaded.result()
+        return page
 
     except Exception as e:
-        print(f"Parsing error: {e}")
+        logger.exception("Parsing error")
         job_id = locals().get('job_id') or session.get('job_id')
         return render_template("review_schedule.html",
                                parsed_schedule=[], raw_json=str(e), job_id=job_id)
@@ -271,12 +367,16 @@ def upload_pdf():
 
 @schedule_bp.route('/approve_schedule', methods=['POST'])
 def approve_schedule():
-    print(f"[DEBUG] approve_schedule: form={request.form}")
     job_id = request.form.get('job_id') or request.args.get('job_id')
     if not job_id:
         return render_template("review_schedule.html", parsed_schedule=[],
                                raw_json="No job_id found. Cannot proceed to payment.")
 
+    # Resubmits within the session's validity window skip GCS and Stripe.
+    cached_session = checkout_cache.get(job_id)
+    if cached_session:
+        return redirect(cached_session.url)
+
     # Verify the GCS blob exists before sending to Stripe
     try:
         _download_from_gcs(f"parsed/{job_id}.json")
@@ -284,24 +384,32 @@ def approve_schedule():
         return render_template("review_schedule.html", parsed_schedule=[],
                                raw_json=f"Could not load schedule data: {e}")
 
-    # Build Stripe session
-    success_url = f"{BASE_URL}/schedule/payment_success?job_id={job_id}"
+    # Build Stripe session, reusing the one already created for this job
+    # when the user double-submits or comes back from the checkout page.
+    # Stripe fills in {CHECKOUT_SESSION_ID}; payment_success reads the
+    # customer's email from it for the receipt.
+    success_url = (f"{BASE_URL}/schedule/payment_success?job_id={job_id}"
+                   "&session_id={CHECKOUT_SESSION_ID}")
     cancel_url = f"{BASE_URL}/schedule/payment_cancel"
     price_id = os.getenv("STRIPE_PRICE_ID")
 
-    stripe_session = create_checkout_session(
-        price_id,
-        customer_email=None,   # no email required anymore
-        success_url=success_url,
-        cancel_url=cancel_url,
-        metadata={'job_id': job_id}
+    stripe_session = checkout_cache.get_or_create(
+        job_id,
+        lambda: create_checkout_session(
+            price_id,
+            customer_email=None,   # no email required anymore
+            success_url=success_url,
+            cancel_url=cancel_url,
+            metadata={'job_id': job_id},
+            expires_at=int(time.time()) + CHECKOUT_SESSION_TTL_SECONDS
+        )
     )
 
-    if not stripe_session or not hasattr(stripe_session, 'url'):
+    if not stripe_session:
         return render_template("review_schedule.html", parsed_schedule=[],
                                raw_json="Stripe session could not be created. Please try again.")
 
-    print(f"[approve_schedule] Redirecting to Stripe: {stripe_session.url}")
+    logger.info("Redirecting job %s to Stripe checkout %s", job_id, stripe_session.id)
     return redirect(stripe_session.url)
 
 
@@ -314,37 +422,56 @@ def payment_success():
     blob_path = f"parsed/{job_id}.json"
 
     try:
-        schedule_json = _download_from_gcs(blob_path)
+        with concurrency.span('gcs-download'):
+            schedule_json = _download_from_gcs(blob_path)
         parsed_data = json.loads(schedule_json)
         parsed_schedule = parsed_data.get('shifts', [])
         timezone_str = parsed_data.get('timezone', 'America/Los_Angeles')
         if not parsed_schedule:
             return render_template('link_expired.html'), 410
     except Exception as e:
-        print(f"[payment_success] GCS error: {e}")
+        logger.warning("payment_success: could not load job %s: %s", job_id, e)
         return render_template('link_expired.html'), 410
 
     # Generate ICS
     from workschedule.services.ics_generator import create_ics_from_entries
-    ics_content = create_ics_from_entries(parsed_schedule,
-                                          calendar_name="myschedule.cloud",
-                                          timezone_str=timezone_str)
+    with concurrency.span('ics-build'):
+        ics_content = create_ics_from_entries(parsed_schedule,
+                                              calendar_name="myschedule.cloud",
+                                              timezone_str=timezone_str)
 
-    # Store ICS in GCS under ics/ prefix
+    # Store ICS in GCS under ics/ prefix; the download link needs it, so this
+    # is the only write the page waits for.
     ics_blob_path = f"ics/{job_id}.ics"
-    client = _gcs_client()
-    bucket = client.bucket(_bucket_name())
-    ics_blob = bucket.blob(ics_blob_path)
-    ics_blob.upload_from_string(ics_content.encode('utf-8'),
-                                content_type='text/calendar')
-
-    # Delete the parsed JSON — no longer needed
-    _delete_from_gcs(blob_path)
+    uploaded = concurrency.submit('gcs-upload', _upload_ics_to_gcs, ics_content, ics_blob_path)
+    # Look up the receipt address alongside the upload (it may be a Stripe call).
+    firebase_uid = session.get('user_id')
+    recipient = concurrency.submit_in_app_context(
+        'receipt-recipient', _receipt_recipient, firebase_uid,
+        request.args.get('session_id'), job_id)
+    # Logged-in users get the "time to update your schedule" email two weeks out.
+    reminder = (concurrency.submit_in_app_context('db-reminder', _schedule_reminder, firebase_uid)
+                if firebase_uid else None)
+
+    # The job is paid for; its checkout session must not be handed out again.
+    checkout_cache.invalidate(job_id)
 
     # Build magic link token (points to our /download route)
     token = _make_token(job_id)
     magic_link = f"{BASE_URL}/schedule/download/{token}"
 
+    if reminder is not None:
+        reminder.result()
+    uploaded.result()
+    to_email = recipient.result()
+    if to_email:
+        # Sent by the email_queue senders; the page never waits on Mailgun.
+        from workschedule.services import mailgun_service
+        mailgun_service.queue_receipt_with_ics(to_email, to_email.split('@')[0],
+                                               parsed_schedule, ics_content.encode('utf-8'))
+    # Only now is the parsed JSON no longer needed: if the upload failed, a
+    # reload must still find it. The delete is not awaited.
+    concurrency.background('gcs-delete', _delete_from_gcs, blob_path)
     return render_template('payment_success.html',
                            ics_link=magic_link,
                            message="Payment successful. Your schedule is ready.",
@@ -357,7 +484,7 @@ def download_ics(token):
     try:
         job_id = _verify_token(token)
     except ValueError as e:
-        print(f"[download_ics] Token invalid: {e}")
+        logger.info("download_ics: invalid token: %s", e)
         return render_template('link_expired.html'), 410
 
     ics_blob_path = f"ics/{job_id}.ics"
@@ -365,9 +492,10 @@ def download_ics(token):
         client = _gcs_client()
         bucket = client.bucket(_bucket_name())
         blob = bucket.blob(ics_blob_path)
-        ics_content = blob.download_as_bytes()
+        with stage_seconds.time(stage='storage_get'):
+            ics_content = blob.download_as_bytes()
     except Exception as e:
-        print(f"[download_ics] GCS error: {e}")
+        logger.warning("download_ics: could not load %s: %s", ics_blob_path, e)
         return render_template('link_expired.html'), 410
 
     # Delete from GCS after serving
@@ -388,13 +516,13 @@ def stripe_webhook():
     try:
         event = stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
     except (ValueError, stripe.error.SignatureVerificationError) as e:
-        print(f"Stripe webhook error: {e}")
+        logger.warning("Stripe webhook rejected: %s", e)
         return abort(400)
 
     if event['type'] == 'checkout.session.completed':
         stripe_session = event['data']['object']
         job_id = stripe_session.get('metadata', {}).get('job_id')
-        print(f"[stripe_webhook] Payment completed for job_id={job_id}")
+        logger.info("Stripe webhook: payment completed for job %s", job_id)
         # ICS generation happens in payment_success route via redirect;
         # webhook is available here for future server-side fulfillment if needed.
 
@@ -402,6 +530,7 @@ def stripe_webhook():
 
 
 @schedule_bp.route('/payment_cancel', methods=['GET'])
+@cached_page()
 def payment_cancel():
     return render_template('payment_cancel.html')
 
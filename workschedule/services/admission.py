@@ -0,0 +1,190 @@
+"""
+admission.py
+
+Admission control for expensive endpoints.
+
+upload_pdf spends most of its time in fitz text extraction and regex
+parsing, on the same gunicorn threads that serve /download/<token> and the
+Stripe webhook. Without a limit, a burst of uploads occupies every thread
+and the cheap routes queue behind it. Each heavy endpoint therefore gets:
+
+* a fixed number of concurrency slots (AdmissionController);
+* a short, bounded wait queue: once the queue is full, or a queued request
+  waits longer than the timeout, the request is turned away immediately
+  with 503 and a Retry-After estimated from recent service times;
+* a per-client token bucket (RateLimiter, in process memory), answering
+  429 with Retry-After when one client uploads faster than the refill rate.
+
+Slots plus queue stay below the gunicorn thread count, so some threads are
+always free for payment and download requests:
+
+    @schedule_bp.route('/upload_pdf', methods=['POST'])
+    @admission_controlled(upload_admission, upload_rate_limiter, on_reject=...)
+    def upload_pdf(): ...
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import make_response, request, session
+
+from workschedule.metrics import LatencyStats
+
+_THREADS = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Defaults leave at least half of a worker's threads for everything else.
+UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", str(max(1, _THREADS // 4))))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", str(max(1, _THREADS // 4))))
+UPLOAD_QUEUE_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_QUEUE_TIMEOUT_SECONDS", "10"))
+UPLOAD_RATE_PER_MINUTE = float(os.getenv("UPLOAD_RATE_PER_MINUTE", "10"))
+UPLOAD_RATE_BURST = int(os.getenv("UPLOAD_RATE_BURST", "5"))
+# X-Forwarded-For hops appended by our own proxies: 1 for Cloud Run's front
+# end, 2 with an external load balancer in front of it. Earlier hops are
+# whatever the client sent and must not pick its rate-limit bucket.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+RATE_LIMIT_MAX_CLIENTS = 10000
+
+admission_wait = LatencyStats("admission_wait")
+
+
+class AdmissionController:
+    """Counting semaphore with a bounded, timed wait queue."""
+
+    def __init__(self, name, slots, queue_size, queue_timeout):
+        self.name = name
+        self.slots = slots
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._service_seconds = 0.0
+
+    def acquire(self):
+        """Take a slot, waiting up to queue_timeout; False if the request must be shed."""
+        started = time.perf_counter()
+        with self._cond:
+            if self.active < self.slots and self.waiting == 0:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.queue_size:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                ok = self._cond.wait_for(lambda: self.active < self.slots, self.queue_timeout)
+            finally:
+                self.waiting -= 1
+            if not ok:
+                self.rejected += 1
+                return False
+            self.active += 1
+            self.admitted += 1
+        admission_wait.observe(self.name, time.perf_counter() - started)
+        return True
+
+    def release(self, held_seconds=0.0):
+        with self._cond:
+            self.active -= 1
+            self._service_seconds += held_seconds
+            self._cond.notify()
+
+    def retry_after(self):
+        """Seconds until a slot is likely free: mean service time x queue depth."""
+        with self._cond:
+            mean = self._service_seconds / self.admitted if self.admitted else 1.0
+            depth = self.waiting + 1
+        return max(1, math.ceil(mean * depth / self.slots))
+
+    def snapshot(self):
+        with self._cond:
+            return {"slots": self.slots, "active": self.active, "waiting": self.waiting,
+                    "admitted": self.admitted, "rejected": self.rejected}
+
+
+class RateLimiter:
+    """Per-client token buckets; least recently seen clients are forgotten first."""
+
+    def __init__(self, rate_per_second, burst, max_clients=RATE_LIMIT_MAX_CLIENTS, clock=time.monotonic):
+        self.rate = rate_per_second
+        self.burst = burst
+        self._max_clients = max_clients
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, client):
+        """(True, 0) and take a token, or (False, seconds until one is available)."""
+        now = self._clock()
+        with self._lock:
+            tokens, last = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self._max_clients:
+                self._buckets.popitem(last=False)
+        if allowed:
+            return True, 0
+        return False, max(1, math.ceil((1 - tokens) / self.rate))
+
+
+def client_id():
+    """Signed-in Firebase UID, else the client address our proxies recorded."""
+    uid = session.get("user_id")
+    if uid:
+        return f"user:{uid}"
+    forwarded = [hop.strip() for hop in request.headers.get("X-Forwarded-For", "").split(",")
+                 if hop.strip()]
+    if forwarded:
+        return f"ip:{forwarded[-min(TRUSTED_PROXY_HOPS, len(forwarded))]}"
+    return f"ip:{request.remote_addr}"
+
+
+def _reject(status, retry_after, on_reject):
+    if on_reject is not None:
+        response = make_response(on_reject(status))
+    else:
+        response = make_response("Too many uploads in progress, please retry shortly.\n")
+    response.status_code = status
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def admission_controlled(controller, limiter=None, on_reject=None):
+    """
+    Decorator: rate-limit per client (429), then hold one of the controller's
+    slots for the duration of the view (503 when none frees up in time).
+    on_reject(status) may return a friendlier body for either case.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if limiter is not None:
+                allowed, retry_after = limiter.allow(client_id())
+                if not allowed:
+                    return _reject(429, retry_after, on_reject)
+            if not controller.acquire():
+                return _reject(503, controller.retry_after(), on_reject)
+            started = time.perf_counter()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                controller.release(time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+upload_admission = AdmissionController("upload_pdf", UPLOAD_MAX_CONCURRENCY,
+                                       UPLOAD_QUEUE_SIZE, UPLOAD_QUEUE_TIMEOUT_SECONDS)
+upload_rate_limiter = RateLimiter(UPLOAD_RATE_PER_MINUTE / 60.0, UPLOAD_RATE_BURST)
@@ -1,7 +1,10 @@
+import logging
 import uuid
 from datetime import datetime
 from icalendar import Calendar, Event, vCalAddress, vText
 
+logger = logging.getLogger(__name__)
+
 def generate_ics_file(work_schedule, timezone_str):
     """
     Generates an .ics file (iCalendar format) from a work schedule.
@@ -40,7 +43,7 @@ def generate_ics_file(work_schedule, timezone_str):
         return cal.to_ical().decode('utf-8')
     except Exception as e:
         # Log the error for debugging purposes
-        print(f"Error generating .ics file: {e}")
+        logger.warning("Error generating .ics file: %s", e)
         return ""
 
 # Example usage (for local testing)
@@ -61,7 +64,9 @@ if __name__ == '__main__':
         ]
     }
     
-    # Generate and print the .ics content
+    # Generate and log the .ics content
+    from workschedule import log_config
+    log_config.configure()
     ics_output = generate_ics_file(sample_schedule, 'America/New_York')
-    print(ics_output)
+    logger.info("Generated .ics content:\n%s", ics_output)
 
@@ -0,0 +1,135 @@
+"""
+checkout_cache.py
+
+Per-job cache of Stripe Checkout Sessions.
+
+approve_schedule used to create a brand-new Checkout Session on every POST,
+so double-clicks and back-button resubmits each cost a Stripe round trip and
+left a trail of abandoned sessions. Sessions are now remembered per job_id
+until shortly before Stripe expires them, and concurrent requests for the
+same job wait for the one request that is already talking to Stripe.
+
+The cache is per process; with several gunicorn workers a resubmit that lands
+on a different worker may still create one extra session, which is harmless.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+# Stripe accepts expires_at between 30 minutes and 24 hours after creation,
+# measured when its request arrives: keep clear of the lower bound so clock
+# skew and latency cannot push a session under it.
+STRIPE_MIN_EXPIRY_SECONDS = 1800
+STRIPE_MAX_EXPIRY_SECONDS = 86400
+CHECKOUT_SESSION_TTL_SECONDS = min(
+    STRIPE_MAX_EXPIRY_SECONDS,
+    max(STRIPE_MIN_EXPIRY_SECONDS + 300,
+        int(os.getenv("CHECKOUT_SESSION_TTL_SECONDS", "3600")))
+)
+# Stop handing out a session this long before Stripe expires it, so the
+# user never lands on an expired checkout page.
+CHECKOUT_SESSION_REUSE_MARGIN_SECONDS = 120
+CHECKOUT_CACHE_MAX_ENTRIES = 10000
+
+
+@dataclass(frozen=True)
+class CachedCheckoutSession:
+    id: str
+    url: str
+    expires_at: int
+
+    def is_reusable(self, now=None) -> bool:
+        now = time.time() if now is None else now
+        return now < self.expires_at - CHECKOUT_SESSION_REUSE_MARGIN_SECONDS
+
+
+class CheckoutSessionCache:
+    """Thread-safe job_id -> CachedCheckoutSession map with single-flight creation."""
+
+    def __init__(self, max_entries=CHECKOUT_CACHE_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._entries = {}
+        # job_id -> [lock, callers holding or waiting for it]
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id):
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry and not entry.is_reusable():
+                del self._entries[job_id]
+                entry = None
+            return entry
+
+    def invalidate(self, job_id):
+        with self._lock:
+            self._entries.pop(job_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_create(self, job_id, create):
+        """
+        Return the cached session for job_id, or call create() to make one.
+
+        create() must return an object with id, url and expires_at attributes
+        (a stripe.checkout.Session) or None on failure. Failures are not
+        cached. Only one caller per job_id runs create() at a time; the others
+        block and then reuse its result.
+        """
+        entry = self.get(job_id)
+        if entry:
+            return entry
+
+        with self._lock:
+            slot = self._key_locks.setdefault(job_id, [threading.Lock(), 0])
+            slot[1] += 1
+        key_lock = slot[0]
+
+        try:
+            with key_lock:
+                # Another request may have filled the entry while we waited.
+                entry = self.get(job_id)
+                if entry:
+                    return entry
+
+                stripe_session = create()
+                if not stripe_session or not getattr(stripe_session, "url", None):
+                    return None
+
+                expires_at = getattr(stripe_session, "expires_at", None) or (
+                    int(time.time()) + CHECKOUT_SESSION_TTL_SECONDS
+                )
+                entry = CachedCheckoutSession(
+                    id=stripe_session.id, url=stripe_session.url,
+                    expires_at=int(expires_at)
+                )
+                self._store(job_id, entry)
+                return entry
+        finally:
+            # Dropped only by the last caller: a waiter still holds a
+            # reference, and a new arrival must queue on the same lock.
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] == 0:
+                    del self._key_locks[job_id]
+
+    def _store(self, job_id, entry):
+        with self._lock:
+            if len(self._entries) >= self._max_entries:
+                self._evict_expired()
+            if len(self._entries) >= self._max_entries:
+                # Still full: drop the oldest insertion (dicts keep order).
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[job_id] = entry
+
+    def _evict_expired(self):
+        now = time.time()
+        for key in [k for k, v in self._entries.items() if not v.is_reusable(now)]:
+            del self._entries[key]
+
+
+# Shared per-process instance used by the schedule routes.
+checkout_cache = CheckoutSessionCache()
@@ -0,0 +1,331 @@
+"""
+db_service.py
+
+Data-layer helpers for parsed schedules.
+
+The parse pipeline hands its display-ready shifts to save_shifts(), which
+upserts them into the normalized Shift table in a handful of round trips:
+
+* PostgreSQL (psycopg2), up to COPY_THRESHOLD rows: one INSERT ... VALUES %s ... ON
+  CONFLICT (uid) DO UPDATE per EXECUTE_VALUES_PAGE_SIZE rows, via
+  psycopg2.extras.execute_values.
+* PostgreSQL, larger batches: COPY into a temporary staging table, then a
+  single INSERT ... SELECT ... ON CONFLICT (uid) DO UPDATE.
+* Other databases/drivers (SQLite in tests): one executemany upsert.
+
+Because Shift.uid is stable per owner and shift, re-uploading a schedule
+updates the existing rows instead of duplicating them. The owner is the
+logged-in User, or for anonymous uploads the uploader id kept in their
+session cookie (routes/schedule.py), never the per-upload job_id.
+
+Readers (feeds, diffs, the dashboard) use get_user_shifts() /
+get_job_shifts(), which are range scans on the (user_id, starts_at) and
+job_id indexes. Support and analytics look up whole schedules with
+find_schedules(), whose shift filters become a single JSONB containment
+test on PostgreSQL (served by the GIN index on schedule_data).
+"""
+import csv
+import datetime
+import hashlib
+import io
+
+from sqlalchemy import insert, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+
+from workschedule.services.ics_generator import combine_date_time
+
+# shift_date as stored in Schedule.schedule_data and parsed/<job_id>.json.
+SHIFT_DATE_FORMAT = "%a, %b %d"
+
+COPY_THRESHOLD = 5000
+EXECUTE_VALUES_PAGE_SIZE = 1000
+
+SHIFT_COLUMNS = ("uid", "user_id", "job_id", "starts_at", "ends_at",
+                 "store_number", "department")
+# Columns refreshed when a re-upload hits an existing uid.
+_UPSERT_UPDATE_COLUMNS = ("user_id", "job_id", "starts_at", "ends_at",
+                          "store_number", "department")
+
+
+def store_label(store_number):
+    """Store number as the parser stores it ('#0660'); accepts '0660' or '#0660'."""
+    store_number = store_number.strip()
+    return store_number if store_number.startswith("#") else f"#{store_number}"
+
+
+def shift_uid(owner: str, starts_at, ends_at, department, store_number) -> str:
+    """Stable identity of a shift for its owner ('user:<id>', 'anon:<key>' or 'job:<job_id>')."""
+    source = f"{owner}|{starts_at.isoformat()}|{ends_at.isoformat()}|{department}|{store_number}"
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def build_shift_rows(shifts, timezone_str, job_id, user_id=None, year=None, owner_key=None):
+    """
+    Turn display-ready shifts (as stored in parsed/<job_id>.json) into Shift rows.
+
+    Args:
+        shifts (list): dicts with shift_date ('Mon, Sep 08'), shift_start,
+            shift_end, department and store_number.
+        timezone_str (str): IANA timezone the times are local to.
+        job_id (str): Upload the shifts came from.
+        user_id (int): Owning User.id, if the uploader is logged in.
+        year (int): Year to assume for the dates (default: current year,
+            the same assumption create_ics_from_entries makes).
+        owner_key (str): Stable id of an anonymous uploader (their browser
+            session's uploader id), so their re-uploads map onto the same
+            rows. Without either, rows are scoped to job_id.
+
+    Returns:
+        list: dicts keyed by Shift column name, ready for a bulk insert.
+    """
+    import pytz
+    try:
+        tzinfo = pytz.timezone(timezone_str or "UTC")
+    except pytz.UnknownTimeZoneError:
+        tzinfo = pytz.utc
+    year = year or datetime.datetime.now().year
+    if user_id:
+        owner = f"user:{user_id}"
+    elif owner_key:
+        owner = f"anon:{owner_key}"
+    else:
+        owner = f"job:{job_id}"
+
+    rows = []
+    for shift in shifts:
+        start_time, end_time = shift.get("shift_start"), shift.get("shift_end")
+        if not start_time or not end_time:
+            continue
+        try:
+            date_obj = datetime.datetime.strptime(f"{shift.get('shift_date', '')} {year}",
+                                                  "%a, %b %d %Y")
+        except ValueError:
+            continue
+        starts_at = tzinfo.localize(combine_date_time(date_obj, start_time))
+        ends_at = tzinfo.localize(combine_date_time(date_obj, end_time))
+        if ends_at < starts_at:
+            ends_at += datetime.timedelta(days=1)
+        department = shift.get("department") or None
+        store_number = shift.get("store_number") or None
+        rows.append({
+            "uid": shift_uid(owner, starts_at, ends_at, department, store_number),
+            "user_id": user_id,
+            "job_id": job_id,
+            "starts_at": starts_at,
+            "ends_at": ends_at,
+            "store_number": store_number,
+            "department": department,
+        })
+    return rows
+
+
+def save_shifts(rows):
+    """
+    Upsert Shift rows (keyed on uid) in bulk and commit. Returns the row count.
+
+    Rows repeating a uid within one call are collapsed to the last one, since
+    a single upsert statement may not touch the same row twice.
+    """
+    from workschedule.app import db
+    if not rows:
+        return 0
+    rows = list({row["uid"]: row for row in rows}.values())
+
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+        cursor = connection.connection.driver_connection.cursor()
+        try:
+            if len(rows) >= COPY_THRESHOLD:
+                _copy_upsert(cursor, rows)
+            else:
+                _execute_values_upsert(cursor, rows)
+        finally:
+            cursor.close()
+    else:
+        _executemany_upsert(connection, rows)
+    db.session.commit()
+    return len(rows)
+
+
+def _upsert_set_clause():
+    return ", ".join(f"{c} = EXCLUDED.{c}" for c in _UPSERT_UPDATE_COLUMNS)
+
+
+def _execute_values_upsert(cursor, rows):
+    from psycopg2.extras import execute_values
+    columns = ", ".join(SHIFT_COLUMNS)
+    execute_values(
+        cursor,
+        f"INSERT INTO shift ({columns}) VALUES %s "
+        f"ON CONFLICT (uid) DO UPDATE SET {_upsert_set_clause()}",
+        [tuple(row[c] for c in SHIFT_COLUMNS) for row in rows],
+        page_size=EXECUTE_VALUES_PAGE_SIZE,
+    )
+
+
+def _copy_upsert(cursor, rows):
+    columns = ", ".join(SHIFT_COLUMNS)
+    cursor.execute(
+        "CREATE TEMP TABLE shift_stage ("
+        "uid varchar(64), user_id integer, job_id varchar(64), "
+        "starts_at timestamptz, ends_at timestamptz, "
+        "store_number varchar(16), department varchar(64)"
+        ") ON COMMIT DROP"
+    )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # In CSV format an empty unquoted field is NULL.
+        writer.writerow(["" if row[c] is None else
+                         row[c].isoformat() if isinstance(row[c], datetime.datetime) else row[c]
+                         for c in SHIFT_COLUMNS])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY shift_stage ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    cursor.execute(
+        f"INSERT INTO shift ({columns}) SELECT {columns} FROM shift_stage "
+        f"ON CONFLICT (uid) DO UPDATE SET {_upsert_set_clause()}"
+    )
+
+
+def _executemany_upsert(connection, rows):
+    from workschedule.models import Shift
+    table = Shift.__table__
+    if connection.dialect.name in ("postgresql", "sqlite"):
+        if connection.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["uid"],
+            set_={c: stmt.excluded[c] for c in _UPSERT_UPDATE_COLUMNS},
+        )
+    else:
+        # No portable ON CONFLICT: replace the existing rows in the same
+        # transaction, so a re-upload never trips the unique uid.
+        connection.execute(table.delete().where(table.c.uid.in_([row["uid"] for row in rows])))
+        stmt = insert(table)
+    connection.execute(stmt, rows)
+
+
+def ensure_user(firebase_uid, email=None):
+    """Create the User row for a Firebase UID on first login (refreshing its email); returns User.id."""
+    from sqlalchemy.exc import IntegrityError
+
+    from workschedule.app import db
+    from workschedule.models import User
+    user = User.query.filter_by(firebase_uid=firebase_uid).one_or_none()
+    if user is None:
+        user = User(firebase_uid=firebase_uid, email=email)
+        db.session.add(user)
+    elif email and user.email != email:
+        user.email = email
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent first login created the row; use that one.
+        db.session.rollback()
+        user = User.query.filter_by(firebase_uid=firebase_uid).one()
+    return user.id
+
+
+def user_id_for_firebase_uid(firebase_uid):
+    """Return User.id for a Firebase UID, or None."""
+    from workschedule.services.user_cache import get_user
+    user = get_user(firebase_uid)
+    return user.id if user else None
+
+
+def get_user_shifts(user_id, start, end):
+    """Shifts for user_id starting in [start, end), oldest first."""
+    from workschedule.models import Shift
+    return (Shift.query
+            .filter(Shift.user_id == user_id,
+                    Shift.starts_at >= start,
+                    Shift.starts_at < end)
+            .order_by(Shift.starts_at)
+            .all())
+
+
+def get_job_shifts(job_id):
+    """All shifts parsed from one upload, oldest first."""
+    from workschedule.models import Shift
+    return Shift.query.filter_by(job_id=job_id).order_by(Shift.starts_at).all()
+
+
+def _shift_filter(store_number=None, department=None, shift_date=None):
+    """The fields one shift inside schedule_data must have, as a dict."""
+    shift = {}
+    if store_number:
+        shift["store_number"] = store_label(store_number)
+    if department:
+        shift["department"] = department
+    if shift_date:
+        shift["shift_date"] = (shift_date.strftime(SHIFT_DATE_FORMAT)
+                               if isinstance(shift_date, datetime.date) else shift_date)
+    return shift
+
+
+def _has_matching_shift(schedule_data, shift_filter):
+    shifts = (schedule_data or {}).get("shifts", []) if isinstance(schedule_data, dict) else []
+    return any(all(shift.get(k) == v for k, v in shift_filter.items()) for shift in shifts)
+
+
+def schedules_select(store_number=None, department=None, shift_date=None,
+                     created_from=None, created_to=None, user_email=None):
+    """
+    SELECT of Schedule rows matching the filters, newest first.
+
+    store_number, department and shift_date (a date or 'Mon, Sep 08') must
+    all match within the same shift. On PostgreSQL they are sent as one
+    ``schedule_data @> '{"shifts": [{...}]}'`` test, which the GIN index
+    answers, and created_from / created_to (upload time, [from, to)) let the
+    planner skip whole monthly partitions.
+
+    Returns:
+        tuple: (statement, residual) where residual is the shift filter the
+        caller still has to apply in Python (other databases), or None.
+    """
+    from workschedule.app import db
+    from workschedule.models import Schedule
+    shift_filter = _shift_filter(store_number, department, shift_date)
+    stmt = select(Schedule)
+    if created_from is not None:
+        stmt = stmt.where(Schedule.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Schedule.created_at < created_to)
+    if user_email:
+        stmt = stmt.where(Schedule.user_email == user_email)
+    stmt = stmt.order_by(Schedule.created_at.desc())
+
+    if shift_filter and db.session.get_bind().dialect.name == "postgresql":
+        stmt = stmt.where(
+            type_coerce(Schedule.schedule_data, JSONB).contains({"shifts": [shift_filter]}))
+        shift_filter = None
+    return stmt, shift_filter or None
+
+
+def matches_shift_filter(schedule, residual):
+    """Apply the residual filter from schedules_select() to one Schedule."""
+    return not residual or _has_matching_shift(schedule.schedule_data, residual)
+
+
+def find_schedules(store_number=None, department=None, shift_date=None,
+                   created_from=None, created_to=None, user_email=None, limit=None):
+    """Schedules with a shift matching every given filter, newest first (see schedules_select)."""
+    from workschedule.app import db
+    stmt, residual = schedules_select(store_number, department, shift_date,
+                                      created_from, created_to, user_email)
+    if limit and not residual:
+        stmt = stmt.limit(limit)
+    matches = [s for s in db.session.scalars(stmt) if matches_shift_filter(s, residual)]
+    return matches[:limit] if limit else matches
+
+
+def store_schedules_for_month(store_number, month=None, department=None):
+    """Schedules uploaded in `month` (any date in it; default: this month) with shifts at store_number."""
+    month = month or datetime.date.today()
+    start = datetime.datetime(month.year, month.month, 1)
+    end = datetime.datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+    return find_schedules(store_number=store_number, department=department,
+                          created_from=start, created_to=end)
@@ -0,0 +1,369 @@
+"""
+email_queue.py
+
+Outbound email queue so request handlers never wait on Mailgun.
+
+Handlers call enqueue(...) (or mailgun_service.queue_receipt_with_ics) and
+return immediately. A small pool of background sender threads builds and
+sends each message; failures are retried with exponential backoff and,
+after EMAIL_MAX_ATTEMPTS, written to a dead-letter file from which they can
+be replayed with replay_dead_letters().
+
+The number of sender threads bounds concurrent Mailgun calls per process,
+and the queue size bounds memory: when it is full enqueue() returns None
+instead of blocking the request.
+
+Queued mail lives in this process only. shutdown() runs from gunicorn's
+worker_exit hook and at interpreter exit: it gives the senders up to
+EMAIL_DRAIN_TIMEOUT_SECONDS, then dead-letters whatever is still queued
+or waiting to retry, so recycled workers (max_requests) drop nothing.
+
+EMAIL_DEAD_LETTER_PATH is a local JSONL file or ``gs://bucket/prefix``
+(one object per job). It defaults to gs://<GCS_BUCKET_NAME>/dead-letter/email
+on Cloud Run, whose local disk does not outlive the instance, and to a
+file under /tmp elsewhere.
+"""
+import atexit
+import base64
+import heapq
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+EMAIL_QUEUE_MAXSIZE = int(os.getenv("EMAIL_QUEUE_MAXSIZE", "1000"))
+EMAIL_SENDER_THREADS = int(os.getenv("EMAIL_SENDER_THREADS", "4"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "2"))
+EMAIL_DRAIN_TIMEOUT_SECONDS = float(os.getenv("EMAIL_DRAIN_TIMEOUT_SECONDS", "10"))
+EMAIL_DEAD_LETTER_PATH = os.getenv("EMAIL_DEAD_LETTER_PATH") or (
+    f"gs://{os.getenv('GCS_BUCKET_NAME', 'work-schedule-cloud')}/dead-letter/email"
+    if os.getenv("K_SERVICE") else "/tmp/workschedule/email_dead_letter.jsonl"
+)
+
+
+def _split_gs_url(url):
+    bucket, _, prefix = url[len("gs://"):].partition("/")
+    return bucket, prefix.strip("/")
+
+
+def _default_senders():
+    from workschedule.services import mailgun_service
+    return {
+        "simple": mailgun_service.send_simple_message,
+        "receipt": mailgun_service.send_receipt_with_ics,
+    }
+
+
+@dataclass
+class EmailJob:
+    kind: str
+    kwargs: dict
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempts: int = 0
+    last_error: str = ""
+
+    def to_json(self):
+        kwargs = {
+            k: {"__bytes__": base64.b64encode(v).decode()} if isinstance(v, bytes) else v
+            for k, v in self.kwargs.items()
+        }
+        return json.dumps({"id": self.id, "kind": self.kind, "kwargs": kwargs,
+                           "attempts": self.attempts, "last_error": self.last_error})
+
+    @classmethod
+    def from_json(cls, line):
+        data = json.loads(line)
+        kwargs = {
+            k: base64.b64decode(v["__bytes__"]) if isinstance(v, dict) and "__bytes__" in v else v
+            for k, v in data["kwargs"].items()
+        }
+        return cls(kind=data["kind"], kwargs=kwargs, id=data["id"])
+
+
+class EmailQueue:
+    """Bounded queue drained by a fixed pool of sender threads."""
+
+    def __init__(self, senders=None, workers=EMAIL_SENDER_THREADS,
+                 maxsize=EMAIL_QUEUE_MAXSIZE, max_attempts=EMAIL_MAX_ATTEMPTS,
+                 retry_base_seconds=EMAIL_RETRY_BASE_SECONDS,
+                 dead_letter_path=EMAIL_DEAD_LETTER_PATH):
+        self._senders = senders
+        self._workers = workers
+        self._max_attempts = max_attempts
+        self._retry_base_seconds = retry_base_seconds
+        self._dead_letter_path = dead_letter_path
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._retry_heap = []
+        self._retry_cond = threading.Condition()
+        self._dead_letter_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._threads = []
+        self._stopping = False
+        self.sent = 0
+        self.dead_lettered = 0
+
+    # -- public API --------------------------------------------------------
+    def enqueue(self, kind, **kwargs):
+        """Queue a message; returns its job id, or None if the queue is full."""
+        self._ensure_started()
+        job = EmailJob(kind=kind, kwargs=kwargs)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            logger.warning("Queue full, dead-lettering %s job %s", kind, job.id)
+            job.last_error = "queue full"
+            self._dead_letter(job)
+            return None
+        return job.id
+
+    def join(self, timeout=None):
+        """Wait until every queued and scheduled-for-retry job is finished."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._retry_cond:
+                idle = not self._retry_heap and self._queue.unfinished_tasks == 0
+            if idle:
+                return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+
+    def stop(self, timeout=5):
+        """Let in-flight work finish, then stop the sender threads."""
+        self.join(timeout)
+        with self._retry_cond:
+            self._stopping = True
+            self._retry_cond.notify_all()
+        self._stop_threads(timeout)
+
+    def shutdown(self, timeout=EMAIL_DRAIN_TIMEOUT_SECONDS):
+        """Send what can be sent within timeout, dead-letter the rest, stop. Returns the count dead-lettered."""
+        if not self._threads:
+            return 0
+        self.join(timeout)
+        with self._retry_cond:
+            # From here on a failed send is dead-lettered rather than retried.
+            self._stopping = True
+            leftovers = [job for _, _, job in self._retry_heap]
+            self._retry_heap = []
+            self._retry_cond.notify_all()
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            if job is not None:
+                leftovers.append(job)
+        for job in leftovers:
+            job.last_error = job.last_error or "worker exited before sending"
+            self._dead_letter(job)
+        if leftovers:
+            logger.warning("Dead-lettered %d unsent emails at shutdown", len(leftovers))
+        self._stop_threads(timeout)
+        return len(leftovers)
+
+    def pending(self):
+        with self._retry_cond:
+            return self._queue.qsize() + len(self._retry_heap)
+
+    # -- internals ---------------------------------------------------------
+    def _stop_threads(self, timeout):
+        # One sentinel per sender; the retry thread exits on _stopping. A
+        # spare sentinel would stop a sender of the next _ensure_started().
+        for _ in range(self._workers):
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        with self._retry_cond:
+            self._stopping = False
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            if self._senders is None:
+                self._senders = _default_senders()
+            threads = [threading.Thread(target=self._send_loop, daemon=True,
+                                        name=f"email-sender-{i}")
+                       for i in range(self._workers)]
+            threads.append(threading.Thread(target=self._retry_loop, daemon=True,
+                                            name="email-retry"))
+            for thread in threads:
+                thread.start()
+            self._threads = threads
+
+    def _send_loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            try:
+                self._attempt(job)
+            finally:
+                self._queue.task_done()
+
+    def _attempt(self, job):
+        job.attempts += 1
+        try:
+            ok = self._senders[job.kind](**job.kwargs)
+            error = "" if ok else "sender returned False"
+        except Exception as e:
+            ok, error = False, f"{type(e).__name__}: {e}"
+
+        if ok:
+            with self._stats_lock:
+                self.sent += 1
+            return
+        job.last_error = error
+        if job.attempts >= self._max_attempts:
+            logger.error("Giving up on %s job %s after %d attempts: %s",
+                         job.kind, job.id, job.attempts, error)
+            self._dead_letter(job)
+            return
+        delay = self._retry_base_seconds * (2 ** (job.attempts - 1))
+        with self._retry_cond:
+            # Checked under the lock shutdown() collects leftovers with.
+            if not self._stopping:
+                heapq.heappush(self._retry_heap, (time.monotonic() + delay, job.id, job))
+                self._retry_cond.notify()
+                return
+        self._dead_letter(job)
+
+    def _retry_loop(self):
+        with self._retry_cond:
+            while not self._stopping:
+                if not self._retry_heap:
+                    self._retry_cond.wait()
+                    continue
+                due_at, _, job = self._retry_heap[0]
+                wait = due_at - time.monotonic()
+                if wait > 0:
+                    self._retry_cond.wait(wait)
+                    continue
+                # Never block while holding the lock: senders need it to
+                # schedule their own retries, and only they drain the queue.
+                try:
+                    self._queue.put_nowait(job)
+                except queue.Full:
+                    self._retry_cond.wait(0.1)
+                    continue
+                heapq.heappop(self._retry_heap)
+
+    def _dead_letter(self, job):
+        with self._stats_lock:
+            self.dead_lettered += 1
+        if self._dead_letter_path.startswith("gs://"):
+            _store_gcs_dead_letter(self._dead_letter_path, job)
+            return
+        with self._dead_letter_lock:
+            try:
+                os.makedirs(os.path.dirname(self._dead_letter_path), exist_ok=True)
+                with open(self._dead_letter_path, "a") as f:
+                    f.write(job.to_json() + "\n")
+            except OSError as e:
+                logger.error("Could not write dead letter %s: %s", job.id, e)
+
+
+def _store_gcs_dead_letter(url, job):
+    from workschedule import clients
+    bucket, prefix = _split_gs_url(url)
+    try:
+        clients.get_gcs_bucket(bucket).blob(f"{prefix}/{job.id}.json").upload_from_string(
+            job.to_json(), content_type="application/json")
+    except Exception as e:
+        logger.error("Could not write dead letter %s to %s: %s", job.id, url, e)
+
+
+def _claim_gcs_dead_letters(url):
+    """Read and delete every dead letter under url; a blob another replay deletes first is skipped."""
+    from google.api_core.exceptions import NotFound, PreconditionFailed
+
+    from workschedule import clients
+    bucket_name, prefix = _split_gs_url(url)
+    bucket = clients.get_gcs_bucket(bucket_name)
+    lines = []
+    for blob in bucket.list_blobs(prefix=f"{prefix}/"):
+        try:
+            line = blob.download_as_text()
+            blob.delete(if_generation_match=blob.generation)
+        except (NotFound, PreconditionFailed):
+            continue
+        lines.append(line)
+    return lines
+
+
+def replay_dead_letters(email_queue=None, path=EMAIL_DEAD_LETTER_PATH):
+    """Re-enqueue every dead-lettered job and clear the file. Returns the count."""
+    email_queue = email_queue or get_email_queue()
+    if path.startswith("gs://"):
+        lines = _claim_gcs_dead_letters(path)
+        for line in lines:
+            job = EmailJob.from_json(line)
+            email_queue.enqueue(job.kind, **job.kwargs)
+        return len(lines)
+    # Take the file out of the way first; dead letters written from now on
+    # start a new file instead of being lost between the read and a remove.
+    claimed = f"{path}.replay-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    with email_queue._dead_letter_lock:
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            return 0
+    with open(claimed) as f:
+        lines = [line for line in f if line.strip()]
+    os.remove(claimed)
+    for line in lines:
+        job = EmailJob.from_json(line)
+        email_queue.enqueue(job.kind, **job.kwargs)
+    return len(lines)
+
+
+_email_queue = None
+_email_queue_lock = threading.Lock()
+
+
+def get_email_queue():
+    global _email_queue
+    if _email_queue is None:
+        with _email_queue_lock:
+            if _email_queue is None:
+                _email_queue = EmailQueue()
+    return _email_queue
+
+
+def enqueue(kind, **kwargs):
+    return get_email_queue().enqueue(kind, **kwargs)
+
+
+def shutdown(timeout=EMAIL_DRAIN_TIMEOUT_SECONDS):
+    """Drain this process's queue (see EmailQueue.shutdown); a no-op if it never started."""
+    if _email_queue is None:
+        return 0
+    return _email_queue.shutdown(timeout)
+
+
+atexit.register(shutdown)
+
+
+def _reset_after_fork():
+    # Sender threads do not survive fork(); the child starts its own on demand.
+    global _email_queue, _email_queue_lock
+    _email_queue = None
+    _email_queue_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
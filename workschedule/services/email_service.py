@@ -1,17 +1,19 @@
 # Email sending service using Mailgun
 import os
-import requests
+
+from workschedule.services import http_client
 
 MAILGUN_DOMAIN = os.environ.get('MAILGUN_DOMAIN')
 MAILGUN_API_KEY = os.environ.get('MAILGUN_API_KEY')
 REPLY_TO_ADDRESS = os.environ.get('MAILGUN_REPLY_TO', 'reply@myschedule.cloud')
+MAILGUN_API_BASE = os.environ.get('MAILGUN_API_BASE', 'https://api.mailgun.net/v3')
 
 def send_initial_email(recipient, subject, body):
 	"""
 	Sends an email via Mailgun to the recipient with a Reply-To header.
 	"""
-	return requests.post(
-		f"https://api.mailgun.net/v3/{MAILGUN_DOMAIN}/messages",
+	return http_client.post(
+		f"{MAILGUN_API_BASE}/{MAILGUN_DOMAIN}/messages",
 		auth=("api", MAILGUN_API_KEY),
 		data={
 			"from": f"MySchedule <noreply@{MAILGUN_DOMAIN}>",
@@ -0,0 +1,140 @@
+"""
+email_templates.py
+
+Precompiled, cached rendering of the transactional email bodies in
+templates/emails.
+
+Templates are loaded and compiled by Jinja once per process. On top of that
+each template is rendered a single time with marker values in place of the
+per-recipient fields, and the output is split into its static fragments.
+Rendering an email is then a join of those fragments with the escaped
+recipient values, so the ~160 lines of receipt markup are not re-rendered
+per send. Per-recipient fields must only be printed, never branched on.
+"""
+import os
+import threading
+from datetime import datetime
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import escape
+
+EMAIL_TEMPLATE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "emails"
+)
+
+# Google Calendar - use mobile web version that bypasses app
+GOOGLE_CALENDAR_URL = "https://calendar.google.com/calendar/gp#~calendar"
+# Outlook - main calendar web interface for importing
+OUTLOOK_CALENDAR_URL = "https://outlook.live.com/calendar/"
+
+APP_URL = os.getenv("BASE_URL", "https://myschedule.cloud")
+
+RECEIPT_SUBJECT = "Schedule --> Calendar"
+RECEIPT_FIELDS = ("customer_name", "filename")
+
+REMINDER_SUBJECT = "Time to update your work schedule"
+REMINDER_FIELDS = ("email",)
+
+_env = Environment(
+    loader=FileSystemLoader(EMAIL_TEMPLATE_DIR),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+    keep_trailing_newline=True,
+)
+_env.globals.update(
+    google_url=GOOGLE_CALENDAR_URL,
+    outlook_url=OUTLOOK_CALENDAR_URL,
+    upload_url=f"{APP_URL}/schedule/upload",
+)
+
+_MARKER = "\x00{}\x00"
+
+
+class PrerenderedTemplate:
+    """A template rendered once, with per-recipient fields left as slots."""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = tuple(fields)
+        self._escape = name.endswith(".html")
+        rendered = _env.get_template(name).render(
+            **{field: _MARKER.format(field) for field in self.fields}
+        )
+        # Alternating [literal, field, literal, field, ..., literal].
+        self._parts = rendered.split("\x00")
+
+    def render(self, **values):
+        parts = self._parts
+        out = [parts[0]]
+        for i in range(1, len(parts), 2):
+            value = values.get(parts[i], "")
+            out.append(str(escape(value)) if self._escape else str(value))
+            out.append(parts[i + 1])
+        return "".join(out)
+
+
+_prerendered = {}
+_prerendered_lock = threading.Lock()
+
+
+def get_template(name, fields):
+    """Return the cached PrerenderedTemplate for name, building it on first use."""
+    key = (name, tuple(fields))
+    template = _prerendered.get(key)
+    if template is None:
+        with _prerendered_lock:
+            template = _prerendered.get(key)
+            if template is None:
+                template = _prerendered[key] = PrerenderedTemplate(name, fields)
+    return template
+
+
+def receipt_filename(now=None):
+    """Timestamped name for the ICS attachment, e.g. work_schedule_20251007_0930.ics."""
+    return f"work_schedule_{(now or datetime.now()).strftime('%Y%m%d_%H%M')}.ics"
+
+
+def render_receipt(customer_name, filename):
+    """
+    Render the receipt email for one recipient.
+
+    Returns:
+        tuple: (html_content, text_content)
+    """
+    values = {"customer_name": customer_name, "filename": filename}
+    return (
+        get_template("receipt.html", RECEIPT_FIELDS).render(**values),
+        get_template("receipt.txt", RECEIPT_FIELDS).render(**values),
+    )
+
+
+def render_receipts(recipients):
+    """
+    Render receipts for many recipients in one pass.
+
+    Args:
+        recipients (iterable): dicts with customer_name and filename.
+
+    Returns:
+        list: (html_content, text_content) tuples in input order.
+    """
+    html = get_template("receipt.html", RECEIPT_FIELDS)
+    text = get_template("receipt.txt", RECEIPT_FIELDS)
+    return [(html.render(**r), text.render(**r)) for r in recipients]
+
+
+def render_reminder_batch():
+    """
+    Render the reminder email once for a Mailgun batch send.
+
+    Per-recipient fields are left as Mailgun %recipient.<field>% variables,
+    which Mailgun fills in from the recipient-variables parameter.
+
+    Returns:
+        tuple: (html_content, text_content)
+    """
+    values = {field: f"%recipient.{field}%" for field in REMINDER_FIELDS}
+    return (
+        get_template("reminder.html", REMINDER_FIELDS).render(**values),
+        get_template("reminder.txt", REMINDER_FIELDS).render(**values),
+    )
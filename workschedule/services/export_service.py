@@ -0,0 +1,143 @@
+"""
+export_service.py
+
+Streaming CSV / NDJSON exports of schedules and shifts.
+
+Rows are read with ``yield_per``, which on PostgreSQL (psycopg2) opens a
+server-side cursor and fetches EXPORT_BATCH_SIZE rows at a time, and are
+encoded into text chunks as they arrive. Neither the query result nor the
+output is ever held in memory as a whole, so an export of any size runs in
+bounded memory. The same generators back the admin endpoint (wrapped in a
+streaming Response) and ``flask export`` (written to a file or stdout).
+"""
+import csv
+import datetime
+import io
+import json
+import os
+
+from sqlalchemy import select
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Encoded rows are flushed to the caller in chunks of roughly this many bytes.
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+SCHEDULE_COLUMNS = ("id", "job_id", "user_email", "created_at", "schedule_data")
+SHIFT_COLUMNS = ("uid", "user_id", "job_id", "starts_at", "ends_at",
+                 "store_number", "department", "created_at")
+
+
+def _jsonable(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def iter_schedules(store_number=None, department=None, created_from=None, created_to=None,
+                   batch_size=EXPORT_BATCH_SIZE):
+    """Yield schedules matching the filters as dicts, streaming from the database."""
+    from workschedule.app import db
+    from workschedule.services.db_service import matches_shift_filter, schedules_select
+    stmt, residual = schedules_select(store_number=store_number, department=department,
+                                      created_from=created_from, created_to=created_to)
+    result = db.session.scalars(stmt.execution_options(yield_per=batch_size))
+    try:
+        for schedule in result:
+            if matches_shift_filter(schedule, residual):
+                yield {c: _jsonable(getattr(schedule, c)) for c in SCHEDULE_COLUMNS}
+            # Nothing from this batch is needed again.
+            db.session.expunge(schedule)
+    finally:
+        result.close()
+
+
+def iter_shifts(store_number=None, department=None, start=None, end=None,
+                batch_size=EXPORT_BATCH_SIZE):
+    """Yield shifts (starting in [start, end)) matching the filters as dicts, oldest first."""
+    from workschedule.app import db
+    from workschedule.models import Shift
+    from workschedule.services.db_service import store_label
+    stmt = select(*(getattr(Shift, c) for c in SHIFT_COLUMNS))
+    if store_number:
+        stmt = stmt.where(Shift.store_number == store_label(store_number))
+    if department:
+        stmt = stmt.where(Shift.department == department)
+    if start is not None:
+        stmt = stmt.where(Shift.starts_at >= start)
+    if end is not None:
+        stmt = stmt.where(Shift.starts_at < end)
+    stmt = stmt.order_by(Shift.starts_at, Shift.id)
+
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        for row in result:
+            yield {c: _jsonable(v) for c, v in zip(SHIFT_COLUMNS, row)}
+    finally:
+        result.close()
+
+
+def to_csv(rows, columns):
+    """Encode dict rows as CSV text chunks (header first); nested values become JSON."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([json.dumps(v) if isinstance(v, (dict, list)) else v
+                         for v in (row.get(c) for c in columns)])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def to_ndjson(rows):
+    """Encode dict rows as newline-delimited JSON text chunks."""
+    chunk = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, separators=(",", ":")) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def export(kind, fmt, **filters):
+    """
+    Text chunks of a `kind` ('schedules' or 'shifts') export in `fmt` ('csv' or 'ndjson').
+
+    Raises:
+        ValueError: For an unknown kind or format.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if kind == "schedules":
+        rows, columns = iter_schedules(**filters), SCHEDULE_COLUMNS
+    elif kind == "shifts":
+        rows, columns = iter_shifts(**filters), SHIFT_COLUMNS
+    else:
+        raise ValueError(f"Unknown export: {kind}")
+    return to_csv(rows, columns) if fmt == "csv" else to_ndjson(rows)
+
+
+def parse_date(value):
+    """'2026-10-01' -> datetime at midnight; None/'' -> None. Raises ValueError."""
+    if not value:
+        return None
+    return datetime.datetime.combine(datetime.date.fromisoformat(value), datetime.time())
+
+
+def filters_for(kind, store_number=None, department=None, date_from=None, date_to=None):
+    """Map the shared store/department/date options onto kind's filter arguments."""
+    date_from, date_to = parse_date(date_from), parse_date(date_to)
+    if kind == "shifts":
+        return {"store_number": store_number, "department": department,
+                "start": date_from, "end": date_to}
+    return {"store_number": store_number, "department": department,
+            "created_from": date_from, "created_to": date_to}
@@ -0,0 +1,118 @@
+"""
+http_client.py
+
+Shared outbound HTTP layer for Stripe, Mailgun and any other third-party API.
+
+Every call goes through a per-process requests.Session with a keep-alive
+connection pool, so repeated calls to the same host reuse the TCP+TLS
+connection instead of handshaking each time. Requests always carry a
+(connect, read) timeout, and failures that are known not to have been
+processed (connection errors, 429, 503) are retried with jittered
+exponential backoff. Latency is recorded per host in ``host_latency``.
+"""
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from workschedule.metrics import LatencyStats
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = 0.3
+HTTP_BACKOFF_JITTER = 0.3
+
+# Statuses meaning "the server did not act on this request"; safe to retry
+# even for POST.
+RETRY_STATUSES = (429, 503)
+
+host_latency = LatencyStats("http_client_host_latency")
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class _TimeoutSession(requests.Session):
+    """Session that applies DEFAULT_TIMEOUT and records per-host latency."""
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = DEFAULT_TIMEOUT
+        start = time.perf_counter()
+        try:
+            return super().request(method, url, **kwargs)
+        finally:
+            host = urlsplit(url).hostname or "unknown"
+            host_latency.observe(host, time.perf_counter() - start)
+
+
+def _build_retry(retry_status):
+    return Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=0,  # the request may already have been processed
+        status=HTTP_MAX_RETRIES if retry_status else 0,
+        status_forcelist=RETRY_STATUSES if retry_status else None,
+        allowed_methods=None,  # any verb; status_forcelist limits what is retried
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        backoff_jitter=HTTP_BACKOFF_JITTER,
+        raise_on_status=False,
+    )
+
+
+def _build_session(retry_status):
+    session = _TimeoutSession()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=_build_retry(retry_status),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(retry_status=True):
+    """
+    Return the process-wide pooled session.
+
+    Args:
+        retry_status (bool): Retry 429/503 responses. Clients that implement
+            their own status retries (Stripe) should pass False so requests
+            are not retried twice.
+    """
+    session = _sessions.get(retry_status)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(retry_status)
+            if session is None:
+                session = _sessions[retry_status] = _build_session(retry_status)
+    return session
+
+
+def post(url, **kwargs):
+    return get_session().post(url, **kwargs)
+
+
+def get(url, **kwargs):
+    return get_session().get(url, **kwargs)
+
+
+def reset_sessions():
+    """Drop pooled sessions; a forked child must not share parent sockets."""
+    global _sessions_lock
+    _sessions.clear()
+    _sessions_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_sessions)
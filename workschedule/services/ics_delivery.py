@@ -9,16 +9,16 @@ If you need to generate a raw GCS signed URL directly, use deliver_ics_file().
 import os
 import uuid
 import datetime
-from google.cloud import storage
+
+from workschedule import clients
 
 BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME")
-storage_client = storage.Client()
 
 
 def _get_bucket():
     if not BUCKET_NAME:
         raise ValueError("GCS_BUCKET_NAME environment variable is not set.")
-    return storage_client.bucket(BUCKET_NAME)
+    return clients.get_gcs_bucket(BUCKET_NAME)
 
 
 def _upload_ics_to_gcs(ics_content: str) -> str:
@@ -62,4 +62,4 @@ def deliver_ics_file_from_path(file_path: str) -> str:
 
 
 if __name__ == '__main__':
-    print("This file is a module — import it rather than running directly.")
+    raise SystemExit("This file is a module — import it rather than running directly.")
@@ -6,8 +6,9 @@ import logging
 from icalendar import Calendar, Event
 import hashlib
 
-# Set up basic logging for internal messages and debugging.
-logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+from workschedule.metrics import timed
+
+logger = logging.getLogger(__name__)
 
 # The JSON data from your Document AI output.
 # In a real-world scenario, you would replace this with the actual
@@ -148,7 +149,7 @@ def extract_shifts_from_docai_entities(entities):
                 page_refs = entity['pageAnchor'].get('pageRefs', [])
                 if page_refs and 'page' in page_refs[0]:
                     page_num = page_refs[0]['page']
-            logging.info(f"Processing Work-shift entity on page: {page_num}, id: {entity.get('id')}")
+            logger.debug("Processing Work-shift entity on page %s, id %s", page_num, entity.get('id'))
 
             if not properties:
                 continue
@@ -180,20 +181,20 @@ def extract_shifts_from_docai_entities(entities):
                 
                 # We need a date, start time, and end time to create a full event.
                 if not date_obj:
-                    logging.info(f"SKIP: No valid date for shift entity: {shift_data}")
+                    logger.debug("SKIP: No valid date for shift entity %s", entity.get('id'))
                     continue
                 if not shift_data.get('start_time') or not shift_data.get('end_time'):
-                    logging.info(f"SKIP: Missing start or end time for shift entity: {shift_data}")
+                    logger.debug("SKIP: Missing start or end time for shift entity %s", entity.get('id'))
                     continue
 
             except Exception as e:
-                logging.info(f"SKIP: Date parsing failed for shift entity: {shift_data}, error: {e}")
+                logger.debug("SKIP: Date parsing failed for shift entity %s: %s", entity.get('id'), e)
                 continue
 
             # Deduplication key to prevent duplicate calendar entries.
             dedup_key = f"{date_obj.date()}_{shift_data.get('start_time','').strip()}"
             if dedup_key in seen:
-                logging.info(f"SKIP: Duplicate shift for key {dedup_key}: {shift_data}")
+                logger.debug("SKIP: Duplicate shift for key %s", dedup_key)
                 continue
             seen.add(dedup_key)
 
@@ -206,11 +207,11 @@ def extract_shifts_from_docai_entities(entities):
                 'department': shift_data.get('department',''),
                 'shift_total': shift_data.get('shift_total','')
             }
-            logging.info(f"INCLUDE: Extracted shift entry: {shift_entry}")
             shifts.append(shift_entry)
 
     return shifts
 
+@timed("ics_generate")
 def create_ics_from_entries(entries, calendar_name="work-schedule", timezone_str=None):
     """
     Given a list of shift entries, generate an ICS calendar file as a string.
@@ -223,8 +224,7 @@ def create_ics_from_entries(entries, calendar_name="work-schedule", timezone_str
     Returns:
         str: The content of the iCalendar file.
     """
-    print(f"[DEBUG] create_ics_from_entries: received entries={entries}")
-    print(f"[DEBUG] create_ics_from_entries: entries count={len(entries)}")
+    logger.debug("Building ICS from %d entries", len(entries))
     cal = Calendar()
     cal.add('prodid', '-//myschedule.cloud//Schedule Generator//EN')
     cal.add('version', '2.0')
@@ -245,12 +245,12 @@ def create_ics_from_entries(entries, calendar_name="work-schedule", timezone_str
             date_str = entry.get('shift_date', '')
             date_obj = datetime.strptime(f"{date_str} {datetime.now().year}", "%a, %b %d %Y")
         except Exception as e:
-            print(f"[DEBUG] Failed to parse shift_date '{entry.get('shift_date')}' with error: {e}")
+            logger.debug("Skipping entry with unparseable shift_date: %s", e)
             continue
         start_time = entry.get('shift_start', '')
         end_time = entry.get('shift_end', '')
         if not start_time or not end_time:
-            print(f"[DEBUG] Missing start or end time for entry: {entry}")
+            logger.debug("Skipping entry without start or end time")
             continue
         start_dt = combine_date_time(date_obj, start_time)
         end_dt = combine_date_time(date_obj, end_time)
@@ -337,34 +337,32 @@ def combine_date_time(date_obj, time_str):
         try:
             time_obj = datetime.strptime(time_str, '%I %p').time()
         except ValueError:
-            logging.error(f"Failed to parse time string: {time_str}")
+            logger.warning("Failed to parse time string %r", time_str)
             time_obj = time(0, 0)  # Default to midnight if parsing fails.
     return datetime.combine(date_obj.date(), time_obj)
 
 if __name__ == "__main__":
     # --- Main Execution Flow ---
     
+    from workschedule import log_config
+    log_config.configure()
+
     # 1. Extract shift data from the raw Document AI entities.
-    logging.info("Starting extraction of shifts from Document AI entities...")
+    logger.info("Starting extraction of shifts from Document AI entities...")
     extracted_shifts = extract_shifts_from_docai_entities(document_ai_json_data)
-    logging.info(f"Successfully extracted {len(extracted_shifts)} complete shifts.")
+    logger.info("Successfully extracted %d complete shifts.", len(extracted_shifts))
     
     # 2. Convert the extracted shift data into a complete ICS file string.
-    logging.info("Generating ICS file content...")
+    logger.info("Generating ICS file content...")
     ics_file_content = create_ics_from_entries(extracted_shifts)
     
-    # 3. Print the final ICS file content.
+    # 3. Log the final ICS file content.
     if ics_file_content:
-        print("\n" + "="*50)
-        print("Generated ICS File Content")
-        print("="*50)
-        print(ics_file_content)
-        print("="*50)
-        
+        logger.info("Generated ICS file content:\n%s", ics_file_content)
+
         # Optional: Save the content to a file.
         # with open("shifts.ics", "w") as f:
         #     f.write(ics_file_content)
-        # print("File saved as 'shifts.ics'")
     else:
-        print("No complete shifts were found to generate an ICS file.")
+        logger.info("No complete shifts were found to generate an ICS file.")
 
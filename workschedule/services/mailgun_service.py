@@ -1,10 +1,22 @@
+import logging
 import os
 import requests
 from dotenv import load_dotenv
 
+from workschedule.metrics import timed
+from workschedule.services import http_client
+
 # Load environment variables from a .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Overridable so tests (and staging) can point at a local fake Mailgun.
+MAILGUN_API_BASE = os.getenv("MAILGUN_API_BASE", "https://api.mailgun.net/v3")
+# Maximum recipients Mailgun accepts in a single batch send.
+MAILGUN_BATCH_LIMIT = 1000
+
+@timed("mailgun_send")
 def send_simple_message(to_email, subject, text_content, html_content=None, attachment_bytes=None, attachment_filename=None):
     """
     Sends an email using the Mailgun API.
@@ -18,17 +30,14 @@ def send_simple_message(to_email, subject, text_content, html_content=None, atta
     Returns:
         bool: True if the email was sent successfully, False otherwise.
     """
-    import sys
     mailgun_api_key = os.getenv("MAILGUN_API_KEY")
     mailgun_domain = os.getenv("MAILGUN_DOMAIN")
 
-    sys.stderr.write(f"[Mailgun] Preparing to send email. to_email={to_email}, subject={subject}, mailgun_domain={mailgun_domain}\n")
     if not mailgun_api_key or not mailgun_domain:
-        sys.stderr.write("[Mailgun] Error: Mailgun API key or domain is not set in environment variables.\n")
+        logger.error("Mailgun API key or domain is not set in environment variables.")
         return False
 
-    api_url = f"https://api.mailgun.net/v3/{mailgun_domain}/messages"
-    sys.stderr.write(f"[Mailgun] API URL: {api_url}\n")
+    api_url = f"{MAILGUN_API_BASE}/{mailgun_domain}/messages"
     data = {
             "from": f"myschedule.cloud:  <mailgun@{mailgun_domain}>",
         "to": to_email,
@@ -45,26 +54,75 @@ def send_simple_message(to_email, subject, text_content, html_content=None, atta
             ("attachment", (attachment_filename, attachment_bytes, "text/calendar"))
         ]
 
-    sys.stderr.write(f"[Mailgun] Data: {data}\n")
     if files:
-        sys.stderr.write(f"[Mailgun] Attachment: {attachment_filename}, bytes={len(attachment_bytes)}\n")
+        logger.debug("Attaching %s (%d bytes)", attachment_filename, len(attachment_bytes))
     try:
-        response = requests.post(
+        response = http_client.post(
             api_url,
             auth=("api", mailgun_api_key),
             data=data,
             files=files
         )
-        sys.stderr.write(f"[Mailgun] Response status: {response.status_code}\n")
-        sys.stderr.write(f"[Mailgun] Response text: {response.text}\n")
         response.raise_for_status()  # Raises an HTTPError for bad responses
-        sys.stderr.write(f"[Mailgun] Email sent successfully to {to_email}.\n")
+        logger.info("Mailgun accepted message (status %s)", response.status_code)
         return True
     except requests.exceptions.RequestException as e:
-        sys.stderr.write(f"[Mailgun] Failed to send email to {to_email}: {e}\n")
+        # The body is Mailgun's error description; addresses stay out of the log.
+        logger.warning("Mailgun send failed: %s", e)
         if 'response' in locals():
-            sys.stderr.write(f"[Mailgun] Error response status: {response.status_code}\n")
-            sys.stderr.write(f"[Mailgun] Error response text: {response.text}\n")
+            logger.warning("Mailgun error response %s: %.500s", response.status_code, response.text)
+        return False
+
+
+@timed("mailgun_send")
+def send_batch_message(to_emails, subject, text_content, html_content=None,
+                       recipient_variables=None):
+    """
+    Sends one message to many recipients with a single Mailgun API call.
+
+    Mailgun delivers a separate copy to each address and substitutes
+    %recipient.<key>% placeholders from recipient_variables, so recipients
+    never see each other. Mailgun accepts at most MAILGUN_BATCH_LIMIT
+    recipients per call.
+
+    Args:
+        to_emails (list): Recipient addresses.
+        recipient_variables (dict): {email: {key: value}} for personalization.
+
+    Returns:
+        bool: True if Mailgun accepted the batch, False otherwise.
+    """
+    import json
+    mailgun_api_key = os.getenv("MAILGUN_API_KEY")
+    mailgun_domain = os.getenv("MAILGUN_DOMAIN")
+    if not mailgun_api_key or not mailgun_domain:
+        logger.error("Mailgun API key or domain is not set in environment variables.")
+        return False
+    if len(to_emails) > MAILGUN_BATCH_LIMIT:
+        raise ValueError(f"Mailgun batch limit is {MAILGUN_BATCH_LIMIT} recipients, got {len(to_emails)}.")
+
+    data = {
+        "from": f"myschedule.cloud:  <mailgun@{mailgun_domain}>",
+        "to": list(to_emails),
+        "subject": subject,
+        "text": text_content,
+        # Always sent: without it Mailgun puts every address in one To: header.
+        "recipient-variables": json.dumps(recipient_variables or {e: {} for e in to_emails}),
+    }
+    if html_content:
+        data["html"] = html_content
+
+    try:
+        response = http_client.post(
+            f"{MAILGUN_API_BASE}/{mailgun_domain}/messages",
+            auth=("api", mailgun_api_key),
+            data=data
+        )
+        response.raise_for_status()
+        logger.info("Mailgun accepted batch of %d", len(to_emails))
+        return True
+    except requests.exceptions.RequestException as e:
+        logger.warning("Mailgun batch of %d failed: %s", len(to_emails), e)
         return False
 
 
@@ -81,216 +139,17 @@ def send_receipt_with_ics(to_email, customer_name, shifts_data, ics_content):
     Returns:
         bool: True if email sent successfully
     """
-    import sys
-    from urllib.parse import quote
-    from datetime import datetime
-    
-    # Generate timestamped filename first
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-    filename = f"work_schedule_{timestamp}.ics"
-    
-    # Create calendar import URLs
-    # Google Calendar - use mobile web version that bypasses app
-    google_url = "https://calendar.google.com/calendar/gp#~calendar"
-    
-    # Outlook - main calendar web interface for importing
-    outlook_url = "https://outlook.live.com/calendar/"
-    
-    subject = "Schedule --> Calendar"
-    
-    # HTML email template with improved table-based layout for better email compatibility
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Your Work Schedule</title>
-    </head>
-    <body style="font-family: 'Inter', Helvetica, Arial, sans-serif; line-height: 1.6; color: #374151; margin: 0; padding: 0; background-color: #f9fafb;">
-
-        <!-- Outer Table (Ensures full-screen width and centering) -->
-        <table width="100%" cellpadding="0" cellspacing="0" border="0" style="background-color: #f9fafb;">
-            <tr>
-                <td align="center" style="padding: 20px 10px;">
-
-                    <!-- Email Container (Fixed max-width, center content) -->
-                    <table width="600" cellpadding="0" cellspacing="0" border="0" style="max-width: 600px; background-color: white; border-radius: 12px; box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1); overflow: hidden;">
-                        
-                        <!-- Header -->
-                        <tr>
-                            <td align="center" style="background-color: #0ea5e9; padding: 16px 24px;">
-                                <div style="font-size: 28px; font-weight: bold; color: white;">MySchedule.cloud</div>
-                            </td>
-                        </tr>
-                        
-                        <!-- Main Content Area -->
-                        <tr>
-                            <td style="padding: 24px;">
-                                
-                                <!-- Introduction -->
-                                <h1 style="color: #1f2937; margin: 0 0 20px 0; font-size: 24px; font-weight: 700;">
-                                    Hello {customer_name},
-                                </h1>
-
-                                <p style="font-size: 16px; margin: 0 0 18px 0;">
-                                    Thank you for using MySchedule.cloud! Your work schedule has been successfully processed and is attached to this email as an <strong>.ics calendar file</strong>.
-                                </p>
-                                <p style="font-size: 16px; margin: 0 0 32px 0;">
-                                    Follow the simple steps below to import your schedule into your preferred calendar application.
-                                </p>
-                                
-                                <!-- Calendar Instructions Container - Consolidated Instructions -->
-                                <table width="100%" cellpadding="0" cellspacing="0" border="0">
-                                    
-                                    <!-- ========================================================= -->
-                                    <!-- 1. APPLE (SIMPLE INSTRUCTION) -->
-                                    <!-- ========================================================= -->
-                                    <tr>
-                                        <td style="padding-bottom: 25px;">
-                                            <div style="background-color: #f1f5f9; padding: 15px 20px; border-radius: 8px;">
-                                                <span style="font-weight: 700; font-size: 18px; color: #059669; margin: 0 0 10px 0; display: block;">Apple (iPhone, iPad, Mac Calendar):</span>
-                                                
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>1. Tap or Double-Click:</strong> Open the attached <strong>.ics file</strong> in this email or on your device.</p>
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>2. Confirm:</strong> Choose <strong>"Add to Calendar"</strong> or <strong>"Import"</strong> when prompted by the Calendar application.</p>
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>3. Select:</strong> Select the calendar you wish to add the events to.</p>
-                                                <p style="font-size: 12px; color: #6b7280; margin-top: 15px;">*This works directly on Apple devices and Mac desktop apps.*</p>
-                                            </div>
-                                        </td>
-                                    </tr>
-
-                                    <!-- ========================================================= -->
-                                    <!-- 2. GOOGLE CALENDAR (WEB-FOCUSED STEPS) -->
-                                    <!-- ========================================================= -->
-                                    <tr>
-                                        <td style="padding-bottom: 25px;">
-                                            <div style="background-color: #f1f5f9; padding: 15px 20px; border-radius: 8px;">
-                                                <span style="font-weight: 700; font-size: 18px; color: #1e40af; margin: 0 0 10px 0; display: block;">Google Calendar (Web):</span>
-                                                
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>1. Save File:</strong> Save the attached <strong>.ics file</strong> to your Downloads folder.</p>
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>2. Open Calendar:</strong> Click the button below to go to the Google Calendar website.</p>
-                                                
-                                                <div style="margin: 15px 0; text-align: center;">
-                                                    <a href="{google_url}" target="_blank" style="display: inline-block; background-color: white; color: #0ea5e9; border: 1px solid #0ea5e9; padding: 9px 20px; text-decoration: none; border-radius: 6px; font-weight: 600; font-size: 14px;">Open Google Calendar Website</a>
-                                                </div>
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>3. Switch View:</strong> Click the <strong>Desktop</strong> link at the bottom of the page.</p>
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>4. Go to Import:</strong> Click the <strong>Gear icon</strong> → <strong>Settings</strong> → <strong>Import & Export</strong> on the left menu.</p>
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>5. Select Files:</strong> Select the <strong>.ics file</strong> you saved, and choose <strong>MySchedule.cloud</strong> (or your default) from the calendar dropdown.</p>
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>6. Final Import:</strong> Click the blue <strong>Import</strong> button. A bubble should appear reading <strong>"Imported [num] out of [num] Events"</strong> (or similar) when done.</p>
-                                                <p style="font-size: 12px; color: #6b7280; margin-top: 15px;">*You must use the Google Calendar website for file importing, even on a phone.*</p>
-                                            </div>
-                                        </td>
-                                    </tr>
-
-                                    <!-- ========================================================= -->
-                                    <!-- 3. OUTLOOK (WEB-FOCUSED STEPS - SIMPLIFIED) -->
-                                    <!-- ========================================================= -->
-                                    <tr>
-                                        <td style="padding-bottom: 30px;">
-                                            <div style="background-color: #f1f5f9; padding: 15px 20px; border-radius: 8px;">
-                                                <span style="font-weight: 700; font-size: 18px; color: #1e40af; margin: 0 0 10px 0; display: block;">Outlook Calendar (Web):</span>
-
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>1. Save File:</strong> Save the attached <strong>.ics file</strong> to your device.</p>
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>2. Open Calendar:</strong> Click the button below to go to the Outlook Calendar website.</p>
-                                                
-                                                <div style="margin: 15px 0; text-align: center;">
-                                                    <a href="{outlook_url}" target="_blank" style="display: inline-block; background-color: white; color: #0ea5e9; border: 1px solid #0ea5e9; padding: 9px 20px; text-decoration: none; border-radius: 6px; font-weight: 600; font-size: 14px;">Open Outlook Calendar Website</a>
-                                                </div>
-
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>3. Go to Import:</strong> In Outlook, click <strong>Add calendar</strong> (on the left menu).</p>
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>4. Upload File:</strong> Select <strong>Upload from file</strong> and choose the <strong>.ics file</strong> you saved.</p>
-                                                <p style="font-size: 15px; margin: 8px 0;"><strong>5. Final Import:</strong> Select a calendar (e.g., your primary calendar) and click <strong>Import</strong>.</p>
-                                                
-                                                <p style="font-size: 12px; color: #6b7280; margin-top: 15px;">*This web method is the best approach for both desktop and mobile users.*</p>
-                                            </div>
-                                        </td>
-                                    </tr>
-
-                                </table>
-
-                                <!-- Alternative/Offline Calendar Help -->
-                                <div style="margin-top: 24px; padding-top: 16px; border-top: 1px solid #e5e7eb;">
-                                    <h4 style="font-size: 16px; font-weight: 700; color: #1f2937; margin: 0 0 12px 0;">
-                                        Alternative Calendar Support
-                                    </h4>
-                                    <p style="font-size: 14px; color: #374151; margin: 0 0 12px 0;">
-                                        The attached file is a universal <strong>.ics file</strong> and is compatible with virtually all calendar applications (e.g., Thunderbird, eM Client, etc.).
-                                    </p>
-                                    <p style="font-size: 14px; color: #374151; margin: 0;">
-                                        <strong>General Tip:</strong> Simply open or tap the attached <strong>.ics file</strong> and your device should automatically prompt you to add the events to your local calendar.
-                                    </p>
-                                </div>
-                                 <div style="margin-top: 24px; padding-top: 16px; border-top: 1px solid #e5e7eb;">
-                                    <h4 style="font-size: 16px; font-weight: 700; color: #1f2937; margin: 0 0 12px 0;">
-                                       Printing Your Calendar 
-                                    </h4>
-                                    <p style="font-size: 14px; color: #374151; margin: 0 0 12px 0;">
-                                        The trick to printing your calendar, as you know, is to open the calendar program on a desktop computer and print out the screen.  If you don't have a calendar program, below are instructions for getting Google's free Calendar program.
-                                    </p>
-
-                                    <p style="font-size: 14px; color: #374151; margin: 0 0 12px 0;">
-                                    <ol>
-                                        <li>
-                                        <p style="font-size: 14px; color: #374151; margin: 0 0 12px 0;">
-                                            Get a Google Account:</strong> If you use Gmail, you already have one. If not, you will need to <a href="https://accounts.google.com/signup" target="_blank">create a free Google account</a> to use the calendar.
-                                        </p>
-                                        </li>
-                                        <li>
-                                        <p style="font-size: 14px; color: #374151; margin: 0 0 12px 0;">
-                                            Go to Google Calendar:</strong> Visit <a href="https://calendar.google.com" target="_blank">calendar.google.com</a> or open the mobile app, and by following the instructions above for a google calendar, you can import your 'ics' file to add your schedule to your new calendar. Once done, open the calendar and print the screen.
-                                        </p>
-                                        </li>
-                                    </ol>
-                                    </p>
-`
-                                </div>
-                            </td>
-                        </tr>
-
-                        <!-- Footer -->
-                        <tr>
-                            <td align="center" style="padding: 24px; background-color: #f9fafb; border-top: 1px solid #e5e7eb;">
-                                <p style="font-size: 12px; color: #6b7280; margin: 0;">
-                                    &copy; 2025 MySchedule.cloud - Making scheduling simple
-                                </p>
-                            </td>
-                        </tr>
-
-                    </table>
-                </td>
-            </tr>
-        </table>
-    </body>
-    </html>
-    """
-    
-    # Plain text version
-    text_content = f"""Hello {customer_name},
-
-Thank you for using myschedule.cloud! Your work schedule has been successfully processed and is attached as a calendar file.
-
- Download the attached {filename} file to your Downloads folder.
-
-CHOOSE YOUR CALENDAR PROGRAM FOR INSTALLATION INSTRUCTIONS:
+    from workschedule.services.email_templates import (
+        render_receipt, receipt_filename, RECEIPT_SUBJECT)
 
-iPhone/Mac: Open the attached .ics file
-Google Calendar: Use browser (not app) → calendar.google.com → Settings → Import & Export  
-Outlook: File > Open & Export > Import/Export
-
-DON'T HAVE A CLOUD CALENDAR?
-No problem! The attached .ics file works with:
-- Your phone's built-in calendar app
-- Desktop calendar programs (Outlook, Thunderbird, Apple Calendar)  
-- Any calendar app that accepts .ics files
-
-Simply open the attached file and your device will ask which calendar to add it to.
+    # Generate timestamped filename first
+    filename = receipt_filename()
+    subject = RECEIPT_SUBJECT
 
-Maybe its time to move to the cloud.  Google Calendar is a good choice.
+    # HTML and plain-text bodies come from the precompiled templates in
+    # templates/emails; only the per-customer fields are filled in here.
+    html_content, text_content = render_receipt(customer_name, filename)
 
-Best regards,
-myschedule.cloud Team
-"""
-    
     # Send email with ICS attachment
     return send_simple_message(
         to_email=to_email,
@@ -302,6 +161,26 @@ myschedule.cloud Team
     )
 
 
+def queue_receipt_with_ics(to_email, customer_name, shifts_data, ics_content):
+    """
+    Queue send_receipt_with_ics for background delivery and return at once.
+
+    Use this from request handlers; the receipt is built and posted to
+    Mailgun by the email_queue sender pool, with retries.
+
+    Returns:
+        str: The queued job id, or None if the queue is full.
+    """
+    from workschedule.services import email_queue
+    return email_queue.enqueue(
+        "receipt",
+        to_email=to_email,
+        customer_name=customer_name,
+        shifts_data=shifts_data,
+        ics_content=ics_content
+    )
+
+
 def test_email_locally():
     """
     Test function to send email locally without going through Cloud Run
@@ -336,11 +215,13 @@ END:VCALENDAR"""
         ics_content=test_ics.encode('utf-8')
     )
     
-    print(f"Test email sent: {success}")
+    logger.info("Test email sent: %s", success)
     return success
 
 
 if __name__ == "__main__":
     # Run test when script is executed directly
+    from workschedule import log_config
+    log_config.configure()
     test_email_locally()
 
@@ -0,0 +1,192 @@
+"""
+page_cache.py
+
+Rendered-page cache for routes whose output depends only on the URL.
+
+The landing, login, signup, upload and cancel pages render the same Jinja
+template for every visitor. @cached_page renders each of them once per
+process (per revision) and serves the stored bytes afterwards, with an ETag
+so a browser revalidating a page it already has gets a 304 and no body:
+
+    @auth_bp.route('/login')
+    @cached_page()
+    def login_page():
+        return render_template('auth/login.html')
+
+Entries are keyed by the deploy revision (K_REVISION, set by Cloud Run),
+path, query string and any request headers named in ``vary``, so a new
+deploy never serves pages rendered by the previous one. Requests that are
+not GET/HEAD, or whose session holds flash messages, bypass the cache;
+only plain 200 responses without cookies are stored.
+
+The in-process LRU sits in front of an optional shared tier: set
+PAGE_CACHE_REDIS_URL (and install ``redis``) and a page rendered by one
+worker is reused by the others and by new instances on the same revision.
+Shared-tier errors are logged and treated as misses.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+
+from flask import make_response, request, session
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "256"))
+# Shared-tier expiry; revisions already separate deploys, this just
+# lets Redis reclaim pages of revisions that no longer serve traffic.
+PAGE_CACHE_SHARED_TTL_SECONDS = int(os.getenv("PAGE_CACHE_SHARED_TTL_SECONDS", "86400"))
+PAGE_CACHE_REDIS_URL = os.getenv("PAGE_CACHE_REDIS_URL")
+DEPLOY_REVISION = os.getenv("K_REVISION", "local")
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    body: bytes
+    mimetype: str
+    etag: str
+
+    @classmethod
+    def from_body(cls, body, mimetype):
+        return cls(body, mimetype, hashlib.sha256(body).hexdigest()[:32])
+
+    def serialize(self):
+        return self.mimetype.encode() + b"\n" + self.body
+
+    @classmethod
+    def deserialize(cls, data):
+        mimetype, _, body = data.partition(b"\n")
+        return cls.from_body(body, mimetype.decode())
+
+
+class RedisTier:
+    """Shared page store; the client is created on first use."""
+
+    def __init__(self, url, ttl=PAGE_CACHE_SHARED_TTL_SECONDS):
+        self._url = url
+        self._ttl = ttl
+        self._client = None
+
+    def _redis(self):
+        if self._client is None:
+            import redis  # optional dependency, only needed with PAGE_CACHE_REDIS_URL
+            self._client = redis.Redis.from_url(self._url, socket_timeout=0.25)
+        return self._client
+
+    def get(self, key):
+        data = self._redis().get(f"page:{key}")
+        return CachedPage.deserialize(data) if data is not None else None
+
+    def set(self, key, page):
+        self._redis().set(f"page:{key}", page.serialize(), ex=self._ttl)
+
+
+class PageCache:
+    """Thread-safe LRU of rendered pages with an optional shared tier."""
+
+    def __init__(self, max_entries=PAGE_CACHE_MAX_ENTRIES, shared=None):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return page
+        if self.shared is not None:
+            try:
+                page = self.shared.get(key)
+            except Exception as e:
+                logger.warning("Shared page cache read failed: %s", e)
+            if page is not None:
+                self._store(key, page)
+                with self._lock:
+                    self.hits += 1
+                return page
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, page):
+        self._store(key, page)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, page)
+            except Exception as e:
+                logger.warning("Shared page cache write failed: %s", e)
+
+    def _store(self, key, page):
+        with self._lock:
+            self._entries[key] = page
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+page_cache = PageCache(shared=RedisTier(PAGE_CACHE_REDIS_URL) if PAGE_CACHE_REDIS_URL else None)
+
+
+def page_key(vary=()):
+    """Cache key of the current request."""
+    parts = [DEPLOY_REVISION, request.path, request.query_string.decode("latin-1")]
+    parts.extend(f"{name.lower()}={request.headers.get(name, '')}" for name in vary)
+    return "|".join(parts)
+
+
+def _storable(response):
+    return (response.status_code == 200 and not response.is_streamed
+            and "Set-Cookie" not in response.headers)
+
+
+def cached_page(vary=()):
+    """Serve the view's rendered output from page_cache (see module docstring)."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ("GET", "HEAD") or session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            key = page_key(vary)
+            page = page_cache.get(key)
+            status = "HIT"
+            if page is None:
+                status = "MISS"
+                response = make_response(view(*args, **kwargs))
+                if not _storable(response):
+                    return response
+                page = CachedPage.from_body(response.get_data(), response.mimetype)
+                page_cache.set(key, page)
+
+            response = make_response(page.body)
+            response.mimetype = page.mimetype
+            response.set_etag(page.etag)
+            # Stored by the browser, but revalidated (a cheap 304) on every use,
+            # so a deploy shows up immediately.
+            response.headers["Cache-Control"] = "no-cache"
+            response.headers["X-Page-Cache"] = status
+            for name in vary:
+                response.vary.add(name)
+            return response.make_conditional(request)
+
+        return wrapper
+
+    return decorator
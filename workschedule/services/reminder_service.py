@@ -0,0 +1,109 @@
+"""
+reminder_service.py
+
+"Time to update your work schedule" reminder emails.
+
+The ICS we hand out carries a reminder event two weeks out; this module
+sends the matching email. Delivering a schedule to a logged-in user
+(payment_success) calls schedule_reminder_for(), and users are due once
+User.next_reminder_at has passed. Due users are read with an indexed keyset query and sent in batches
+of up to MAILGUN_BATCH_LIMIT recipients per Mailgun call, using
+recipient-variables for personalization. Each accepted batch is marked
+sent and committed on its own. A run that dies or hits a failed batch can
+simply be repeated: only users still due are picked up again.
+
+Run it from cron / Cloud Scheduler with ``flask send-reminders``.
+"""
+import datetime
+
+from workschedule.services import mailgun_service
+from workschedule.services.email_templates import render_reminder_batch, REMINDER_SUBJECT
+
+REMINDER_INTERVAL = datetime.timedelta(weeks=2)
+
+
+def schedule_reminder(user, when=None):
+    """Mark user as due for a reminder at `when` (default: two weeks from now). Caller commits."""
+    user.next_reminder_at = when or (datetime.datetime.utcnow() + REMINDER_INTERVAL)
+
+
+def schedule_reminder_for(firebase_uid, when=None):
+    """Schedule the reminder for the User with this Firebase UID and commit; False if there is none."""
+    from workschedule.app import db
+    from workschedule.models import User
+    user = User.query.filter_by(firebase_uid=firebase_uid).one_or_none()
+    if user is None:
+        return False
+    schedule_reminder(user, when)
+    db.session.commit()
+    return True
+
+
+def _due_batch(now, after_id, batch_size):
+    from workschedule.models import User
+    return (User.query
+            .with_entities(User.id, User.email)
+            .filter(User.next_reminder_at <= now,
+                    User.email.isnot(None),
+                    User.id > after_id)
+            .order_by(User.id)
+            .limit(batch_size)
+            .all())
+
+
+def _mark_sent(user_ids, now):
+    from workschedule.app import db
+    from workschedule.models import User
+    (User.query
+     .filter(User.id.in_(user_ids), User.next_reminder_at <= now)
+     .update({User.last_reminder_at: now,
+              User.next_reminder_at: now + REMINDER_INTERVAL},
+             synchronize_session=False))
+    db.session.commit()
+
+
+def dispatch_due_reminders(now=None, batch_size=mailgun_service.MAILGUN_BATCH_LIMIT,
+                           dry_run=False):
+    """
+    Send reminder emails to every due user.
+
+    Args:
+        now (datetime): Reference time (UTC, naive like the model columns).
+        batch_size (int): Recipients per Mailgun call, at most MAILGUN_BATCH_LIMIT.
+        dry_run (bool): Count due users without sending or updating anything.
+
+    Returns:
+        dict: {"batches", "sent", "failed"} counts for this run.
+    """
+    now = now or datetime.datetime.utcnow()
+    batch_size = min(batch_size, mailgun_service.MAILGUN_BATCH_LIMIT)
+    html_content, text_content = render_reminder_batch()
+    stats = {"batches": 0, "sent": 0, "failed": 0}
+
+    after_id = 0
+    while True:
+        batch = _due_batch(now, after_id, batch_size)
+        if not batch:
+            break
+        after_id = batch[-1].id
+        stats["batches"] += 1
+        if dry_run:
+            stats["sent"] += len(batch)
+            continue
+
+        recipient_variables = {row.email: {"email": row.email, "id": row.id} for row in batch}
+        ok = mailgun_service.send_batch_message(
+            list(recipient_variables),
+            REMINDER_SUBJECT,
+            text_content,
+            html_content=html_content,
+            recipient_variables=recipient_variables
+        )
+        if ok:
+            _mark_sent([row.id for row in batch], now)
+            stats["sent"] += len(batch)
+        else:
+            # Left due; the next run retries exactly these users.
+            stats["failed"] += len(batch)
+
+    return stats
@@ -0,0 +1,199 @@
+"""
+retention_service.py
+
+Monthly partitions and retention for schedule history.
+
+On PostgreSQL the schedule table is RANGE partitioned on created_at, one
+partition per month named schedule_YYYY_MM, plus schedule_default for rows
+outside every range (see migration 48e9973cf8e4). This module keeps that
+layout going:
+
+* ensure_partitions() creates the partitions for the current month and
+  PARTITIONS_AHEAD months after it, so inserts never land in the default
+  partition. Rows the default already holds for a new month (after a
+  missed run, or from before the migration) are moved into it.
+* prune_expired() removes every month older than the retention window in
+  bulk: optionally COPY the partition to a gzipped CSV in GCS, then
+  DETACH + DROP it. No row-by-row DELETE, no table bloat, no vacuum debt.
+
+Run both from ``flask schedule-retention`` (daily from Cloud Scheduler).
+Each transaction lifts the web statement_timeout first: moving rows out of
+the default partition and COPYing a month of history take longer.
+Databases without partitioning (SQLite in tests) fall back to a single
+DELETE of the expired rows.
+"""
+import datetime
+import gzip
+import logging
+import os
+import re
+import tempfile
+
+from sqlalchemy import text
+
+from workschedule.database import lift_statement_timeout
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_RETENTION_MONTHS = int(os.environ.get("SCHEDULE_RETENTION_MONTHS", "24"))
+PARTITIONS_AHEAD = int(os.environ.get("SCHEDULE_PARTITIONS_AHEAD", "3"))
+ARCHIVE_PREFIX = os.environ.get("SCHEDULE_ARCHIVE_PREFIX", "archive/schedule/")
+
+_PARTITION_NAME = re.compile(r"^schedule_(\d{4})_(\d{2})$")
+
+
+def month_start(value):
+    """First day of value's month, as a date."""
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(day, months):
+    """The first day of the month `months` after day's month."""
+    index = day.year * 12 + day.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"schedule_{month:%Y_%m}"
+
+
+def retention_cutoff(now=None, months=SCHEDULE_RETENTION_MONTHS):
+    """Rows created before this date (a month boundary) have expired."""
+    now = now or datetime.datetime.utcnow()
+    return add_months(month_start(now), -months)
+
+
+def _is_partitioned(connection):
+    if connection.dialect.name != "postgresql":
+        return False
+    return bool(connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'schedule'"
+    )).scalar())
+
+
+def list_partitions(connection):
+    """Return {month (date): partition name} for the monthly partitions of schedule."""
+    rows = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'schedule'"
+    )).scalars()
+    partitions = {}
+    for name in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions[datetime.date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def _create_partition(connection, month):
+    """Create month's partition, moving any of its rows out of schedule_default."""
+    name = partition_name(month)
+    bounds = {"start": month, "end": add_months(month, 1)}
+    in_default = connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM schedule_default "
+        "WHERE created_at >= :start AND created_at < :end)"
+    ), bounds).scalar()
+    create = (f"CREATE TABLE {name} PARTITION OF schedule "
+              f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')")
+    if not in_default:
+        connection.execute(text(create))
+        return
+    # PostgreSQL refuses a partition whose range the default partition
+    # already has rows for; detach the default while the rows move over.
+    # All in the caller's transaction, so readers never see them missing.
+    connection.execute(text("ALTER TABLE schedule DETACH PARTITION schedule_default"))
+    connection.execute(text(create))
+    moved = connection.execute(text(
+        f"WITH moved AS (DELETE FROM schedule_default "
+        f"WHERE created_at >= :start AND created_at < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds).rowcount
+    connection.execute(text("ALTER TABLE schedule ATTACH PARTITION schedule_default DEFAULT"))
+    logger.info("Moved %d rows from schedule_default into %s", moved, name)
+
+
+def ensure_partitions(now=None, ahead=PARTITIONS_AHEAD):
+    """Create missing partitions for this month through `ahead` months out; return their names."""
+    from workschedule.app import db
+    connection = lift_statement_timeout(db.session.connection())
+    if not _is_partitioned(connection):
+        return []
+
+    existing = list_partitions(connection)
+    first = month_start(now or datetime.datetime.utcnow())
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(first, offset)
+        if month in existing:
+            continue
+        _create_partition(connection, month)
+        created.append(partition_name(month))
+    db.session.commit()
+    if created:
+        logger.info("Created schedule partitions: %s", ", ".join(created))
+    return created
+
+
+def _archive_partition(connection, name, bucket_name=None):
+    """COPY partition `name` to gs://<bucket>/<ARCHIVE_PREFIX><name>.csv.gz; return the blob name."""
+    from workschedule import clients
+    blob_name = f"{ARCHIVE_PREFIX}{name}.csv.gz"
+    cursor = connection.connection.driver_connection.cursor()
+    try:
+        with tempfile.TemporaryFile() as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+                cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", gz)
+            raw.seek(0)
+            blob = clients.get_gcs_bucket(bucket_name).blob(blob_name)
+            blob.upload_from_file(raw, content_type="text/csv", rewind=True)
+    finally:
+        cursor.close()
+    return blob_name
+
+
+def prune_expired(now=None, months=SCHEDULE_RETENTION_MONTHS, archive=True,
+                  bucket_name=None, dry_run=False):
+    """
+    Drop (after archiving, if asked) every schedule month older than the retention window.
+
+    Returns:
+        dict: {"cutoff": date, "dropped": [partition names], "archived": [blob names],
+        "deleted_rows": rows removed from the default partition / unpartitioned table}
+    """
+    from workschedule.app import db
+    cutoff = retention_cutoff(now, months)
+    result = {"cutoff": cutoff, "dropped": [], "archived": [], "deleted_rows": 0}
+    connection = lift_statement_timeout(db.session.connection())
+
+    if not _is_partitioned(connection):
+        if not dry_run:
+            result["deleted_rows"] = connection.execute(
+                text("DELETE FROM schedule WHERE created_at < :cutoff"), {"cutoff": cutoff}
+            ).rowcount
+            db.session.commit()
+        return result
+
+    expired = sorted((m, name) for m, name in list_partitions(connection).items()
+                     if add_months(m, 1) <= cutoff)
+    for month, name in expired:
+        result["dropped"].append(name)
+        if dry_run:
+            continue
+        if archive:
+            result["archived"].append(_archive_partition(connection, name, bucket_name))
+        connection.execute(text(f"ALTER TABLE schedule DETACH PARTITION {name}"))
+        connection.execute(text(f"DROP TABLE {name}"))
+        # One partition per transaction: a failure later keeps what is already done.
+        db.session.commit()
+        connection = lift_statement_timeout(db.session.connection())
+        logger.info("Dropped expired schedule partition %s", name)
+
+    if not dry_run:
+        result["deleted_rows"] = connection.execute(
+            text("DELETE FROM schedule_default WHERE created_at < :cutoff"), {"cutoff": cutoff}
+        ).rowcount
+        db.session.commit()
+    return result
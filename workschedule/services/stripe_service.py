@@ -1,15 +1,44 @@
+import logging
 import stripe
 import os
 
+from workschedule.metrics import timed
+from workschedule.services import http_client
+
+logger = logging.getLogger(__name__)
+
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+stripe.max_network_retries = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", "2"))
+
+
+def _install_http_client():
+    """
+    Route Stripe API calls through the shared pooled session.
+    Stripe retries 409/429/5xx itself (with idempotency keys), so the
+    session used here only retries connection failures.
+    """
+    stripe.default_http_client = stripe.RequestsClient(
+        session=http_client.get_session(retry_status=False),
+        timeout=http_client.DEFAULT_TIMEOUT
+    )
+
+
+_install_http_client()
+if hasattr(os, "register_at_fork"):
+    # http_client drops its sessions in the child first (registered earlier).
+    os.register_at_fork(after_in_child=_install_http_client)
 
 
+@timed("stripe_checkout")
 def create_checkout_session(price_id, customer_email=None, success_url=None,
-                            cancel_url=None, metadata=None, coupon_code=None):
+                            cancel_url=None, metadata=None, coupon_code=None,
+                            expires_at=None):
     """
     Creates a Stripe Checkout Session.
     customer_email is optional — if None, Stripe collects it on the checkout page
     or the session proceeds anonymously.
+    expires_at is an optional Unix timestamp (30 minutes to 24 hours out) after
+    which Stripe expires the session.
     """
     try:
         session_params = {
@@ -28,17 +57,39 @@ def create_checkout_session(price_id, customer_email=None, success_url=None,
         if customer_email:
             session_params["customer_email"] = customer_email
 
+        if expires_at:
+            session_params["expires_at"] = int(expires_at)
+
         if coupon_code:
-            print(f"[DEBUG] Coupon code '{coupon_code}' — enter on Stripe checkout page.")
+            logger.debug("Coupon code supplied; it is entered on the Stripe checkout page.")
 
-        print(f"[DEBUG] Creating Stripe session with params: {session_params}")
         session = stripe.checkout.Session.create(**session_params)
-        print(f"[DEBUG] Stripe session created: {session.id}")
+        logger.debug("Stripe session %s created for %s", session.id, session_params["metadata"])
         return session
 
     except stripe.error.StripeError as e:
-        print(f"Stripe error: {e}")
+        logger.warning("Stripe error: %s", e)
+        return None
+    except Exception:
+        logger.exception("Unexpected error creating Stripe session")
+        return None
+
+
+@timed("stripe_retrieve")
+def paid_checkout_email(checkout_session_id, job_id):
+    """
+    The customer email Stripe collected on a paid Checkout Session for job_id.
+
+    Returns None if the session is unpaid, belongs to another job or cannot
+    be loaded, so a guessed session id never redirects someone's receipt.
+    """
+    try:
+        checkout = stripe.checkout.Session.retrieve(checkout_session_id).to_dict()
+    except stripe.error.StripeError as e:
+        logger.warning("Could not load checkout session %s: %s", checkout_session_id, e)
+        return None
+    if checkout.get("payment_status") != "paid":
         return None
-    except Exception as e:
-        print(f"Unexpected error: {e}")
+    if (checkout.get("metadata") or {}).get("job_id") != job_id:
         return None
+    return (checkout.get("customer_details") or {}).get("email")
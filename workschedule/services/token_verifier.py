@@ -0,0 +1,245 @@
+"""
+token_verifier.py
+
+Firebase ID token verification off the request path.
+
+Google's securetoken signing certificates are fetched by a background
+thread when the worker starts and refreshed before their Cache-Control
+max-age runs out, so a login never waits on a certificate fetch. Verified
+claims are cached by SHA-256 digest of the token until the token's exp, so
+re-establishing a session with the same token is a dict lookup.
+
+The checks mirror firebase_admin.auth.verify_id_token: RS256 signature
+against the current key set, aud == project id, iss ==
+https://securetoken.google.com/<project id>, non-empty sub, iat/exp with
+clock skew. Errors are raised as the same firebase_admin exception types.
+If no keys are loaded yet (or the auth emulator is in use), verification
+falls back to the SDK.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+import google.auth.exceptions
+from google.auth import jwt
+from firebase_admin import auth
+
+from workschedule.metrics import LatencyStats
+from workschedule.services import http_client
+
+logger = logging.getLogger(__name__)
+
+ID_TOKEN_CERT_URI = ("https://www.googleapis.com/robot/v1/metadata/x509/"
+                     "securetoken@system.gserviceaccount.com")
+ID_TOKEN_ISSUER_PREFIX = "https://securetoken.google.com/"
+CLOCK_SKEW_SECONDS = 60
+
+# Refresh keys when this fraction of max-age has elapsed; retry sooner on failure.
+KEY_REFRESH_FRACTION = 0.8
+KEY_REFRESH_DEFAULT_SECONDS = 3600
+KEY_REFRESH_RETRY_SECONDS = 30
+
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+verification_latency = LatencyStats("firebase_token_verification")
+
+
+def _project_id():
+    project_id = (os.getenv("FIREBASE_PROJECT_ID")
+                  or os.getenv("GOOGLE_CLOUD_PROJECT")
+                  or os.getenv("GCLOUD_PROJECT"))
+    if project_id:
+        return project_id
+    from workschedule import clients
+    try:
+        return clients.init_firebase().project_id
+    except (RuntimeError, ValueError):
+        return None
+
+
+class SigningKeyStore:
+    """Holds Google's current signing certificates and refreshes them in the background."""
+
+    def __init__(self, cert_uri=ID_TOKEN_CERT_URI):
+        self._cert_uri = cert_uri
+        self._certs = {}
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def certs(self):
+        return self._certs
+
+    def ready(self):
+        return bool(self._certs)
+
+    def refresh(self):
+        """Fetch the certificates now. Returns seconds until they should be refreshed."""
+        response = http_client.get(self._cert_uri)
+        response.raise_for_status()
+        certs = response.json()
+        max_age = KEY_REFRESH_DEFAULT_SECONDS
+        match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        if match:
+            max_age = int(match.group(1))
+        with self._lock:
+            self._certs = certs
+            self._expires_at = time.time() + max_age
+        return max_age * KEY_REFRESH_FRACTION
+
+    def start(self):
+        """Start the refresh thread (idempotent). The first fetch happens immediately."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, daemon=True,
+                                            name="firebase-key-refresh")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                delay = self.refresh()
+            except Exception as e:
+                logger.warning("Signing key refresh failed: %s", e)
+                delay = KEY_REFRESH_RETRY_SECONDS
+            self._stop.wait(delay)
+
+
+class TokenCache:
+    """sha256(token) -> claims, each entry valid until the token's exp."""
+
+    def __init__(self, max_entries=TOKEN_CACHE_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, digest, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if now >= expires_at:
+                del self._entries[digest]
+                return None
+            return dict(claims)
+
+    def put(self, digest, claims):
+        expires_at = claims.get("exp")
+        if not expires_at:
+            return
+        with self._lock:
+            if len(self._entries) >= self._max_entries:
+                now = time.time()
+                for key in [k for k, (exp, _) in self._entries.items() if exp <= now]:
+                    del self._entries[key]
+                if len(self._entries) >= self._max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[digest] = (float(expires_at), dict(claims))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+signing_keys = SigningKeyStore()
+token_cache = TokenCache()
+
+
+def _verify_locally(id_token, project_id):
+    try:
+        header = jwt.decode_header(id_token)
+    except ValueError as e:
+        raise auth.InvalidIdTokenError(str(e), cause=e)
+    if header.get("alg") != "RS256" or not header.get("kid"):
+        raise auth.InvalidIdTokenError('Firebase ID token must be RS256 with a "kid" header.')
+    if header["kid"] not in signing_keys.certs:
+        # Unknown kid: keys may have rotated just now; let the SDK fetch them.
+        return None
+
+    try:
+        claims = jwt.decode(id_token, certs=signing_keys.certs, audience=project_id,
+                            clock_skew_in_seconds=CLOCK_SKEW_SECONDS)
+    except ValueError as e:
+        if "Token expired" in str(e):
+            raise auth.ExpiredIdTokenError(str(e), cause=e)
+        raise auth.InvalidIdTokenError(str(e), cause=e)
+
+    if claims.get("iss") != ID_TOKEN_ISSUER_PREFIX + project_id:
+        raise auth.InvalidIdTokenError('Firebase ID token has incorrect "iss" (issuer) claim.')
+    subject = claims.get("sub")
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise auth.InvalidIdTokenError('Firebase ID token has an invalid "sub" (subject) claim.')
+    claims["uid"] = subject
+    return claims
+
+
+def verify_id_token(id_token):
+    """
+    Verify a Firebase ID token and return its claims (with 'uid' set).
+
+    Raises:
+        ValueError: If id_token is empty.
+        firebase_admin.auth.InvalidIdTokenError / ExpiredIdTokenError: As the SDK would.
+    """
+    if not id_token or not isinstance(id_token, str):
+        raise ValueError("ID token must be a non-empty string.")
+
+    start = time.perf_counter()
+    digest = TokenCache.digest(id_token)
+    claims = token_cache.get(digest)
+    if claims is not None:
+        verification_latency.observe("cache_hit", time.perf_counter() - start)
+        return claims
+
+    project_id = _project_id()
+    claims = None
+    path = "fallback"
+    if (project_id and signing_keys.ready()
+            and not os.getenv("FIREBASE_AUTH_EMULATOR_HOST")):
+        claims = _verify_locally(id_token, project_id)
+        if claims is not None:
+            path = "local"
+    if claims is None:
+        from workschedule import clients
+        clients.init_firebase()
+        try:
+            claims = auth.verify_id_token(id_token, clock_skew_seconds=CLOCK_SKEW_SECONDS)
+        except google.auth.exceptions.TransportError as e:
+            raise auth.CertificateFetchError(str(e), cause=e)
+
+    token_cache.put(digest, claims)
+    verification_latency.observe(path, time.perf_counter() - start)
+    return claims
+
+
+def start():
+    """Begin loading signing keys; call once per worker at startup."""
+    signing_keys.start()
+
+
+def _reset_after_fork():
+    # The refresh thread does not survive fork(); keys fetched by the parent
+    # stay usable and the child starts its own refresher on start().
+    signing_keys._thread = None
+    signing_keys._lock = threading.Lock()
+    token_cache._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
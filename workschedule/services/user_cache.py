@@ -0,0 +1,198 @@
+"""
+user_cache.py
+
+Read-through cache of User rows keyed by Firebase UID.
+
+Logged-in requests only carry session['user_id'] (the Firebase UID); any
+feature that needs the User row (subscription status, feed token) would
+otherwise query by firebase_uid on every request. get_user() answers from,
+in order:
+
+1. flask.g for the current request (repeat lookups within one request),
+2. a process-wide TTL cache shared by every request in this worker,
+3. the database (one indexed lookup), whose answer fills both.
+
+Cached values are frozen CachedUser snapshots, never ORM instances, so they
+can be shared across threads and outlive the session that loaded them.
+Unknown UIDs are cached too (as None), so a bad cookie cannot make every
+request hit the database.
+
+Writes invalidate the process cache when their transaction commits: ORM
+inserts/updates/deletes of User drop that UID, and bulk UPDATE/DELETE
+statements on User (e.g. a subscription_status change via Query.update())
+drop everything. Other workers pick up changes after USER_CACHE_TTL_SECONDS.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from flask import g, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+_MISSING = object()
+_ALL = object()
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    id: int
+    firebase_uid: str
+    email: Optional[str]
+    subscription_status: Optional[str]
+    ics_feed_token: Optional[str]
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row.id, row.firebase_uid, row.email,
+                   row.subscription_status, row.ics_feed_token)
+
+
+class UserCache:
+    """firebase_uid -> CachedUser (or None for unknown users), each entry valid for ttl seconds."""
+
+    def __init__(self, ttl=USER_CACHE_TTL_SECONDS, max_entries=USER_CACHE_MAX_ENTRIES):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Bumped on every invalidation; a load that started before one is not stored.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, firebase_uid, now=None):
+        """Return the cached value (a CachedUser or None), or _MISSING."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(firebase_uid)
+            if entry is None or now >= entry[0]:
+                self._entries.pop(firebase_uid, None)
+                self.misses += 1
+                return _MISSING
+            self.hits += 1
+            return entry[1]
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def put(self, firebase_uid, user, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if len(self._entries) >= self._max_entries:
+                now = time.monotonic()
+                for key in [k for k, (exp, _) in self._entries.items() if exp <= now]:
+                    del self._entries[key]
+                if len(self._entries) >= self._max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[firebase_uid] = (time.monotonic() + self._ttl, user)
+
+    def invalidate(self, firebase_uid=None):
+        """Drop one UID, or everything when firebase_uid is None."""
+        with self._lock:
+            self._generation += 1
+            if firebase_uid is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(firebase_uid, None)
+
+    def clear(self):
+        self.invalidate()
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+user_cache = UserCache()
+
+
+def _load(firebase_uid):
+    from workschedule.models import User
+    row = (User.query
+           .with_entities(User.id, User.firebase_uid, User.email,
+                          User.subscription_status, User.ics_feed_token)
+           .filter_by(firebase_uid=firebase_uid)
+           .first())
+    return CachedUser.from_row(row) if row else None
+
+
+def get_user(firebase_uid):
+    """Return a CachedUser for firebase_uid, or None if there is no such user."""
+    if not firebase_uid:
+        return None
+    per_request = g.setdefault("_user_cache", {}) if has_app_context() else {}
+    if firebase_uid in per_request:
+        return per_request[firebase_uid]
+
+    user = user_cache.get(firebase_uid)
+    if user is _MISSING:
+        generation = user_cache.generation()
+        user = _load(firebase_uid)
+        user_cache.put(firebase_uid, user, generation)
+    per_request[firebase_uid] = user
+    return user
+
+
+def invalidate(firebase_uid=None):
+    """Forget firebase_uid (or every user) in the process cache and this request's cache."""
+    user_cache.invalidate(firebase_uid)
+    if has_app_context():
+        per_request = g.get("_user_cache")
+        if per_request:
+            if firebase_uid is None:
+                per_request.clear()
+            else:
+                per_request.pop(firebase_uid, None)
+
+
+# ---------------------------------------------------------------------------
+# Invalidation on writes: collect during flush/execute, apply after commit
+# ---------------------------------------------------------------------------
+def _pending(session):
+    return session.info.setdefault("user_cache_invalidations", set())
+
+
+def _after_flush(session, flush_context):
+    from workschedule.models import User
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            # Also drop the previous UID if the flush changed it.
+            previous = inspect(obj).attrs.firebase_uid.history.deleted or ()
+            _pending(session).update(uid for uid in (obj.firebase_uid, *previous) if uid)
+
+
+def _do_orm_execute(state):
+    from workschedule.models import User
+    if (state.is_update or state.is_delete) and any(m.class_ is User for m in state.all_mappers):
+        # Bulk statements do not say which rows they touched.
+        _pending(state.session).add(_ALL)
+
+
+def _after_commit(session):
+    pending = session.info.pop("user_cache_invalidations", None)
+    if not pending:
+        return
+    if _ALL in pending:
+        invalidate()
+    else:
+        for firebase_uid in pending:
+            invalidate(firebase_uid)
+
+
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop("user_cache_invalidations", None)
+
+
+event.listen(Session, "after_flush", _after_flush)
+event.listen(Session, "do_orm_execute", _do_orm_execute)
+event.listen(Session, "after_commit", _after_commit)
+event.listen(Session, "after_soft_rollback", _after_soft_rollback)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=user_cache.clear)
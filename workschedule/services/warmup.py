@@ -0,0 +1,169 @@
+"""
+warmup.py
+
+Pay a fresh worker's first-use costs before it takes traffic.
+
+The first upload on a new instance used to import fitz, icalendar and
+pytz, compile the parsing regexes, load tz data and build the GCS client,
+all inside that user's request. start() runs the same work on a
+background thread instead, and /readyz (routes/health.py) answers 503
+until it has finished:
+
+* parse steps: extract, parse and render the bundled three-shift PDF
+  (resources/warmup_schedule.pdf) end to end, through build_shift_rows
+  and ICS generation. A failure here is a code or image problem and keeps
+  the worker unready.
+* template step: compile the review, payment and expired-link templates.
+* client steps: open a database connection and build the storage client
+  and the pooled HTTP session, and start the I/O pool threads
+  (concurrency.py). These are best effort: a failure is
+  logged and marked failed in /readyz but does not block readiness, so a missing
+  credential cannot keep a revision from starting.
+
+The warm-up starts from gunicorn's post_worker_init hook, or on the first /readyz
+probe under any other server. With preload_app the master also calls
+prewarm() before forking, so the imports and tz data are loaded once and
+shared copy-on-write, and each worker's own run is mostly connections.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WARMUP_PDF_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               "resources", "warmup_schedule.pdf")
+# Pages rendered with per-request data, so they never hit the page cache.
+WARMUP_TEMPLATES = ("review_schedule.html", "payment_success.html", "link_expired.html")
+
+
+class WarmupState:
+    """Progress of this process's warm-up, shared with /readyz."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.finished = False
+        self.ready = False
+        self.steps = {}
+
+    def record(self, name, seconds, ok=True):
+        # Only the outcome: /readyz is unauthenticated, so error text (hosts,
+        # paths, credentials) goes to the log and never into the snapshot.
+        with self._lock:
+            self.steps[name] = {"ok": ok, "seconds": round(seconds, 4)}
+
+    def snapshot(self):
+        with self._lock:
+            return {"ready": self.ready, "finished": self.finished,
+                    "steps": {name: dict(step) for name, step in self.steps.items()}}
+
+
+state = WarmupState()
+
+
+def _parse_sample():
+    from workschedule.routes.schedule import (build_display_shifts,
+                                              extract_text_from_pdf,
+                                              parse_schedule_text)
+    from workschedule.services import db_service
+    from workschedule.services.ics_generator import create_ics_from_entries
+
+    with open(WARMUP_PDF_PATH, "rb") as f:
+        text = extract_text_from_pdf(f.read())
+    shifts = build_display_shifts(parse_schedule_text(text))
+    if not shifts:
+        raise RuntimeError("warm-up schedule produced no shifts")
+    db_service.build_shift_rows(shifts, "America/Los_Angeles", "warmup")
+    create_ics_from_entries(shifts, calendar_name="warmup", timezone_str="America/Los_Angeles")
+
+
+def _compile_templates(app):
+    from flask import render_template
+    # Jinja compiles on first render; url_for needs a request context.
+    with app.test_request_context("/"):
+        for name in WARMUP_TEMPLATES:
+            render_template(name, parsed_schedule=[], job_id="warmup")
+
+
+def _open_database(app):
+    from sqlalchemy import text
+
+    from workschedule.app import db
+    with app.app_context():
+        db.session.execute(text("SELECT 1"))
+        db.session.remove()
+
+
+def _open_storage():
+    from workschedule import clients
+    clients.get_gcs_bucket()
+
+
+def _open_http():
+    from workschedule.services import http_client
+    http_client.get_session()
+    http_client.get_session(retry_status=False)
+
+
+def _start_io_pool():
+    from workschedule import concurrency
+    # The executor spawns a thread per submit until it has idle ones; the
+    # upload and payment routes submit two steps each.
+    pool = concurrency.get_executor()
+    for future in [pool.submit(time.sleep, 0.01) for _ in range(4)]:
+        future.result()
+
+
+def _run_step(name, step):
+    start = time.perf_counter()
+    try:
+        step()
+    except Exception as e:
+        state.record(name, time.perf_counter() - start, ok=False)
+        logger.warning("Warm-up step %s failed: %s", name, e, exc_info=True)
+        return False
+    state.record(name, time.perf_counter() - start)
+    return True
+
+
+def prewarm():
+    """Import and exercise the parsing/ICS code in this process (no connections)."""
+    return _run_step("parse_sample", _parse_sample)
+
+
+def run(app):
+    """Run every warm-up step in this thread; returns whether the worker is ready."""
+    started = time.perf_counter()
+    ready = prewarm()
+    _run_step("templates", lambda: _compile_templates(app))
+    _run_step("database", lambda: _open_database(app))
+    _run_step("storage_client", _open_storage)
+    _run_step("http_session", _open_http)
+    _run_step("io_pool", _start_io_pool)
+    with state._lock:
+        state.ready = ready
+        state.finished = True
+    logger.info("Warm-up finished in %.2fs (ready=%s)", time.perf_counter() - started, ready)
+    return ready
+
+
+def start(app):
+    """Warm up on a background thread; call once per process (see module docstring)."""
+    with state._lock:
+        if state._thread is not None:
+            return
+        state._thread = threading.Thread(target=run, args=(app,), name="warmup", daemon=True)
+    state._thread.start()
+
+
+def _reset_after_fork():
+    # Connections and the warm-up thread stay with the parent; imports and
+    # compiled regexes carry over, so the child's run is short.
+    global state
+    state = WarmupState()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
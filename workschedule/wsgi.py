@@ -3,28 +3,20 @@
 
 import sys
 import os
-import logging
-
-# Ensure all debug logs are printed to the terminal
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s %(levelname)s: %(message)s',
-    handlers=[logging.StreamHandler()]
-)
 
 # from the 'routes' package. This fixes the 'ModuleNotFoundError'.
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from flask import Flask
-from workschedule.app import create_app
+# JSON on Cloud Run, plain lines locally; levels from LOG_LEVEL/LOG_LEVELS
+# (see workschedule/log_config.py).
+from workschedule import log_config
+log_config.configure()
 
-# Create the Flask application instance.
-app = create_app()
+from workschedule.app import get_app
 
-# Set a secret key for session management.
-# It's best practice to load this from an environment variable for security.
-# This fixes the "RuntimeError: The session is unavailable" issue.
-app.secret_key = os.environ.get("FLASK_SECRET_KEY", "your_unique_and_secret_fallback_key")
+# The Flask application instance; built once and shared with workschedule.app.app.
+# The secret key for session management is set in create_app().
+app = get_app()
 
 # Blueprints are registered in create_app(), do not register here.
 